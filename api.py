@@ -1,18 +1,31 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import hashlib
 import json
+import time
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple
 from enum import Enum
 import os # For environment variables
 
 # Import your custom modules
-from modules.csp_filter import csp_filter_flats
-from modules.mcda_wsm import mcda_wsm
+from modules.mcda_wsm import mcda_scores, normalize_matrix, weighted_scores, top_k_positions, top_k_after
 from modules.insight_generator import InsightGenerator
+from modules.insight_table import InsightTable
+from modules.dataset_store import load_processed_dataset, load_flat_index, dataset_version
+from modules.result_cache import ResultCache, RankedResult, result_key
+from modules.serialization import FastJSONResponse, frame_to_records, ndjson_lines, NDJSON_MEDIA_TYPE
+from modules.executor import WorkExecutor, ExecutorSaturated
+from modules.metrics import (REGISTRY, REQUEST_SECONDS, REQUESTS_TOTAL, RESULT_ROWS, CONTENT_TYPE,
+                             stage, start_request_timer, end_request_timer)
+from modules.export import ExportFormat, ENCODERS, MEDIA_TYPES, FILE_EXTENSIONS
+from modules.pagination import encode_cursor, decode_cursor, CursorError, StaleCursorError
 from modules.bayes_utils import load_bayesian_model, get_categories_from_file
+from modules.startup import StartupStages
 
 # ---------------------------
 # 1. Pydantic Models for Validation
@@ -37,7 +50,24 @@ class PriorityEnum(str, Enum):
 class RecommendRequest(BaseModel):
     constraints: ConstraintModel
     priority: PriorityEnum = PriorityEnum.none
-    page: int = 1
+    page: int = Field(default=1, ge=1)
+
+class CursorRecommendRequest(BaseModel):
+    constraints: ConstraintModel
+    priority: PriorityEnum = PriorityEnum.none
+    # Opaque cursor from the previous response; omit for the first page
+    cursor: Optional[str] = None
+    page_size: int = Field(default=10, ge=1, le=100)
+
+class BatchRecommendRequest(BaseModel):
+    requests: List[RecommendRequest] = Field(min_length=1, max_length=500)
+
+class ExportRequest(BaseModel):
+    constraints: ConstraintModel
+    priority: PriorityEnum = PriorityEnum.none
+    format: ExportFormat = ExportFormat.csv
+    # Insights add a table lookup (or live inference on misses) per row
+    include_insights: bool = False
 
 # ---------------------------
 # 2. Application Setup
@@ -54,6 +84,48 @@ app = FastAPI(
 # Fallback to "*" for simple development
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 
+# Processed dataset: the typed columnar store written by preprocessing_distance
+# is used when present, otherwise the CSV is parsed
+DATASET_CSV_PATH = os.getenv("DATASET_CSV_PATH", "ResaleFlatPricesData_processed.csv")
+DATASET_STORE_PATH = os.getenv("DATASET_STORE_PATH", "ResaleFlatPricesData_processed")
+# Memory-map the store's arrays read-only so all workers share one copy of the data
+DATASET_MMAP = os.getenv("DATASET_MMAP", "0") == "1"
+
+# Bayesian query cache: max cached posteriors, and how many of the most common
+# town x flat_type combinations to pre-compute on startup (0 disables warm-up)
+INSIGHT_CACHE_SIZE = int(os.getenv("INSIGHT_CACHE_SIZE", "4096"))
+INSIGHT_WARMUP_COMBOS = int(os.getenv("INSIGHT_WARMUP_COMBOS", "0"))
+# Answer the insight queries from conditional tables compiled at startup instead of
+# running variable elimination per query
+INSIGHT_COMPILE = os.getenv("INSIGHT_COMPILE", "1") == "1"
+
+# Precomputed insight table (built with `python -m modules.insight_table`).
+# Unseen combinations fall back to live inference unless INSIGHT_TABLE_FALLBACK=0
+INSIGHT_TABLE_PATH = os.getenv("INSIGHT_TABLE_PATH", "insight_table")
+INSIGHT_TABLE_FALLBACK = os.getenv("INSIGHT_TABLE_FALLBACK", "1") == "1"
+
+# Ranked result-set cache for /recommend: memory budget, entry lifetime, and how
+# many rows to rank on a miss so the following pages are served from the cache
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_TTL_SEC = float(os.getenv("RESULT_CACHE_TTL_SEC", "300"))
+RESULT_CACHE_MIN_RANKED = int(os.getenv("RESULT_CACHE_MIN_RANKED", "100"))
+
+# Executor for recommendation work: worker threads, requests allowed to wait for
+# a worker before new ones are shed with 503, and seconds to wait before a 504
+RECOMMEND_WORKERS = int(os.getenv("RECOMMEND_WORKERS", str(min(4, os.cpu_count() or 1))))
+RECOMMEND_MAX_QUEUE = int(os.getenv("RECOMMEND_MAX_QUEUE", "16"))
+RECOMMEND_TIMEOUT_SEC = float(os.getenv("RECOMMEND_TIMEOUT_SEC", "30"))
+
+# Add a Server-Timing header with per-stage durations to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Load data and models in background threads so /health answers at once and /ready
+# reports progress; STARTUP_BACKGROUND=0 holds the server until every stage has loaded
+STARTUP_BACKGROUND = os.getenv("STARTUP_BACKGROUND", "1") == "1"
+
+# Rows materialized and encoded at a time by /recommend/export
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS, # Use the configured list
@@ -63,45 +135,182 @@ app.add_middleware(
 )
 # --------------------------------
 
+async def timed_body(body, start: float, endpoint: str):
+    """Pass the response body through and record the request's latency once it has all been sent."""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Latency and status per endpoint; stage timings go to the optional Server-Timing header.
+    Latency runs until the body is sent, so streamed exports are timed in full; the
+    Server-Timing total is taken when the headers are sent, as it travels with them.
+    """
+    timer, token = start_request_timer()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request_timer(token)
+
+    # Label by route template so unknown paths cannot create unbounded series
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if SERVER_TIMING:
+        timer.add("total", time.perf_counter() - start)
+        response.headers["Server-Timing"] = timer.server_timing()
+    response.body_iterator = timed_body(response.body_iterator, start, endpoint)
+    return response
+
+def collect_state_metrics():
+    """Counters kept by the caches and the executor, read at scrape time."""
+    state = app.state
+    result_cache = getattr(state, 'result_cache', None)
+    if result_cache is not None:
+        stats = result_cache.stats()
+        yield ("flatwise_result_cache_hits_total", "counter", "Ranked result cache hits.", [({}, stats['hits'])])
+        yield ("flatwise_result_cache_misses_total", "counter", "Ranked result cache misses.", [({}, stats['misses'])])
+        yield ("flatwise_result_cache_evictions_total", "counter", "Ranked result cache evictions.",
+               [({}, stats['evictions'])])
+        yield ("flatwise_result_cache_bytes", "gauge", "Bytes held by the ranked result cache.", [({}, stats['bytes'])])
+
+    insight_generator = getattr(state, 'insight_generator', None)
+    if insight_generator is not None:
+        stats = insight_generator.cache_stats()
+        yield ("flatwise_bayes_queries_total", "counter",
+               "Posterior queries answered, by source (cache, compiled table or variable elimination).",
+               [({'source': 'cache'}, stats['hits']), ({'source': 'compiled'}, stats['compiled']),
+                ({'source': 'variable_elimination'}, stats['eliminated'])])
+        yield ("flatwise_bayes_cache_entries", "gauge", "Posteriors held in the query cache.", [({}, stats['size'])])
+
+    insight_table = getattr(state, 'insight_table', None)
+    if insight_table is not None:
+        yield ("flatwise_insight_table_lookups_total", "counter", "Insight table lookups by outcome.",
+               [({'outcome': 'hit'}, insight_table.hits), ({'outcome': 'miss'}, insight_table.misses)])
+
+    startup = getattr(state, 'startup', None)
+    if startup is not None:
+        progress = startup.progress()
+        yield ("flatwise_ready", "gauge", "1 once every startup stage has loaded.", [({}, int(progress['ready']))])
+        yield ("flatwise_startup_stage_seconds", "gauge", "Load time of each startup stage.",
+               [({'stage': name}, stage['seconds']) for name, stage in progress['stages'].items()])
+
+    executor = getattr(state, 'executor', None)
+    if executor is not None:
+        stats = executor.stats()
+        yield ("flatwise_executor_in_flight", "gauge", "Requests admitted to the executor, by phase.",
+               [({'phase': 'running'}, stats['running']), ({'phase': 'queued'}, stats['queued'])])
+        yield ("flatwise_executor_rejected_total", "counter", "Requests shed with 503.", [({}, stats['rejected'])])
+        yield ("flatwise_executor_timeouts_total", "counter", "Requests answered with 504.", [({}, stats['timeouts'])])
+
+REGISTRY.collect(collect_state_metrics)
 
 # ---------------------------
 # 4. Graceful Startup & State Management
 # ---------------------------
+def load_dataset_stage():
+    app.state.df = load_processed_dataset(DATASET_CSV_PATH, DATASET_STORE_PATH, mmap=DATASET_MMAP)
+    app.state.dataset_version = dataset_version(DATASET_CSV_PATH, DATASET_STORE_PATH)
+    # A fresh cache per load, so results from a previous dataset are never served
+    app.state.result_cache = ResultCache(max_bytes=int(RESULT_CACHE_MB * 1024 * 1024),
+                                         ttl_seconds=RESULT_CACHE_TTL_SEC)
+
+def load_flat_index_stage():
+    # Precompiled filter index (prebuilt in the store when available) so /recommend avoids full scans
+    app.state.flat_index = load_flat_index(app.state.df, DATASET_STORE_PATH, mmap=DATASET_MMAP)
+
+def load_bayesian_model_stage():
+    # Unpickling the network is also what imports pgmpy
+    app.state.bayesian_model = load_bayesian_model("BayesianNetwork.pkl")
+
+def load_categories_stage():
+    app.state.categories = get_categories_from_file("CategoricalColumnsCategories.pkl")
+
+def build_insight_generator_stage():
+    insight_generator = InsightGenerator(app.state.bayesian_model, app.state.categories,
+                                         cache_size=INSIGHT_CACHE_SIZE)
+    if INSIGHT_COMPILE:
+        compiled_bytes = insight_generator.compile_queries()
+        print(f"--- Compiled insight queries into {compiled_bytes / 1e6:.1f} MB of tables. ---")
+    app.state.insight_generator = insight_generator
+
+def warm_up_insights_stage():
+    warmed = app.state.insight_generator.warm_up(app.state.df, top_n=INSIGHT_WARMUP_COMBOS)
+    print(f"--- Insight cache warmed for {warmed} combinations: "
+          f"{app.state.insight_generator.cache_stats()} ---")
+
+def load_insight_table_stage():
+    app.state.insight_table = None
+    if os.path.isdir(INSIGHT_TABLE_PATH):
+        app.state.insight_table = InsightTable.load(INSIGHT_TABLE_PATH)
+        print(f"--- Loaded insight table with {len(app.state.insight_table)} combinations. ---")
+
+def load_mcda_criteria_stage():
+    with open("config/mcda_criteria.json") as f:
+        app.state.mcda_criteria = json.load(f)
+
+def report_startup(progress: dict):
+    timings = ", ".join(f"{name} {stage['seconds']}s" for name, stage in progress['stages'].items()
+                        if stage['seconds'] is not None)
+    errors = {name: stage['error'] for name, stage in progress['stages'].items() if 'error' in stage}
+    if progress['ready']:
+        print(f"--- Global state loaded successfully in {progress['elapsed_seconds']}s ({timings}). ---")
+        for name, error in errors.items():
+            print(f"WARNING: Optional startup stage {name} failed: {error}")
+    else:
+        print(f"FATAL ERROR: Failed to load models: {'; '.join(f'{name}: {error}' for name, error in errors.items())}")
+
 @app.on_event("startup")
 def load_global_state():
     """
-    Load all large models and data on startup.
-    This fails fast if a file is missing and avoids
-    reloading on every request.
+    Load all large models and data on startup, in background threads.
+    Independent stages load concurrently; each stage starts once the stages it
+    needs are loaded. /health answers immediately, /ready reports progress and
+    the data endpoints answer 503 until every required stage has loaded. The
+    optional insight cache warm-up runs after readiness and cannot block it.
     """
-    try:
-        app.state.df = pd.read_csv("ResaleFlatPricesData_processed.csv")
-        
-        app.state.insight_generator = InsightGenerator(
-            load_bayesian_model("BayesianNetwork.pkl"),
-            get_categories_from_file("CategoricalColumnsCategories.pkl")
-        )
-        
-        with open("config/mcda_criteria.json") as f:
-            app.state.mcda_criteria = json.load(f)
-            
-        print("--- Global state loaded successfully. ---")
-            
-    except FileNotFoundError as e:
-        print(f"FATAL ERROR: Missing required file: {e.fileName}")
-        # In a real app, you might want to exit or log this to a service
-        # For now, we'll let the app start, but endpoints will fail
-        app.state.df = None
-        # ... other states
-    except Exception as e:
-        print(f"FATAL ERROR: Failed to load models: {e}")
-        app.state.df = None
-        # ... other states
+    app.state.executor = WorkExecutor(max_workers=RECOMMEND_WORKERS, max_queue=RECOMMEND_MAX_QUEUE,
+                                      timeout_seconds=RECOMMEND_TIMEOUT_SEC)
+    startup = StartupStages(on_finish=report_startup)
+    startup.add("dataset", load_dataset_stage)
+    startup.add("flat_index", load_flat_index_stage, after=["dataset"])
+    startup.add("bayesian_model", load_bayesian_model_stage)
+    startup.add("categories", load_categories_stage)
+    startup.add("insight_generator", build_insight_generator_stage, after=["bayesian_model", "categories"])
+    if INSIGHT_WARMUP_COMBOS > 0:
+        # Only pre-fills the query cache, so the API is ready without it
+        startup.add("insight_warmup", warm_up_insights_stage, after=["dataset", "insight_generator"], optional=True)
+    startup.add("insight_table", load_insight_table_stage)
+    startup.add("mcda_criteria", load_mcda_criteria_stage)
+    app.state.startup = startup
+
+    startup.start()
+    if not STARTUP_BACKGROUND:
+        startup.wait()
+
+@app.on_event("shutdown")
+def stop_executor():
+    app.state.executor.shutdown()
 
 # ---------------------------
 # Helper
 # ---------------------------
+def require_ready():
+    """Raise 503 unless every required startup stage has loaded, with Retry-After while loading."""
+    startup = getattr(app.state, 'startup', None)
+    if startup is not None and not startup.ready:
+        if not startup.failed:
+            raise HTTPException(status_code=503, detail="Server is still loading data, retry shortly.",
+                                headers={"Retry-After": "1"})
+        raise HTTPException(status_code=503, detail="Server is not ready, required data files could not be loaded.")
+    if getattr(app.state, 'df', None) is None:
+        raise HTTPException(status_code=503, detail="Server is not ready, required data files could not be loaded.")
+
 def get_weights(priority: PriorityEnum, criteria: dict) -> dict:
     # Use the enum for robust checking
     if priority == PriorityEnum.price:
@@ -117,9 +326,296 @@ def get_weights(priority: PriorityEnum, criteria: dict) -> dict:
         # Equal weights if no priority
         return {key: 1/len(criteria) for key in criteria.keys()}
 
+def score_rows(state, filtered_df: pd.DataFrame, priority: PriorityEnum) -> np.ndarray:
+    """WSM score of every row of filtered_df, in row order (same scores as mcda_wsm)."""
+    criteria = state.mcda_criteria
+    with stage("score"):
+        return mcda_scores(filtered_df, criteria, get_weights(priority, criteria))
+
+class BatchContext:
+    """
+    Work shared between the requests of one /recommend/batch call: per-constraint
+    bitmaps, the criteria columns as one array, and the normalized criteria of each
+    distinct filtered set, so every priority over the same rows reuses one min/max pass.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.mask_cache = {}
+        self.normalized = {}
+        self._criteria_values = None
+
+    def filter_and_score(self, constraints: dict, priority: PriorityEnum) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels and scores of the matching rows, in row order, as filter_and_score without a batch."""
+        state = self.state
+        criteria = state.mcda_criteria
+        with stage("filter"):
+            mask = state.flat_index.filter_mask(constraints, mask_cache=self.mask_cache)
+            positions = np.flatnonzero(mask)
+        with stage("score"):
+            key = hashlib.sha1(np.packbits(mask).tobytes()).hexdigest()
+            norm = self.normalized.get(key)
+            if norm is None:
+                if self._criteria_values is None:
+                    self._criteria_values = state.df[list(criteria)].to_numpy(dtype=float)
+                norm = normalize_matrix(self._criteria_values[positions],
+                                        [spec['direction'] for spec in criteria.values()])
+                self.normalized[key] = norm
+            scores = weighted_scores(norm, criteria, get_weights(priority, criteria))
+        return state.df.index.to_numpy()[positions], scores
+
+def filter_and_score(state, constraints: dict, priority: PriorityEnum,
+                     batch: Optional[BatchContext] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Labels and WSM scores of every row matching the constraints, in row order."""
+    if batch is not None:
+        return batch.filter_and_score(constraints, priority)
+    with stage("filter"):
+        positions = np.flatnonzero(state.flat_index.filter_mask(constraints))
+    labels = state.df.index.to_numpy()[positions]
+    if len(positions) == 0:
+        return labels, np.array([], dtype=float)
+    # Only the criteria columns of the matching rows, not a copy of the filtered frame
+    criteria_rows = pd.DataFrame({col: state.df[col].to_numpy()[positions] for col in state.mcda_criteria})
+    return labels, score_rows(state, criteria_rows, priority)
+
+def get_ranked_result(state, constraints: dict, priority: PriorityEnum, end_index: int,
+                      batch: Optional[BatchContext] = None) -> RankedResult:
+    """
+    Ranked result set for a query covering at least its first end_index rows.
+
+    Served from the result cache when the cached prefix is long enough. On a miss
+    the rows are filtered and ranked; when only the prefix is too short, the
+    cached filtered rows are re-ranked to a longer prefix without filtering again.
+    """
+    key = result_key(constraints, priority.value, state.dataset_version)
+    result = state.result_cache.get(key)
+    if result is not None and result.covers(end_index):
+        return result
+
+    if result is None:
+        filtered_labels, all_scores = filter_and_score(state, constraints, priority, batch)
+        filtered_scores, ranked_so_far = None, 0
+    else:
+        filtered_labels, filtered_scores = result.filtered_labels, result.filtered_scores
+        all_scores = filtered_scores if filtered_scores is not None else \
+            score_rows(state, state.df.loc[filtered_labels], priority)
+        ranked_so_far = len(result.ranked_labels)
+
+    # Every row is scored but only the top_k are ranked (same order as mcda_wsm with top_k)
+    top_k = max(end_index, RESULT_CACHE_MIN_RANKED, 2 * ranked_so_far)
+    with stage("rank"):
+        positions = top_k_positions(all_scores, top_k)
+    result = RankedResult(filtered_labels, filtered_labels[positions], all_scores[positions], filtered_scores)
+    state.result_cache.put(key, result)
+    return result
+
+def get_scored_result(state, constraints: dict, priority: PriorityEnum) -> RankedResult:
+    """
+    Cached result set for a query with the score of every filtered row, as used
+    by cursor pagination. Reuses the cached filtered rows and ranked prefix when present.
+    """
+    key = result_key(constraints, priority.value, state.dataset_version)
+    result = state.result_cache.get(key)
+    if result is not None and result.filtered_scores is not None:
+        return result
+
+    if result is None:
+        filtered_labels, filtered_scores = filter_and_score(state, constraints, priority)
+        result = RankedResult(filtered_labels, filtered_labels[:0], np.array([], dtype=float))
+    else:
+        filtered_scores = score_rows(state, state.df.loc[result.filtered_labels], priority)
+
+    # A new entry rather than mutating the cached one, whose size the cache has accounted for
+    result = RankedResult(result.filtered_labels, result.ranked_labels, result.scores, filtered_scores)
+    state.result_cache.put(key, result)
+    return result
+
+def page_insights(state, page_df: pd.DataFrame) -> list:
+    """Insight summary per row: precomputed table lookup when available, else live inference."""
+    insight_generator = state.insight_generator
+    insight_table = state.insight_table
+    with stage("insights"):
+        if insight_table is not None:
+            return insight_table.get_insights_frame(
+                page_df, fallback=insight_generator if INSIGHT_TABLE_FALLBACK else None
+            )
+        return insight_generator.get_insights_batch(page_df)
+
+def build_page_frame(state, page_labels: np.ndarray, page_scores: np.ndarray,
+                     include_insights: bool = True) -> pd.DataFrame:
+    """Rows for the given labels with their score and, optionally, insight summary."""
+    # Pull the clean data for those rows and add the 'score' column
+    with stage("join"):
+        page_df = state.df.loc[page_labels].copy()
+        page_df['score'] = page_scores
+    if include_insights:
+        page_df["insight_summary"] = page_insights(state, page_df)
+    return page_df
+
+def build_page_records(state, page_labels: np.ndarray, page_scores: np.ndarray) -> list:
+    """Rows of one page with their score and insight summary, as JSON-ready records (NaN as None)."""
+    page_df = build_page_frame(state, page_labels, page_scores)
+    with stage("serialize"):
+        return frame_to_records(page_df)
+
+def iter_export_frames(state, labels: np.ndarray, scores: np.ndarray, include_insights: bool):
+    """Ranked rows in frames of EXPORT_CHUNK_ROWS; always yields at least one (possibly empty) frame."""
+    for start in range(0, max(len(labels), 1), EXPORT_CHUNK_ROWS):
+        end = start + EXPORT_CHUNK_ROWS
+        yield build_page_frame(state, labels[start:end], scores[start:end], include_insights)
+
+async def stream_on_executor(request: Request, chunks: Iterator[bytes]):
+    """
+    Advance a synchronous generator of encoded chunks on the executor, one chunk
+    per work item, so building and encoding each frame of an export stays off
+    the event loop. The export was admitted when it was ranked, so a chunk that
+    finds the executor saturated waits for a slot instead of cutting the body short.
+    """
+    executor = request.app.state.executor
+    while True:
+        try:
+            chunk = await executor.run(next, chunks, None)
+        except ExecutorSaturated:
+            await asyncio.sleep(0.05)
+            continue
+        if chunk is None:
+            return
+        yield chunk
+
+def page_response(request: Request, content: dict):
+    """
+    Response for one page of recommendations, encoded directly with the fast encoder.
+    Clients that send `Accept: application/x-ndjson` get a streamed body instead:
+    the remaining fields on the first line, then one recommendation per line.
+    """
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        fields = {name: value for name, value in content.items() if name != "recommendations"}
+        return StreamingResponse(ndjson_lines(fields, content["recommendations"]), media_type=NDJSON_MEDIA_TYPE)
+    with stage("serialize"):
+        return FastJSONResponse(content)
+
+async def run_work(request: Request, func, *args):
+    """
+    Run a synchronous work function on the bounded executor, off the event loop.
+    Sheds load with 503 when the executor is saturated and answers 504 when the
+    work does not finish within RECOMMEND_TIMEOUT_SEC.
+    """
+    try:
+        return await request.app.state.executor.run(func, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The request took too long to process.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error during recommendation: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An internal server error occurred: {str(e)}"
+        )
+
 # ---------------------------
-# Routes
+# Work functions (run on the executor)
 # ---------------------------
+def recommend_page(state, constraints: dict, priority: PriorityEnum, page: int) -> dict:
+    """Filter, rank and build one offset page of /recommend."""
+    # 1. Calculate page slice
+    start_index = (page - 1) * 10
+    end_index = page * 10
+
+    # 2. Filter and rank (or reuse the cached ranking of an identical query)
+    result = get_ranked_result(state, constraints, priority, end_index)
+    total_found = result.total_found
+    RESULT_ROWS.observe(total_found)
+    if total_found == 0:
+        return {"recommendations": [], "total_found": 0}
+
+    # 3. Get the rows for the *current page* from the ranked row labels
+    page_labels = result.ranked_labels[start_index:end_index]
+    if len(page_labels) == 0:
+        return {"recommendations": [], "total_found": total_found}
+
+    # 4. Pull the rows, scores and insights for the current page
+    top = build_page_records(state, page_labels, result.scores[start_index:end_index])
+
+    # 5. Return the 10 results AND the total number found
+    return {"recommendations": top, "total_found": total_found}
+
+def recommend_cursor_page(state, constraints: dict, priority: PriorityEnum, page_size: int,
+                          after: Optional[dict]) -> dict:
+    """The page_size best rows after the cursor position (or the first page), plus the next cursor."""
+    key = result_key(constraints, priority.value, state.dataset_version)
+    result = get_scored_result(state, constraints, priority)
+    total_found = result.total_found
+    RESULT_ROWS.observe(total_found)
+
+    # Positions within the filtered rows of the next page, best first. One extra
+    # row is selected to tell whether another page follows
+    scores, labels = result.filtered_scores, result.filtered_labels
+    with stage("rank"):
+        if after is None:
+            positions = top_k_positions(scores, page_size + 1)
+        else:
+            positions = top_k_after(scores, page_size + 1, after['score'], after['position'])
+    has_more = len(positions) > page_size
+    positions = positions[:page_size]
+    page_labels, page_scores = labels[positions], scores[positions]
+
+    if len(page_labels) == 0:
+        return {"recommendations": [], "total_found": total_found, "next_cursor": None}
+
+    top = build_page_records(state, page_labels, page_scores)
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(state.dataset_version, key, page_scores[-1], positions[-1])
+    return {"recommendations": top, "total_found": total_found, "next_cursor": next_cursor}
+
+def recommend_batch_pages(state, items: List[RecommendRequest]) -> dict:
+    """Pages of many /recommend requests, sharing work through a BatchContext."""
+    batch = BatchContext(state)
+    pages = []  # (total_found, page labels, page scores) per request
+    for item in items:
+        start_index, end_index = (item.page - 1) * 10, item.page * 10
+        result = get_ranked_result(state, item.constraints.dict(exclude_unset=True), item.priority,
+                                   end_index, batch=batch)
+        RESULT_ROWS.observe(result.total_found)
+        pages.append((result.total_found, result.ranked_labels[start_index:end_index],
+                      result.scores[start_index:end_index]))
+
+    # Rows and insights of every distinct flat on any page, computed once
+    all_labels = np.concatenate([labels for _, labels, _ in pages])
+    unique_labels, inverse = np.unique(all_labels, return_inverse=True)
+    with stage("join"):
+        shared_df = state.df.loc[unique_labels]
+    shared_insights = page_insights(state, shared_df) if len(shared_df) else []
+
+    # All pages as one frame, encoded in a single pass and split back per request
+    with stage("serialize"):
+        pages_df = shared_df.iloc[inverse].copy()
+        pages_df['score'] = np.concatenate([scores for _, _, scores in pages])
+        pages_df["insight_summary"] = [shared_insights[i] for i in inverse]
+        records = frame_to_records(pages_df)
+
+    results, offset = [], 0
+    for total_found, labels, _ in pages:
+        results.append({"recommendations": records[offset:offset + len(labels)], "total_found": total_found})
+        offset += len(labels)
+    return {"results": results}
+
+def rank_for_export(state, constraints: dict, priority: PriorityEnum) -> Tuple[np.ndarray, np.ndarray]:
+    """Labels and scores of every matching row in rank order (same order as /recommend)."""
+    result = get_scored_result(state, constraints, priority)
+    RESULT_ROWS.observe(result.total_found)
+    with stage("rank"):
+        order = top_k_positions(result.filtered_scores, result.total_found)
+    return result.filtered_labels[order], result.filtered_scores[order]
+
+
 # ---------------------------
 # Routes
 # ---------------------------
@@ -133,80 +629,101 @@ async def recommend(request_data: RecommendRequest, request: Request):
     """
     Main recommendation endpoint.
     Uses Pydantic model 'RecommendRequest' for automatic validation.
+    The work runs on the bounded executor, so the event loop stays responsive.
     """
     
-    if not hasattr(app.state, 'df') or app.state.df is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Server is not ready, required data files could not be loaded."
-        )
+    require_ready()
 
-    try:
-        df = request.app.state.df
-        criteria = request.app.state.mcda_criteria
-        insight_generator = request.app.state.insight_generator
-        
-        # 1. Get validated data
-        constraints = request_data.constraints.dict(exclude_unset=True)
-        priority = request_data.priority
-        page = request_data.page
-
-        # 2. Apply constraints
-        filtered_df, _ = csp_filter_flats(df, constraints)    
-        if filtered_df.empty:
-            return JSONResponse(content={"recommendations": [], "total_found": 0})
-
-        # --- FIX START: Order of operations ---
-        
-        # 3. Create a clean copy *before* MCDA
-        clean_df_for_insights = filtered_df.copy()
-        
-        # 4. Apply MCDA to get scores and rankings
-        weights = get_weights(priority, criteria)
-        ranked_df, _ = mcda_wsm(filtered_df, criteria, weights) 
-
-        # 5. Get total number of results *before* slicing
-        total_found = len(ranked_df)
-
-        # 6. Calculate page slice
-        start_index = (page - 1) * 10
-        end_index = page * 10
-        
-        # 7. Get the Top 10 rows for the *current page*
-        page_ranked_rows = ranked_df.iloc[start_index:end_index]
-        if page_ranked_rows.empty:
-             return JSONResponse(content={"recommendations": [], "total_found": total_found})
-
-        # 8. Get the *original* indices from the "index" column
-        page_original_indices = page_ranked_rows['index']
-        
-        # 9. Use these *original* indices to pull the clean data
-        page_df = clean_df_for_insights.loc[page_original_indices].copy()
-        
-        # 10. Manually add the 'score' column
-        page_df['score'] = page_ranked_rows['score'].values
-        
-        # --- FIX END ---
-
-        # 11. Generate insights (FAST: runs only 10 times)
-        page_df["insight_summary"] = [
-            insight_generator.get_insights_on_row(row)
-            for _, row in page_df.iterrows()
-        ]
-
-        # 12. Return the final data
-        top = page_df.to_dict(orient="records")
-        # Return the 10 results AND the total number found
-        return {"recommendations": top, "total_found": total_found}
+    constraints = request_data.constraints.dict(exclude_unset=True)
+    content = await run_work(request, recommend_page, request.app.state, constraints,
+                             request_data.priority, request_data.page)
+    return page_response(request, content)
 
-    except Exception as e:
-        print(f"Error during recommendation: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"An internal server error occurred: {str(e)}"
-        )
+@app.post("/recommend/cursor")
+async def recommend_cursor(request_data: CursorRecommendRequest, request: Request):
+    """
+    Cursor-paginated variant of /recommend for infinite scroll.
+    Each response carries `next_cursor` (null on the last page); sending it back
+    returns the next page_size rows after the last row seen, selected from the
+    remaining rows without re-sorting, so deep pages cost the same as the first.
+    A cursor from before a dataset reload is rejected with 409.
+    """
+    require_ready()
+
+    state = request.app.state
+    constraints = request_data.constraints.dict(exclude_unset=True)
+    priority = request_data.priority
+
+    after = None
+    if request_data.cursor:
+        key = result_key(constraints, priority.value, state.dataset_version)
+        try:
+            after = decode_cursor(request_data.cursor, state.dataset_version, key)
+        except StaleCursorError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except CursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    content = await run_work(request, recommend_cursor_page, state, constraints, priority,
+                             request_data.page_size, after)
+    return page_response(request, content)
+
+@app.post("/recommend/batch")
+async def recommend_batch(request_data: BatchRecommendRequest, request: Request):
+    """
+    Evaluate many /recommend requests in one call; results are returned in request order.
+
+    Work is shared across the batch: each distinct constraint's bitmap is built once,
+    criteria are normalized once per distinct filtered set (then weighted per
+    priority), repeated queries hit the result cache, and insights are computed
+    once per distinct flat across all pages.
+    """
+    require_ready()
+
+    content = await run_work(request, recommend_batch_pages, request.app.state, request_data.requests)
+    with stage("serialize"):
+        return FastJSONResponse(content)
+
+@app.post("/recommend/export")
+async def recommend_export(request_data: ExportRequest, request: Request):
+    """
+    Every flat matching the constraints, ranked, streamed as CSV, NDJSON or an
+    Arrow IPC stream. The query is filtered and scored once (or taken from the
+    result cache); rows are then materialized and encoded EXPORT_CHUNK_ROWS at a
+    time on the executor, so memory does not grow with the size of the export.
+    """
+    require_ready()
+
+    labels, scores = await run_work(request, rank_for_export, request.app.state,
+                                    request_data.constraints.dict(exclude_unset=True), request_data.priority)
+
+    export_format = request_data.format
+    frames = iter_export_frames(request.app.state, labels, scores, request_data.include_insights)
+    headers = {
+        "Content-Disposition": f'attachment; filename="recommendations.{FILE_EXTENSIONS[export_format]}"',
+        "X-Total-Found": str(len(labels))
+    }
+    return StreamingResponse(stream_on_executor(request, ENCODERS[export_format](frames)),
+                             media_type=MEDIA_TYPES[export_format], headers=headers)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in text exposition format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 @app.get("/health")
 async def health_check():
-    # A more robust health check would ping databases, etc.
-    return {"status": "ok"}
\ No newline at end of file
+    # Liveness only: answers while data is still loading (see /ready)
+    # Executor queue depth shows whether recommendation work is backing up
+    executor = getattr(app.state, 'executor', None)
+    return {"status": "ok", "executor": executor.stats() if executor is not None else None}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness with per-stage load progress; 503 until every required stage has loaded."""
+    startup = getattr(app.state, 'startup', None)
+    if startup is None:
+        progress = {'ready': getattr(app.state, 'df', None) is not None, 'stages': {}}
+    else:
+        progress = startup.progress()
+    return FastJSONResponse(progress, status_code=200 if progress['ready'] else 503)
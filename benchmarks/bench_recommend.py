@@ -0,0 +1,287 @@
+"""
+Benchmark of the /recommend pipeline on synthetic HDB-shaped datasets.
+
+Datasets of 10k, 100k, 1M and 10M rows are generated with the column types
+of the columnar dataset store, the towns, flat types and flat models of
+CategoricalColumnsCategories.pkl, the HDB storey ranges and the criteria
+columns of config/mcda_criteria.json. For each size and a fixed set of
+constraint mixes, it times csp_filter_flats (full scan and FlatIndex),
+mcda_wsm on the filtered rows and the end-to-end /recommend handler (result
+cache cleared before every run), plus InsightGenerator.get_insights_on_row
+on a sample of rows with a cold and a warm query cache.
+
+Every measurement is one record keyed by rows, mix and operation, with the
+best and median wall time and the peak memory allocated during one run
+(tracemalloc), so two result files from different commits can be compared
+with --baseline.
+
+Usage: python benchmarks/bench_recommend.py [--sizes 10000 100000 ...] [--repeat N]
+                                            [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if __name__ == "__main__" and not __package__:
+    # Allow `python benchmarks/bench_recommend.py` from the repository root
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import api
+from modules.bayes_utils import load_bayesian_model, get_categories_from_file
+from modules.csp_filter import csp_filter_flats
+from modules.executor import WorkExecutor
+from modules.flat_index import FlatIndex
+from modules.insight_generator import InsightGenerator
+from modules.mcda_wsm import mcda_wsm
+from modules.result_cache import ResultCache
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+STOREY_RANGES = [f"{low:02d} TO {low + 2:02d}" for low in range(1, 50, 3)]
+
+# Constraint mixes from broad to narrow, each with the priority it is ranked by
+MIXES = {
+    'unconstrained': ({}, "None - treat equally"),
+    'town_budget': ({'towns': ['BISHAN', 'BEDOK', 'TAMPINES'], 'max_price': 700000}, "Price"),
+    'family': ({'flat_types': ['4 ROOM', '5 ROOM'], 'min_remaining_lease': 60,
+                'storey_ranges': STOREY_RANGES[2:8]}, "Floor Area"),
+    'near_mrt': ({'max_mrt_distance': 0.5, 'max_price': 900000}, "Nearest MRT"),
+    'narrow': ({'towns': ['PUNGGOL'], 'flat_types': ['EXECUTIVE'], 'flat_models': ['APARTMENT', 'MAISONETTE'],
+                'min_remaining_lease': 80}, "Lease"),
+}
+
+INSIGHT_SAMPLE_ROWS = 20
+
+
+def load_categories() -> pd.DataFrame:
+    return get_categories_from_file(os.path.join(ROOT, "CategoricalColumnsCategories.pkl"))
+
+
+def make_dataset(n_rows: int, categories: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Synthetic processed dataset with the dtypes of the columnar store."""
+    rng = np.random.default_rng(seed)
+
+    def categorical(values, weights=None):
+        values = list(values)
+        p = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+        return pd.Categorical.from_codes(rng.choice(len(values), n_rows, p=p), categories=values)
+
+    towns = categories['town'].dropna().tolist()
+    flat_types = categories['flat_type'].dropna().tolist()
+    flat_models = [model.upper() for model in categories['flat_model'].dropna()]
+    # Mostly 3-5 room flats, as in the resale data
+    type_weights = [1, 5, 30, 40, 25, 8, 1][:len(flat_types)]
+
+    lease_commence = rng.integers(1966, 2020, n_rows).astype(np.int32)
+    remaining_years = np.clip(99 - (2024 - lease_commence) - rng.uniform(0, 1, n_rows), 40, 97).round(2)
+    months = np.rint(remaining_years * 12).astype(np.int64)
+    lease_months, lease_codes = np.unique(months, return_inverse=True)
+    remaining_lease = pd.Categorical.from_codes(
+        lease_codes, categories=[f"{m // 12} years {m % 12:02d} months" for m in lease_months])
+
+    floor_area = rng.uniform(31, 190, n_rows).round(1)
+    price = np.clip(floor_area * rng.normal(5500, 1200, n_rows) + remaining_years * 2000, 140000, 1650000)
+    dist_mrt = rng.uniform(0.05, 3.0, n_rows).astype(np.float32)
+    dist_mrt[rng.random(n_rows) < 0.02] = np.nan  # Flats without a station in the search radius
+
+    return pd.DataFrame({
+        'transaction_date': categorical([f"{y}-{m:02d}" for y in range(2017, 2025) for m in range(1, 13)]),
+        'town': categorical(towns),
+        'flat_type': categorical(flat_types, type_weights),
+        'block': rng.integers(1, 999, n_rows).astype(np.int32),
+        'street_name': categorical([f"STREET {i}" for i in range(500)]),
+        'storey_range': categorical(STOREY_RANGES, np.linspace(10, 1, len(STOREY_RANGES))),
+        'floor_area_sqm': floor_area,
+        'flat_model': categorical(flat_models),
+        'lease_commence_date': lease_commence,
+        'remaining_lease': remaining_lease,
+        'resale_price': price.astype(np.int32),
+        'remaining_lease_years': remaining_years,
+        'latitude': rng.uniform(1.27, 1.45, n_rows).astype(np.float32),
+        'longitude': rng.uniform(103.6, 104.0, n_rows).astype(np.float32),
+        'nearest_mrt': categorical([f"STATION {i} MRT STATION" for i in range(150)]),
+        'dist_mrt_km': dist_mrt,
+        'search_radius_km': np.full(n_rows, 3.0, dtype=np.float32),
+    })
+
+
+def measure(func, repeat: int) -> dict:
+    """Best and median wall time over repeat runs, then peak traced memory of one more run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'best_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'peak_mb': round(peak / 2 ** 20, 2)
+    }
+
+
+def install_state(df: pd.DataFrame, index: FlatIndex, insight_generator: InsightGenerator,
+                  criteria: dict, version: str):
+    """Point the app at the synthetic dataset without running its startup loader."""
+    state = api.app.state
+    state.df = df
+    state.flat_index = index
+    state.dataset_version = version
+    state.result_cache = ResultCache()
+    state.insight_generator = insight_generator
+    state.insight_table = None
+    state.mcda_criteria = criteria
+    if not hasattr(state, 'executor'):
+        state.executor = WorkExecutor(max_workers=1, max_queue=0, timeout_seconds=600)
+
+
+def bench_size(n_rows: int, repeat: int, categories: pd.DataFrame, insight_generator: InsightGenerator,
+               criteria: dict, client: TestClient) -> list:
+    records = []
+
+    def record(mix, operation, result, **extra):
+        records.append(dict(rows=n_rows, mix=mix, operation=operation, **result, **extra))
+
+    df = make_dataset(n_rows, categories)
+    print(f"{n_rows:>10,} rows: {df.memory_usage(deep=True).sum() / 2 ** 20:.1f} MB", file=sys.stderr)
+
+    index = None
+
+    def build_index():
+        nonlocal index
+        index = FlatIndex(df)
+
+    record(None, 'build_index', measure(build_index, 1))
+    install_state(df, index, insight_generator, criteria, f"bench-{n_rows}")
+
+    for mix, (constraints, priority) in MIXES.items():
+        filtered_df, _ = csp_filter_flats(df, constraints, index=index)
+        weights = api.get_weights(api.PriorityEnum(priority), criteria)
+        body = {'constraints': constraints, 'priority': priority, 'page': 1}
+
+        def recommend():
+            api.app.state.result_cache.clear()
+            response = client.post('/recommend', json=body)
+            assert response.status_code == 200, response.text
+
+        matched = {'matched': len(filtered_df)}
+        record(mix, 'csp_filter_scan', measure(lambda: csp_filter_flats(df, constraints), repeat), **matched)
+        record(mix, 'csp_filter_index', measure(lambda: csp_filter_flats(df, constraints, index=index), repeat),
+               **matched)
+        record(mix, 'mcda_wsm', measure(lambda: mcda_wsm(filtered_df, criteria, weights), repeat), **matched)
+        record(mix, 'recommend', measure(recommend, repeat), **matched)
+
+    # Insight cost depends on the rows, not the dataset size; sampled rows are spread over the whole frame
+    sample = df.iloc[np.linspace(0, n_rows - 1, INSIGHT_SAMPLE_ROWS).astype(int)]
+
+    def insights():
+        for _, row in sample.iterrows():
+            insight_generator.get_insights_on_row(row)
+
+    def cold_insights():
+        insight_generator.clear_cache()
+        insights()
+
+    record(None, 'insights_cold', measure(cold_insights, 1), sample_rows=INSIGHT_SAMPLE_ROWS)
+    record(None, 'insights_warm', measure(insights, repeat), sample_rows=INSIGHT_SAMPLE_ROWS)
+    return records
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat: int) -> dict:
+    categories = load_categories()
+    insight_generator = InsightGenerator(load_bayesian_model(os.path.join(ROOT, "BayesianNetwork.pkl")), categories)
+    if api.INSIGHT_COMPILE:
+        insight_generator.compile_queries()
+    with open(os.path.join(ROOT, "config", "mcda_criteria.json")) as f:
+        criteria = json.load(f)
+
+    client = TestClient(api.app)
+    results = []
+    for n_rows in sizes:
+        results.extend(bench_size(n_rows, repeat, categories, insight_generator, criteria, client))
+    api.app.state.executor.shutdown()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            # ru_maxrss is in kilobytes on Linux
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        },
+        'results': results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Measurements whose best time grew by more than threshold (a fraction) against the baseline."""
+    key = lambda r: (r['rows'], r['mix'], r['operation'])
+    previous = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        before = previous.get(key(r))
+        if before and before['best_ms'] > 0 and r['best_ms'] > before['best_ms'] * (1 + threshold):
+            regressions.append({'rows': r['rows'], 'mix': r['mix'], 'operation': r['operation'],
+                                'baseline_ms': before['best_ms'], 'current_ms': r['best_ms'],
+                                'ratio': round(r['best_ms'] / before['best_ms'], 2)})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /recommend pipeline on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Dataset sizes in rows")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best and median reported)")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown reported as a regression with --baseline")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if report.get('regressions'):
+        for r in report['regressions']:
+            print(f"REGRESSION {r['operation']} rows={r['rows']} mix={r['mix']}: "
+                  f"{r['baseline_ms']} -> {r['current_ms']} ms ({r['ratio']}x)", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,121 @@
+"""
+Benchmark of /recommend response encoding on 10, 100 and 1000-row pages.
+
+Compares the previous path (DataFrame.to_dict records, FastAPI's
+jsonable_encoder, then JSONResponse's json.dumps) against the column-wise
+records plus fast encoder of modules.serialization, and its NDJSON variant.
+Pages use the column types of the columnar dataset store and structured
+insight summaries; NaN distances are left out because the previous path
+cannot encode them at all.
+
+Usage: python benchmarks/bench_serialization.py [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+if __name__ == "__main__" and not __package__:
+    # Allow `python benchmarks/bench_serialization.py` from the repository root
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from modules import serialization
+from modules.serialization import FastJSONResponse, frame_to_records, ndjson_lines
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def make_page(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic recommendation page with the dtypes of the columnar store."""
+    rng = np.random.default_rng(seed)
+    towns = ['ANG MO KIO', 'BEDOK', 'BISHAN', 'TAMPINES', 'WOODLANDS']
+    flat_types = ['3 ROOM', '4 ROOM', '5 ROOM']
+    df = pd.DataFrame({
+        'transaction_date': pd.Categorical(rng.choice(['2023-01', '2023-02', '2023-03'], n_rows)),
+        'town': pd.Categorical(rng.choice(towns, n_rows)),
+        'flat_type': pd.Categorical(rng.choice(flat_types, n_rows)),
+        'block': rng.integers(1, 999, n_rows).astype(np.int32),
+        'street_name': pd.Categorical([f"STREET {i % 50}" for i in range(n_rows)]),
+        'storey_range': pd.Categorical(rng.choice(['01 TO 03', '04 TO 06', '07 TO 09'], n_rows)),
+        'floor_area_sqm': rng.uniform(60, 130, n_rows).round(1),
+        'flat_model': pd.Categorical(rng.choice(['IMPROVED', 'MODEL A', 'NEW GENERATION'], n_rows)),
+        'lease_commence_date': rng.integers(1970, 2020, n_rows).astype(np.int32),
+        'remaining_lease': pd.Categorical(rng.choice(['61 years 04 months', '75 years'], n_rows)),
+        'resale_price': rng.integers(250000, 1200000, n_rows).astype(np.int32),
+        'remaining_lease_years': rng.uniform(40, 95, n_rows).round(2),
+        'latitude': rng.uniform(1.27, 1.45, n_rows).astype(np.float32),
+        'longitude': rng.uniform(103.6, 104.0, n_rows).astype(np.float32),
+        'nearest_mrt': pd.Categorical(rng.choice(['BISHAN MRT STATION', 'BEDOK MRT STATION'], n_rows)),
+        'dist_mrt_km': rng.uniform(0.1, 3.0, n_rows).astype(np.float32),
+        'search_radius_km': np.full(n_rows, 2.0, dtype=np.float32),
+        'score': rng.uniform(0, 10, n_rows).round(2)
+    }, index=rng.choice(10 * n_rows, n_rows, replace=False))
+    df['insight_summary'] = [
+        {'tiers': {'value': 'Good', 'lease': 'Average', 'floor_area': 'Bad'},
+         'text': 'Best value for 4 ROOM in BISHAN'}
+        for _ in range(n_rows)
+    ]
+    return df
+
+
+def encode_previous(page_df: pd.DataFrame) -> bytes:
+    content = {"recommendations": page_df.to_dict(orient="records"), "total_found": len(page_df)}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def encode_fast(page_df: pd.DataFrame) -> bytes:
+    content = {"recommendations": frame_to_records(page_df), "total_found": len(page_df)}
+    return FastJSONResponse(content).body
+
+
+def encode_ndjson(page_df: pd.DataFrame) -> bytes:
+    return b"".join(ndjson_lines({"total_found": len(page_df)}, frame_to_records(page_df)))
+
+
+def best_time(func, page_df: pd.DataFrame, repeat: int) -> float:
+    """Best wall time over repeat runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(page_df)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def run(repeat: int) -> list:
+    paths = {'previous': encode_previous, 'fast_json': encode_fast, 'ndjson': encode_ndjson}
+    results = []
+    for n_rows in PAGE_SIZES:
+        page_df = make_page(n_rows)
+        # Both paths must produce the same document before their speed is compared
+        assert json.loads(encode_previous(page_df)) == json.loads(encode_fast(page_df))
+        row = {'rows': n_rows, 'bytes': len(encode_fast(page_df))}
+        for name, func in paths.items():
+            row[f'{name}_ms'] = round(best_time(func, page_df, repeat), 3)
+        row['speedup'] = round(row['previous_ms'] / row['fast_json_ms'], 1)
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /recommend response encoding.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (best is reported)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps({'orjson': serialization.orjson is not None, 'results': results}, indent=2))
+    else:
+        print(f"Encoder: {'orjson' if serialization.orjson is not None else 'json (orjson not installed)'}")
+        print(f"{'rows':>6} {'bytes':>9} {'previous ms':>12} {'fast ms':>9} {'ndjson ms':>10} {'speedup':>8}")
+        for row in results:
+            print(f"{row['rows']:>6} {row['bytes']:>9} {row['previous_ms']:>12} {row['fast_json_ms']:>9} "
+                  f"{row['ndjson_ms']:>10} {row['speedup']:>7}x")
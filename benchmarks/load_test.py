@@ -0,0 +1,318 @@
+"""
+Load test of the API against a synthetic dataset on localhost.
+
+A synthetic dataset (see bench_recommend.make_dataset) is written to a
+temporary columnar store and served either by uvicorn in a subprocess
+(default) or in-process through httpx's ASGI transport (--in-process),
+configured through the same DATASET_* environment variables as a real
+deployment. Any other setting (RECOMMEND_MAX_QUEUE, RESULT_CACHE_MB, ...)
+is inherited from the environment.
+
+Virtual users replay what the frontend does: a search on /recommend/cursor
+followed by "load more" pages along next_cursor, sometimes scrolling deep,
+mixed with offset page jumps on /recommend. Searches are drawn from a pool
+with a skewed popularity, so repeated queries hit the caches as they would
+in production. Each concurrency level runs for a fixed time and reports
+throughput, p50/p95/p99 latency and the error rate, overall and per endpoint.
+
+Usage: python benchmarks/load_test.py [--rows N] [--concurrency 1 4 16 64] [--duration S]
+                                      [--workers N] [--in-process] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if __name__ == "__main__" and not __package__:
+    # Allow `python benchmarks/load_test.py` from the repository root
+    sys.path.insert(0, ROOT)
+
+import httpx
+import numpy as np
+
+PRIORITIES = ["Price", "Floor Area", "Lease", "Nearest MRT", "None - treat equally"]
+
+# Share of sessions that scroll with cursors (the rest jump to an offset page), and
+# of scrolling sessions that keep loading pages far past the first few
+SCROLL_SHARE = 0.7
+DEEP_SCROLL_SHARE = 0.1
+MAX_DEEP_PAGES = 50
+# Pause after a failed request, so shed users do not retry in a tight loop
+ERROR_BACKOFF_SEC = 0.5
+
+
+def make_queries(n_queries: int, categories, storey_ranges, seed: int = 0) -> list:
+    """Pool of searches shaped like the frontend's form: a few multi-selects plus optional limits."""
+    rng = random.Random(seed)
+    towns = categories['town'].dropna().tolist()
+    flat_types = categories['flat_type'].dropna().tolist()
+    flat_models = [model.upper() for model in categories['flat_model'].dropna()]
+
+    queries = []
+    for _ in range(n_queries):
+        constraints = {'towns': rng.sample(towns, rng.randint(1, 4))}
+        if rng.random() < 0.7:
+            constraints['flat_types'] = rng.sample(flat_types[2:6], rng.randint(1, 2))
+        if rng.random() < 0.6:
+            constraints['max_price'] = rng.randrange(400000, 1200001, 50000)
+        if rng.random() < 0.4:
+            constraints['min_remaining_lease'] = rng.randrange(50, 86, 5)
+        if rng.random() < 0.3:
+            constraints['max_mrt_distance'] = rng.choice([0.5, 1.0, 1.5, 2.0])
+        if rng.random() < 0.2:
+            constraints['storey_ranges'] = rng.sample(storey_ranges, rng.randint(2, 6))
+        if rng.random() < 0.1:
+            constraints['flat_models'] = rng.sample(flat_models, rng.randint(1, 3))
+        queries.append({'constraints': constraints, 'priority': rng.choice(PRIORITIES)})
+    return queries
+
+
+class LevelStats:
+    """Outcomes of the requests started during one concurrency level."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> seconds, successful requests only
+        self.statuses = defaultdict(Counter)  # endpoint -> status code (or exception name) -> count
+
+    def add(self, endpoint: str, status, seconds: float):
+        self.statuses[endpoint][status] += 1
+        if status == 200:
+            self.latencies[endpoint].append(seconds)
+
+    @staticmethod
+    def summarize(latencies: list, statuses: Counter, elapsed: float) -> dict:
+        total = sum(statuses.values())
+        errors = total - statuses.get(200, 0)
+        summary = {
+            'requests': total,
+            'throughput_rps': round(statuses.get(200, 0) / elapsed, 2),
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        }
+        if latencies:
+            p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+            summary.update(p50_ms=round(p50, 2), p95_ms=round(p95, 2), p99_ms=round(p99, 2),
+                           max_ms=round(max(latencies) * 1000, 2))
+        return summary
+
+    def report(self, concurrency: int, elapsed: float) -> dict:
+        all_latencies = [s for latencies in self.latencies.values() for s in latencies]
+        all_statuses = sum(self.statuses.values(), Counter())
+        report = {'concurrency': concurrency, 'elapsed_s': round(elapsed, 2)}
+        report.update(self.summarize(all_latencies, all_statuses, elapsed))
+        report['endpoints'] = {endpoint: self.summarize(self.latencies[endpoint], statuses, elapsed)
+                               for endpoint, statuses in sorted(self.statuses.items())}
+        return report
+
+
+async def timed_post(client: httpx.AsyncClient, stats: LevelStats, endpoint: str, body: dict):
+    """Post body and record the outcome; returns the decoded response, or None after a backoff on failure."""
+    start = time.perf_counter()
+    try:
+        response = await client.post(endpoint, json=body)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    stats.add(endpoint, status, time.perf_counter() - start)
+    if status != 200:
+        await asyncio.sleep(ERROR_BACKOFF_SEC)
+        return None
+    return response.json()
+
+
+async def virtual_user(client: httpx.AsyncClient, queries: list, weights: list, deadline: float,
+                       stats: LevelStats, rng: random.Random):
+    while time.perf_counter() < deadline:
+        query = rng.choices(queries, weights)[0]
+        if rng.random() < SCROLL_SHARE:
+            # Search, then "load more" like the frontend until the user stops or the results end
+            pages = (rng.randint(20, MAX_DEEP_PAGES) if rng.random() < DEEP_SCROLL_SHARE
+                     else min(int(rng.expovariate(1 / 2)) + 1, MAX_DEEP_PAGES))
+            cursor = None
+            for _ in range(pages):
+                if time.perf_counter() >= deadline:
+                    break
+                data = await timed_post(client, stats, "/recommend/cursor", dict(query, cursor=cursor))
+                cursor = data.get("next_cursor") if data else None
+                if not cursor:
+                    break
+        else:
+            page = rng.choice([1, 2, 3, rng.randint(4, 20), rng.randint(20, 200)])
+            await timed_post(client, stats, "/recommend", dict(query, page=page))
+
+
+async def run_level(client: httpx.AsyncClient, queries: list, weights: list, concurrency: int,
+                    duration: float, seed: int) -> dict:
+    stats = LevelStats()
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        virtual_user(client, queries, weights, deadline, stats, random.Random(seed * 1000 + user))
+        for user in range(concurrency)
+    ))
+    return stats.report(concurrency, time.perf_counter() - start)
+
+
+async def run_levels(client: httpx.AsyncClient, queries: list, levels: list, duration: float,
+                     warmup: float, seed: int) -> list:
+    # Zipf-like popularity: a few searches are repeated often, most are rare
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    if warmup > 0:
+        await run_level(client, queries, weights, max(levels), warmup, seed)
+    results = []
+    for concurrency in levels:
+        report = await run_level(client, queries, weights, concurrency, duration, seed)
+        print_level(report)
+        results.append(report)
+    return results
+
+
+def print_level(report: dict):
+    latency = (f"p50 {report['p50_ms']:>8} ms  p95 {report['p95_ms']:>8} ms  p99 {report['p99_ms']:>8} ms"
+               if 'p50_ms' in report else "no successful requests")
+    print(f"concurrency {report['concurrency']:>4}: {report['throughput_rps']:>8} req/s  {latency}  "
+          f"errors {report['error_rate']:.2%} {report['statuses']}", file=sys.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float):
+    """Poll /ready until every startup stage has loaded, failing fast if one of them fails."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} during startup")
+        try:
+            response = httpx.get(f"{base_url}/ready", timeout=1)
+            if response.status_code == 200:
+                return
+            errors = {name: stage['error'] for name, stage in response.json()['stages'].items()
+                      if 'error' in stage and not stage.get('optional')}
+            if errors:
+                raise RuntimeError(f"Server failed to load: {errors}")
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server was not ready within {timeout}s")
+
+
+async def check_ready(client: httpx.AsyncClient):
+    response = await client.post("/recommend", json={'constraints': {}, 'page': 1})
+    if response.status_code != 200:
+        raise RuntimeError(f"Server is up but /recommend answered {response.status_code}: {response.text}")
+
+
+async def drive(base_url: str, queries: list, args, transport=None) -> list:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                 timeout=args.request_timeout) as client:
+        await check_ready(client)
+        return await run_levels(client, queries, args.concurrency, args.duration, args.warmup, args.seed)
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            'DATASET_STORE_PATH': os.path.join(tmpdir, "store"),
+            'DATASET_CSV_PATH': os.path.join(tmpdir, "missing.csv"),
+            # No precomputed insight table for synthetic data: insights come from live inference
+            'INSIGHT_TABLE_PATH': os.path.join(tmpdir, "no_insight_table"),
+        }
+        if args.executor_workers:
+            env['RECOMMEND_WORKERS'] = str(args.executor_workers)
+        os.environ.update(env)
+
+        # Imported after the environment is set, since api reads its settings at import
+        from benchmarks.bench_recommend import STOREY_RANGES, load_categories, make_dataset
+        from modules.dataset_store import save_dataset
+
+        categories = load_categories()
+        print(f"Writing a synthetic dataset of {args.rows:,} rows", file=sys.stderr)
+        save_dataset(make_dataset(args.rows, categories, seed=args.seed), env['DATASET_STORE_PATH'])
+        queries = make_queries(args.queries, categories, STOREY_RANGES, seed=args.seed)
+
+        if args.in_process:
+            # api reads its model and config files relative to the repository root, as uvicorn is run below
+            cwd = os.getcwd()
+            os.chdir(ROOT)
+            try:
+                import api
+                api.load_global_state()
+                if not api.app.state.startup.wait(args.startup_timeout):
+                    raise RuntimeError(f"Server failed to load: {api.app.state.startup.progress()}")
+                try:
+                    transport = httpx.ASGITransport(app=api.app)
+                    results = asyncio.run(drive("http://testserver", queries, args, transport=transport))
+                finally:
+                    api.stop_executor()
+            finally:
+                os.chdir(cwd)
+        else:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=ROOT, env=dict(os.environ)
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_until_ready(base_url, server, args.startup_timeout)
+                results = asyncio.run(drive(base_url, queries, args))
+            finally:
+                server.terminate()
+                server.wait(30)
+
+    return {
+        'config': {
+            'rows': args.rows,
+            'mode': 'in-process' if args.in_process else 'uvicorn',
+            'uvicorn_workers': None if args.in_process else args.workers,
+            'executor_workers': os.environ.get('RECOMMEND_WORKERS'),
+            'duration_s': args.duration,
+            'queries': args.queries,
+            'seed': args.seed,
+            'cpu_count': os.cpu_count()
+        },
+        'levels': results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API on a synthetic dataset.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic dataset size")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Concurrent virtual users per level")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of untimed load before the first level")
+    parser.add_argument("--queries", type=int, default=200, help="Distinct searches in the pool")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--executor-workers", type=int, help="RECOMMEND_WORKERS threads per process")
+    parser.add_argument("--in-process", action="store_true", help="Serve through the ASGI transport, no uvicorn")
+    parser.add_argument("--request-timeout", type=float, default=60, help="Client timeout per request in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    # One log line per request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
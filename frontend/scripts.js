@@ -1,6 +1,6 @@
 // --- App State ---
 let currentRecommendations = []; // Holds ALL flats shown so far
-let currentPage = 1;
+let currentCursor = null; // Opaque cursor for the next page from /recommend/cursor
 let totalFound = 0;
 let isLoadingMore = false;
 let currentConstraints = {};
@@ -349,7 +349,7 @@ async function fetchRecommendations() {
     isLoadingMore = true;
 
     // Reset state for a new search
-    currentPage = 1;
+    currentCursor = null;
     currentRecommendations = [];
     document.getElementById('results-container').innerHTML = '<div class="text-center py-10"><i class="fas fa-spinner fa-spin fa-2x text-blue-500"></i></div>';
     document.getElementById('loader-container').innerHTML = '';
@@ -389,13 +389,13 @@ async function fetchPageData(overwrite) {
     }
 
     try {
-        const response = await fetch("http://127.0.0.1:8000/recommend", {
+        const response = await fetch("http://127.0.0.1:8000/recommend/cursor", {
             method: "POST",
             headers: {"Content-Type": "application/json"},
             body: JSON.stringify({ 
                 constraints: currentConstraints, 
                 priority: currentPriority, 
-                page: currentPage 
+                cursor: currentCursor
             })
         });
 
@@ -404,6 +404,7 @@ async function fetchPageData(overwrite) {
         const data = await response.json();
         const newFlats = data.recommendations || [];
         totalFound = data.total_found || 0;
+        currentCursor = data.next_cursor;
 
         if (overwrite) {
             currentRecommendations = newFlats;
@@ -685,6 +686,5 @@ function renderFlats(flats, overwrite) {
 // NEW: Function to be called by the "See More" button
 async function seeMore() {
     if (isLoadingMore) return;
-    currentPage++;
     await fetchPageData(false); // false = append
 }
\ No newline at end of file
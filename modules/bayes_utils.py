@@ -1,13 +1,14 @@
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
 
 import pandas as pd
 import pickle
 import numpy as np
 
-from pgmpy.inference import VariableElimination
-from pgmpy.factors.discrete import TabularCPD
+if TYPE_CHECKING:
+    # pgmpy takes seconds to import; unpickling the model imports it when it is first needed
+    from pgmpy.inference import VariableElimination
 
-def load_bayesian_model(model_path: str) -> VariableElimination:
+def load_bayesian_model(model_path: str) -> "VariableElimination":
     """Load the Bayesian network model from a pickle file."""
     with open(model_path, "rb") as file:
         model = pickle.load(file)
@@ -43,6 +44,32 @@ def convert_numeric_to_interval(input_df: pd.Series, categories_df: pd.DataFrame
     return input_df
 
 
+def interval_codes(values: np.ndarray, categories: list[pd.Interval]) -> np.ndarray:
+    """
+    Vectorized counterpart of convert_numeric_to_interval for a whole column.
+
+    Args:
+        values (np.ndarray): Numeric values to discretize.
+        categories (list[pd.Interval]): Non-overlapping intervals of the column.
+
+    Returns:
+        np.ndarray: Position in categories of the interval with left <= value < right
+                    for each value, or -1 when no interval fits (including NaN).
+    """
+    values = np.asarray(values, dtype=float)
+    lefts = np.array([c.left for c in categories], dtype=float)
+    rights = np.array([c.right for c in categories], dtype=float)
+    order = np.argsort(lefts, kind='stable')
+
+    pos = np.searchsorted(lefts[order], values, side='right') - 1
+    in_range = pos >= 0
+    codes = np.full(len(values), -1, dtype=np.int64)
+    candidate = order[pos[in_range]]
+    fits = values[in_range] < rights[candidate]
+    codes[np.flatnonzero(in_range)[fits]] = candidate[fits]
+    return codes
+
+
 def get_lease_cats(lease_category: pd.Series, setpoint: pd.Interval, 
                    comparison: Literal['gte', 'lte'] = 'gte') -> list[pd.Interval]:
     cats = []
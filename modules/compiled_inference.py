@@ -0,0 +1,127 @@
+"""
+Compiled conditional probability tables for fixed Bayesian network queries.
+
+InsightGenerator only ever asks for one target variable given one fixed set
+of evidence variables, so each of these query shapes can be answered from a
+table computed once at load time instead of a variable elimination per call.
+Evidence variables that are d-separated from the target are pruned first.
+When the requisite evidence is exactly the target's parents, the table is the
+target's own CPD; otherwise the joint P(target, requisite evidence) is
+computed with a single elimination and normalized over the target axis. A
+query becomes an index into a dense array by evidence state codes.
+
+In a normalized joint, evidence combinations of probability zero have no
+defined conditional; those cells are left NaN and the caller falls back to
+variable elimination, so the compiled answers match
+VariableElimination.query everywhere.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Tables above this many cells are not compiled; their queries keep using elimination
+DEFAULT_MAX_CELLS = 20_000_000
+
+
+def requisite_evidence(network, target: str, evidence_vars: Iterable[str]) -> List[str]:
+    """
+    Evidence variables the target's posterior actually depends on. Variables are
+    dropped one at a time while the target is d-separated from them given the
+    evidence that remains, so every removal keeps the posterior unchanged.
+    """
+    remaining = list(evidence_vars)
+    for var in list(remaining):
+        others = [v for v in remaining if v != var]
+        if not network.is_dconnected(target, var, observed=others):
+            remaining = others
+    return remaining
+
+
+class ConditionalTable:
+    """P(target | evidence) as an array indexed by evidence state codes, target last."""
+
+    def __init__(self, target: str, evidence_vars: List[str], values: np.ndarray,
+                 state_names: Dict[str, list]):
+        self.target = target
+        self.evidence_vars = evidence_vars
+        self.values = values
+        self.target_states = state_names[target]
+        self.codes = {var: {state: i for i, state in enumerate(state_names[var])} for var in evidence_vars}
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def lookup(self, evidence: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Posterior over target_states, or None for unknown states and zero-probability evidence."""
+        try:
+            index = tuple(self.codes[var][evidence[var]] for var in self.evidence_vars)
+        except (KeyError, TypeError):
+            return None
+        values = self.values[index]
+        return None if np.isnan(values[0]) else values
+
+
+def compile_conditional(inference, target: str, evidence_vars: Iterable[str],
+                        max_cells: int = DEFAULT_MAX_CELLS) -> Optional[ConditionalTable]:
+    """
+    Compile P(target | evidence_vars) from a pgmpy VariableElimination object.
+    Returns None when the table would exceed max_cells.
+    """
+    network = inference.model
+    requisite = requisite_evidence(network, target, evidence_vars)
+    variables = requisite + [target]
+    state_names = {var: list(network.get_cpds(var).state_names[var]) for var in variables}
+    if np.prod([len(state_names[var]) for var in variables], dtype=np.int64) > max_cells:
+        return None
+
+    cpd = network.get_cpds(target)
+    if set(requisite) == set(cpd.variables[1:]):
+        # Defined even where the parents have probability zero, as elimination returns it
+        factor, normalize = cpd, False
+    else:
+        factor, normalize = inference.query(variables=variables, joint=True, show_progress=False), True
+
+    # Reorder axes and states to (requisite..., target) in the network's state order
+    values = np.moveaxis(factor.values, [factor.variables.index(var) for var in variables],
+                         range(len(variables)))
+    for axis, var in enumerate(variables):
+        order = [factor.state_names[var].index(state) for state in state_names[var]]
+        values = np.take(values, order, axis=axis)
+    if normalize:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = values / values.sum(axis=-1, keepdims=True)
+
+    values = np.ascontiguousarray(values)
+    values.setflags(write=False)  # Rows are handed out as views
+    return ConditionalTable(target, requisite, values, state_names)
+
+
+class CompiledQueries:
+    """Compiled tables keyed by (target, evidence variables) of the query shapes they answer."""
+
+    def __init__(self, tables: Dict[Tuple[str, frozenset], ConditionalTable]):
+        self.tables = tables
+
+    @classmethod
+    def compile(cls, inference, signatures: Iterable[Tuple[str, Iterable[str]]],
+                max_cells: int = DEFAULT_MAX_CELLS) -> "CompiledQueries":
+        tables = {}
+        for target, evidence_vars in signatures:
+            table = compile_conditional(inference, target, evidence_vars, max_cells)
+            if table is not None:
+                tables[(target, frozenset(evidence_vars))] = table
+        return cls(tables)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self.tables.values())
+
+    def query(self, variable: str, evidence: Dict[str, Any]) -> Optional[Tuple[np.ndarray, list]]:
+        """(values, state_names) like a VariableElimination posterior, or None if not compiled."""
+        table = self.tables.get((variable, frozenset(evidence)))
+        if table is None:
+            return None
+        values = table.lookup(evidence)
+        return None if values is None else (values, table.target_states)
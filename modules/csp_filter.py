@@ -3,6 +3,8 @@ import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 import time
 
+from modules.flat_index import FlatIndex
+
 def create_price_mask(df: pd.DataFrame, 
                      min_price: Optional[float] = None,
                      max_price: Optional[float] = None) -> pd.Series:
@@ -85,26 +87,12 @@ def create_mrt_distance_mask(df: pd.DataFrame,
 
     return mask
 
-def csp_filter_flats(df: pd.DataFrame,
+def create_combined_mask(df: pd.DataFrame,
                          constraints: Dict[str, Any],
-                         verbose: bool = False) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+                         verbose: bool = False) -> pd.Series:
     """
-    Filters HDB flats by applying all CSP constraints sequentially.
-    
-    Args:
-        df: Preprocessed HDB dataframe
-        constraints: Dictionary of filtering constraints
-        verbose: Print filtering statistics if True
-        
-    Returns:
-        Tuple of (filtered_dataframe, statistics_dict)
+    Builds the combined boolean mask by applying each CSP constraint sequentially.
     """
-    start_time = time.time()
-    initial_count = len(df)
-    
-    if verbose:
-        print(f"Starting with {initial_count} flats")
-    
     combined_mask = pd.Series([True] * len(df), index=df.index)
     
     # 1. Price constraint
@@ -173,13 +161,57 @@ def csp_filter_flats(df: pd.DataFrame,
         combined_mask &= model_mask
         if verbose:
             print(f"After flat model filter: {combined_mask.sum()} flats remaining")
+
+    return combined_mask
+
+
+def csp_filter_flats(df: pd.DataFrame,
+                         constraints: Dict[str, Any],
+                         verbose: bool = False,
+                         index: Optional[FlatIndex] = None,
+                         mask_cache: Optional[Dict[tuple, np.ndarray]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Filters HDB flats by applying all CSP constraints sequentially.
+    
+    Args:
+        df: Preprocessed HDB dataframe
+        constraints: Dictionary of filtering constraints
+        verbose: Print filtering statistics if True; otherwise only the result counts
+                 are computed, not the price, distance and town statistics
+        index: Optional FlatIndex prebuilt over df; uses bitmap/range lookups instead of full scans
+        mask_cache: Optional dict shared between calls so each distinct constraint's bitmap
+                    is computed once (only used with an index)
+        
+    Returns:
+        Tuple of (filtered_dataframe, statistics_dict)
+    """
+    start_time = time.time()
+    initial_count = len(df)
+    
+    if verbose:
+        print(f"Starting with {initial_count} flats")
+
+    if index is not None:
+        if index.n_rows != len(df):
+            raise ValueError(f"FlatIndex was built for {index.n_rows} rows but dataframe has {len(df)}")
+        combined_mask = index.filter_mask(constraints, mask_cache=mask_cache)
+        if verbose:
+            print(f"After indexed filter: {combined_mask.sum()} flats remaining")
+    else:
+        combined_mask = create_combined_mask(df, constraints, verbose)
     
     df_filtered = df[combined_mask].copy()
 
     end_time = time.time()
     elapsed_time = end_time - start_time
 
-    stats = get_filter_statistics(df, df_filtered)
+    if verbose:
+        stats = get_filter_statistics(df, df_filtered)
+    else:
+        stats = {
+            'total_results': len(df_filtered),
+            'percentage_of_original': 100 * len(df_filtered) / initial_count if initial_count > 0 else 0
+        }
     
     if verbose:
         print(f"\nFinal result: {len(df_filtered)} flats")
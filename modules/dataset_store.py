@@ -0,0 +1,282 @@
+"""
+Typed columnar storage for the processed HDB dataset.
+
+The processed CSV is re-parsed on every API worker boot, with towns and models held
+as Python objects. The columnar store is a directory with one .npy file per column
+plus meta.json: string columns are dictionary-encoded (categorical codes plus their
+categories) and numeric columns are downcast (float32 distances and coordinates,
+int32 prices and years). Loading it is a straight read of typed arrays.
+
+DatasetStoreWriter builds the same store from dataframe chunks appended in
+order, keeping only one chunk plus per-column encodings in memory, so a store
+of any size can be written while the processed data is streamed.
+
+The store also carries a prebuilt FlatIndex. Loaded with mmap=True, every array
+(data and index) is a read-only memory map, so all uvicorn workers on a host
+share a single copy of the dataset through the OS page cache instead of each
+holding their own.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.flat_index import FlatIndex, _smallest_code_dtype
+
+STORE_FORMAT_VERSION = 1
+
+# Subdirectory of the store holding the prebuilt FlatIndex arrays
+INDEX_DIR = "index"
+
+# Rows converted per block when a DatasetStoreWriter finishes its columns
+WRITE_BLOCK_ROWS = 1 << 20
+
+# Columns stored as float32; every other float column keeps float64 so
+# displayed values such as remaining_lease_years stay exact
+FLOAT32_COLUMNS = ['latitude', 'longitude', 'dist_mrt_km', 'search_radius_km']
+
+
+def save_dataset(df: pd.DataFrame, path: str) -> Dict[str, Any]:
+    """
+    Write df to a columnar store directory.
+
+    Args:
+        df: Processed HDB dataframe
+        path: Output directory
+
+    Returns:
+        dict: The store metadata written to meta.json
+    """
+    writer = DatasetStoreWriter(path)
+    writer.append(df)
+    return writer.close()
+
+
+class _ColumnWriter:
+    """
+    Appends one column's chunks to a raw file: float64 values for numeric columns,
+    int32 codes into a dictionary in order of first appearance for text columns.
+    The column's kind is settled by its first chunk with a non-null value.
+    """
+
+    def __init__(self, name: str, raw_path: str):
+        self.name = name
+        self.raw_path = raw_path
+        self.raw = open(raw_path, 'wb')
+        self.kind: Optional[str] = None
+        self.n_rows = 0
+        self.seen_text = False
+        # Text columns; a dtype shared by every chunk that is categorical keeps its category order
+        self.codes: Dict[Any, int] = {}
+        self.dtype: Any = None
+        self.chunks = 0
+        # Numeric columns, the statistics _numeric_dtype downcasts by
+        self.integer_dtype = True
+        self.has_nan = False
+        self.integral = True
+        self.min = np.inf
+        self.max = -np.inf
+
+    def append(self, series: pd.Series):
+        numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        self.seen_text |= not numeric
+        self.dtype = series.dtype if self.chunks == 0 or self.dtype == series.dtype else None
+        self.chunks += 1
+        self.integer_dtype &= pd.api.types.is_integer_dtype(series)
+        if series.notna().any():
+            kind = 'numeric' if numeric else 'category'
+            if self.kind is None:
+                self.kind = kind
+                # Rows before the kind was known were all null
+                self._write_nulls(self.n_rows)
+            elif self.kind != kind:
+                raise ValueError(f"Column {self.name} changed from {self.kind} to {kind} values between chunks")
+        elif self.kind is None:
+            self.n_rows += len(series)
+            return
+
+        if self.kind == 'numeric':
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            finite = values[~np.isnan(values)]
+            self.has_nan |= len(finite) < len(values)
+            if len(finite) > 0:
+                self.integral &= bool(np.array_equal(finite, np.round(finite)))
+                self.min = min(self.min, finite.min())
+                self.max = max(self.max, finite.max())
+            self.raw.write(values.tobytes())
+        else:
+            chunk_codes, uniques = pd.factorize(series)
+            mapping = np.array([self.codes.setdefault(value, len(self.codes)) for value in uniques] + [-1],
+                               dtype=np.int32)
+            # Code -1 (null) indexes the trailing -1
+            self.raw.write(mapping[chunk_codes].tobytes())
+        self.n_rows += len(series)
+
+    def _write_nulls(self, n: int):
+        if self.kind == 'numeric':
+            self.has_nan |= n > 0
+            self.raw.write(np.full(n, np.nan).tobytes())
+        else:
+            self.raw.write(np.full(n, -1, dtype=np.int32).tobytes())
+
+    def _numeric_dtype(self) -> np.dtype:
+        if self.name in FLOAT32_COLUMNS:
+            return np.dtype(np.float32)
+        if self.integer_dtype or (not self.has_nan and self.integral):
+            int32 = np.iinfo(np.int32)
+            if self.n_rows == 0 or (self.min >= int32.min and self.max <= int32.max):
+                return np.dtype(np.int32)
+            if self.integer_dtype:
+                return np.dtype(np.int64)
+        return np.dtype(np.float64)
+
+    def finish(self, path: str, filename: str) -> Dict[str, Any]:
+        """Write the typed .npy file block by block from the raw file and return its meta entry."""
+        self.raw.close()
+        if self.kind is None:
+            # Never held a value: empty categories for text, NaN for numeric
+            self.kind = 'category' if self.seen_text else 'numeric'
+            self.raw = open(self.raw_path, 'wb')
+            self._write_nulls(self.n_rows)
+            self.raw.close()
+
+        if self.kind == 'category':
+            appearance = pd.Index(list(self.codes), dtype=object)
+            if isinstance(self.dtype, pd.CategoricalDtype):
+                categories = self.dtype.categories
+            else:
+                # The category order astype('category') would give the whole column
+                categories = pd.Categorical(appearance).categories
+            # Appearance codes to category codes, with -1 kept for nulls
+            remap = np.append(categories.get_indexer(appearance), -1)
+            raw_dtype, dtype = np.dtype(np.int32), _smallest_code_dtype(len(categories))
+        else:
+            raw_dtype, dtype = np.dtype(np.float64), self._numeric_dtype()
+
+        out = np.lib.format.open_memmap(os.path.join(path, filename), mode='w+', dtype=dtype, shape=(self.n_rows,))
+        if self.n_rows > 0:
+            raw = np.memmap(self.raw_path, dtype=raw_dtype, mode='r', shape=(self.n_rows,))
+            for start in range(0, self.n_rows, WRITE_BLOCK_ROWS):
+                block = raw[start:start + WRITE_BLOCK_ROWS]
+                out[start:start + len(block)] = remap[block] if self.kind == 'category' else block
+            del raw
+        out.flush()
+        del out
+        os.remove(self.raw_path)
+
+        if self.kind == 'category':
+            return {'name': self.name, 'kind': 'category', 'file': filename, 'categories': categories.tolist()}
+        return {'name': self.name, 'kind': 'numeric', 'file': filename}
+
+
+class DatasetStoreWriter:
+    """
+    Write a columnar store from dataframe chunks appended in row order.
+
+    Each chunk is encoded and appended to per-column raw files, so memory holds
+    one chunk and the text columns' dictionaries. close() converts the raw files
+    to the typed .npy layout of save_dataset (sorted categories, downcast
+    numerics decided over every chunk), builds the FlatIndex from the
+    memory-mapped result and writes meta.json last.
+    """
+
+    def __init__(self, path: str, build_index: bool = True):
+        self.path = path
+        self.build_index = build_index
+        self.columns: Optional[List[_ColumnWriter]] = None
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = [_ColumnWriter(col, os.path.join(self.path, f"{i:03d}.raw"))
+                            for i, col in enumerate(df.columns)]
+        for column in self.columns:
+            column.append(df[column.name])
+
+    def close(self) -> Dict[str, Any]:
+        """Finish every column and the index; returns the metadata written to meta.json."""
+        columns = [column.finish(self.path, f"{i:03d}.npy") for i, column in enumerate(self.columns or [])]
+        meta = {
+            'format_version': STORE_FORMAT_VERSION,
+            'n_rows': self.columns[0].n_rows if self.columns else 0,
+            'columns': columns
+        }
+        if self.build_index:
+            FlatIndex(_frame_from_meta(self.path, meta, mmap=True)).save(os.path.join(self.path, INDEX_DIR))
+
+        with open(os.path.join(self.path, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        return meta
+
+
+def load_dataset(path: str, mmap: bool = False) -> pd.DataFrame:
+    """
+    Load a columnar store directory written by save_dataset.
+
+    Args:
+        path: Store directory
+        mmap: If True, columns are read-only memory maps wrapped without copying
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset store version {meta.get('format_version')} in {path}")
+    return _frame_from_meta(path, meta, mmap)
+
+
+def _frame_from_meta(path: str, meta: Dict[str, Any], mmap: bool) -> pd.DataFrame:
+    data = {}
+    for column in meta['columns']:
+        # np.asarray gives a plain ndarray view, so pandas never sees the memmap subclass
+        values = np.asarray(np.load(os.path.join(path, column['file']), mmap_mode='r' if mmap else None))
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(values, categories=column['categories'])
+        else:
+            data[column['name']] = values
+    # copy=False keeps each column backed by its (possibly memory-mapped) array
+    return pd.DataFrame(data, copy=False)
+
+
+def load_processed_dataset(csv_path: str, store_path: Optional[str] = None,
+                           mmap: bool = False) -> pd.DataFrame:
+    """
+    Load the processed dataset, preferring the columnar store when it exists
+    and falling back to parsing the CSV.
+    """
+    if store_path and os.path.isfile(os.path.join(store_path, "meta.json")):
+        print(f"Loading columnar dataset from {store_path}{' (memory-mapped)' if mmap else ''}")
+        return load_dataset(store_path, mmap=mmap)
+    return pd.read_csv(csv_path)
+
+
+def load_flat_index(df: pd.DataFrame, store_path: Optional[str] = None,
+                    mmap: bool = False) -> FlatIndex:
+    """
+    Load the FlatIndex saved alongside the columnar store when it matches df,
+    otherwise build it from df.
+    """
+    index_path = os.path.join(store_path, INDEX_DIR) if store_path else None
+    if index_path and os.path.isfile(os.path.join(index_path, "meta.json")):
+        index = FlatIndex.load(index_path, mmap_mode='r' if mmap else None)
+        if index.n_rows == len(df):
+            return index
+        print(f"Warning: index in {index_path} does not match the dataset, rebuilding")
+    return FlatIndex(df)
+
+
+def dataset_version(csv_path: str, store_path: Optional[str] = None) -> str:
+    """
+    Identifier of the dataset on disk (the store when present, else the CSV),
+    derived from file size and modification time so every worker loading the
+    same files agrees on it.
+    """
+    if store_path and os.path.isfile(os.path.join(store_path, "meta.json")):
+        source = os.path.join(store_path, "meta.json")
+    else:
+        source = csv_path
+    stat = os.stat(source)
+    return hashlib.sha1(f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
@@ -0,0 +1,126 @@
+"""
+Bounded executor for CPU-bound request work.
+
+The API's endpoints are coroutines, but filtering, ranking and Bayesian
+inference are synchronous pandas/NumPy/pgmpy code. Running them inline blocks
+the event loop, so one slow request stalls every other request on the worker,
+including /health. WorkExecutor runs such work on a fixed thread pool instead,
+admits at most max_workers + max_queue requests at a time (the rest are
+rejected immediately so the caller can shed load with a 503), and gives up
+waiting after a per-request timeout.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorSaturated(Exception):
+    """All workers are busy and the queue is full."""
+
+
+class WorkExecutor:
+    """
+    Thread pool with admission control and queue-depth statistics.
+
+    A request's slot is held until its work actually finishes, even if the caller
+    stopped waiting after a timeout, so abandoned work still counts against the limit.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, timeout_seconds: Optional[float] = 30.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.started = 0
+        self.max_queue_seen = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_queue_wait = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def queued(self) -> int:
+        return self.in_flight - self.running
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.in_flight} requests in flight (limit {self.capacity})")
+            self.in_flight += 1
+            self.max_queue_seen = max(self.max_queue_seen, self.queued)
+
+    def _call(self, func: Callable, args: tuple, kwargs: dict, submitted: float) -> Any:
+        with self._lock:
+            self.running += 1
+            self.started += 1
+            self.total_queue_wait += time.perf_counter() - submitted
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on the pool and await its result.
+        Raises ExecutorSaturated when no slot is free, and asyncio.TimeoutError
+        when the result is not ready within timeout_seconds.
+        """
+        self._admit()
+        # Run in a copy of the caller's context (like asyncio.to_thread), so context
+        # variables such as the current request timer are visible to the work
+        context = contextvars.copy_context()
+        try:
+            future = self._pool.submit(context.run, self._call, func, args, kwargs, time.perf_counter())
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            future.cancel()  # Only takes effect if the work has not started yet
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'running': self.running,
+                'queued': self.in_flight - self.running,
+                'max_queue_seen': self.max_queue_seen,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'mean_queue_wait_ms': round(1000 * self.total_queue_wait / self.started, 3) if self.started else 0.0
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
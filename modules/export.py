@@ -0,0 +1,93 @@
+"""
+Streaming encoders for bulk exports of ranked recommendations.
+
+Each encoder takes an iterator of DataFrame chunks (rows already in rank order)
+and yields the encoded bytes chunk by chunk, so the size of an export does not
+change how much memory the server holds. Structured insight summaries are
+written as JSON strings in CSV and Arrow, and as nested objects in NDJSON.
+"""
+
+import io
+from enum import Enum
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+from modules.serialization import dumps, frame_to_records
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    arrow = "arrow"
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+
+FILE_EXTENSIONS = {
+    ExportFormat.csv: "csv",
+    ExportFormat.ndjson: "ndjson",
+    ExportFormat.arrow: "arrow",
+}
+
+
+def _flatten_insights(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Replace structured insight summaries by their JSON text for tabular formats."""
+    if "insight_summary" not in chunk.columns:
+        return chunk
+    chunk = chunk.copy()
+    chunk["insight_summary"] = [dumps(summary).decode("utf-8") for summary in chunk["insight_summary"]]
+    return chunk
+
+
+def csv_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """CSV with a single header row, one block of lines per chunk."""
+    header = True
+    for chunk in chunks:
+        yield _flatten_insights(chunk).to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
+
+def ndjson_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """One JSON object per row; NaN is written as null."""
+    for chunk in chunks:
+        yield b"".join(dumps(record) + b"\n" for record in frame_to_records(chunk))
+
+
+def arrow_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Arrow IPC stream with one record batch per chunk. The schema is taken from the
+    first chunk, which is always produced (possibly empty) so the stream is valid.
+    """
+    import pyarrow as pa  # Only needed for this format
+
+    sink = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        chunk = _flatten_insights(chunk)
+        if writer is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+ENCODERS = {
+    ExportFormat.csv: csv_chunks,
+    ExportFormat.ndjson: ndjson_chunks,
+    ExportFormat.arrow: arrow_chunks,
+}
@@ -0,0 +1,196 @@
+import json
+import os
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+
+# Columns filtered by set membership (dictionary-encoded with one bitmap per value)
+CATEGORICAL_COLUMNS = ('town', 'flat_type', 'storey_range', 'flat_model')
+
+# Columns filtered by numeric range (kept as sorted arrays for searchsorted lookups)
+RANGE_COLUMNS = ('resale_price', 'remaining_lease_years', 'floor_area_sqm', 'dist_mrt_km')
+
+
+def _smallest_code_dtype(n_categories: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class FlatIndex:
+    """
+    Precompiled columnar index over the resale DataFrame, built once at startup.
+
+    Categorical columns are dictionary-encoded to small integer codes with a packed
+    bitmap per category value, and range columns are kept as sorted arrays so that
+    csp_filter_flats constraints become bitmap ORs/ANDs plus searchsorted lookups.
+    Masks are positional: they line up with df.iloc, not with the index labels.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.category_codes: Dict[str, Dict[Any, int]] = {}
+        # One packed bitmap per category value: shape (n_categories, ceil(n_rows / 8))
+        self.bitmaps: Dict[str, np.ndarray] = {}
+        self.sorted_order: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                self._add_categorical(col, df[col])
+
+        for col in RANGE_COLUMNS:
+            if col in df.columns:
+                self._add_range(col, df[col])
+
+    def _add_categorical(self, col: str, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Already dictionary-encoded (e.g. loaded from the columnar store)
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)  # Missing values get code -1
+            codes = codes.astype(_smallest_code_dtype(len(uniques)))
+        self.category_codes[col] = {value: i for i, value in enumerate(uniques)}
+        self.bitmaps[col] = np.array([np.packbits(codes == i) for i in range(len(uniques))],
+                                     dtype=np.uint8).reshape(len(uniques), (self.n_rows + 7) // 8)
+
+    def _add_range(self, col: str, series: pd.Series):
+        values = pd.to_numeric(series, errors='coerce').to_numpy()
+        if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(float)
+        order = np.argsort(values, kind='stable')  # NaNs sort to the end
+        if self.n_rows < np.iinfo(np.int32).max:
+            order = order.astype(np.int32)
+        n_valid = int(np.count_nonzero(~np.isnan(values)))
+        self.sorted_order[col] = order[:n_valid]
+        self.sorted_values[col] = values[order[:n_valid]]
+
+    def save(self, path: str):
+        """Write the index arrays to a directory so workers can memory-map them with load()."""
+        os.makedirs(path, exist_ok=True)
+        for col, bitmaps in self.bitmaps.items():
+            np.save(os.path.join(path, f"bitmaps_{col}.npy"), bitmaps)
+        for col in self.sorted_order:
+            np.save(os.path.join(path, f"order_{col}.npy"), self.sorted_order[col])
+            np.save(os.path.join(path, f"values_{col}.npy"), self.sorted_values[col])
+        with open(os.path.join(path, "meta.json"), 'w') as f:
+            json.dump({
+                'n_rows': self.n_rows,
+                'categories': {col: [str(v) for v in lookup] for col, lookup in self.category_codes.items()},
+                'range_columns': list(self.sorted_order)
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> "FlatIndex":
+        """
+        Load an index written by save(). With mmap_mode='r' the arrays are read-only
+        memory maps, so every process using the same files shares one copy in the page cache.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.n_rows = meta['n_rows']
+        index.category_codes = {col: {value: i for i, value in enumerate(values)}
+                                for col, values in meta['categories'].items()}
+        index.bitmaps = {col: np.load(os.path.join(path, f"bitmaps_{col}.npy"), mmap_mode=mmap_mode)
+                         for col in meta['categories']}
+        index.sorted_order = {col: np.load(os.path.join(path, f"order_{col}.npy"), mmap_mode=mmap_mode)
+                              for col in meta['range_columns']}
+        index.sorted_values = {col: np.load(os.path.join(path, f"values_{col}.npy"), mmap_mode=mmap_mode)
+                               for col in meta['range_columns']}
+        return index
+
+    def _empty(self) -> np.ndarray:
+        return np.packbits(np.zeros(self.n_rows, dtype=bool))
+
+    def categorical_bitmap(self, col: str, values: List[str]) -> np.ndarray:
+        """Packed bitmap of rows whose `col` is any of `values` (case-insensitive, like isin on uppercase)."""
+        result = self._empty()
+        lookup = self.category_codes[col]
+        for value in values:
+            code = lookup.get(value.upper())
+            if code is not None:
+                result |= self.bitmaps[col][code]
+        return result
+
+    def range_bitmap(self, col: str,
+                     min_value: Optional[float] = None,
+                     max_value: Optional[float] = None) -> np.ndarray:
+        """Packed bitmap of rows with min_value <= `col` <= max_value. NaNs never match."""
+        sorted_values = self.sorted_values[col]
+        # Compare in the column's own float precision (e.g. float32 distances), as pandas does
+        start = 0 if min_value is None else \
+            np.searchsorted(sorted_values, sorted_values.dtype.type(min_value), side='left')
+        end = len(sorted_values) if max_value is None else \
+            np.searchsorted(sorted_values, sorted_values.dtype.type(max_value), side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.sorted_order[col][start:end]] = True
+        return np.packbits(mask)
+
+    def _constraint_bitmaps(self, constraints: Dict[str, Any]) -> List[Tuple[tuple, Any]]:
+        """
+        Translate constraints into (cache_key, bitmap_factory) pairs, following the
+        same skip rules as the create_*_mask functions in csp_filter.
+        """
+        parts = []
+
+        def add_range(name, col, min_value, max_value):
+            if min_value is None and max_value is None:
+                return
+            parts.append(((name, min_value, max_value),
+                          lambda: self.range_bitmap(col, min_value, max_value)))
+
+        def add_categorical(name, col, values):
+            if not values:
+                return
+            key = (name, tuple(sorted(v.upper() for v in values)))
+            parts.append((key, lambda: self.categorical_bitmap(col, values)))
+
+        if 'min_price' in constraints or 'max_price' in constraints:
+            add_range('price', 'resale_price', constraints.get('min_price'), constraints.get('max_price'))
+        if 'towns' in constraints:
+            add_categorical('towns', 'town', constraints['towns'])
+        if 'max_mrt_distance' in constraints:
+            if 'dist_mrt_km' not in self.sorted_values:
+                print("Warning: 'dist_mrt_km' column not found. MRT filter skipped.")
+            else:
+                add_range('mrt', 'dist_mrt_km', None, constraints['max_mrt_distance'])
+        if 'flat_types' in constraints:
+            add_categorical('flat_types', 'flat_type', constraints['flat_types'])
+        if 'min_floor_area' in constraints or 'max_floor_area' in constraints:
+            add_range('floor_area', 'floor_area_sqm',
+                      constraints.get('min_floor_area'), constraints.get('max_floor_area'))
+        if 'storey_ranges' in constraints:
+            add_categorical('storey_ranges', 'storey_range', constraints['storey_ranges'])
+        if 'min_remaining_lease' in constraints:
+            add_range('lease', 'remaining_lease_years', constraints['min_remaining_lease'], None)
+        if 'flat_models' in constraints:
+            add_categorical('flat_models', 'flat_model', constraints['flat_models'])
+        return parts
+
+    def filter_mask(self, constraints: Dict[str, Any],
+                    mask_cache: Optional[Dict[tuple, np.ndarray]] = None) -> np.ndarray:
+        """
+        Evaluate all constraints and return a boolean mask aligned with the indexed DataFrame.
+
+        Args:
+            constraints: Same constraint dictionary accepted by csp_filter_flats
+            mask_cache: Optional dict used to share per-constraint bitmaps between calls
+
+        Returns:
+            np.ndarray of bool with one entry per indexed row
+        """
+        combined = None
+        for key, make_bitmap in self._constraint_bitmaps(constraints):
+            if mask_cache is not None:
+                if key not in mask_cache:
+                    mask_cache[key] = make_bitmap()
+                bitmap = mask_cache[key]
+            else:
+                bitmap = make_bitmap()
+            combined = bitmap.copy() if combined is None else np.bitwise_and(combined, bitmap, out=combined)
+
+        if combined is None:
+            return np.ones(self.n_rows, dtype=bool)
+        return np.unpackbits(combined, count=self.n_rows).view(bool)
@@ -166,40 +166,188 @@
 #         else:
 #             return f"Higher than average floor area ({int(avg_sqm.mid)} sqm) in this price range"
 
-from typing import Any, Tuple, Dict
+from typing import Any, Tuple, Dict, List, Optional, TYPE_CHECKING
+from collections import OrderedDict
 import math
+import threading
+import numpy as np
 import pandas as pd
 import random
 
-from pgmpy.inference import VariableElimination
-from pgmpy.factors.discrete import DiscreteFactor
-from modules.bayes_utils import get_lease_cats, convert_numeric_to_interval
+from modules.bayes_utils import get_lease_cats, convert_numeric_to_interval, interval_codes
+from modules.compiled_inference import CompiledQueries
+
+if TYPE_CHECKING:
+    # Only for annotations: pgmpy is imported with the pickled model, not with this module
+    from pgmpy.inference import VariableElimination
+    from pgmpy.factors.discrete import DiscreteFactor
 
 # Cutoff probability whereby event becomes statistically insignificant
 STATISTICAL_CUTOFF = 0.05
 
+# Maximum number of posteriors kept in the query cache
+DEFAULT_QUERY_CACHE_SIZE = 4096
+
+# Evidence the insights are conditioned on: categorical values and discretized numerics
+CATEGORICAL_EVIDENCE = ['town', 'flat_model', 'flat_type']
+NUMERIC_EVIDENCE = ['remaining_lease_years', 'floor_area_sqm', 'resale_price']
+
+# The (target, evidence variables) shapes of every query the insight functions run
+COMPILED_QUERIES = [
+    ('resale_price', ['town', 'flat_model', 'flat_type', 'remaining_lease_years']),
+    ('floor_area_sqm', ['town', 'flat_model', 'flat_type', 'remaining_lease_years', 'resale_price'])
+]
+
+# Tier names, in the order the insight functions are run
+INSIGHT_TIERS = ["lease_value", "resale_risk", "size_value"]
+
+# Fallback (tier, text) per insight when there is not enough data
+DEFAULT_INSIGHTS = [
+    ("Average", "Competitive value for its lease."),
+    ("Average", "Standard resale risk."),
+    ("Average", "Average floor area for its price.")
+]
+
 class InsufficentDataError(Exception):
     pass
 
+def summarize_insights(all_insights: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Build the structured insight summary: all 3 tiers AND one randomly
+    selected long-form text.
+    """
+    tiers = {name: insight[0] for name, insight in zip(INSIGHT_TIERS, all_insights)}
+    text_insights = [insight[1] for insight in all_insights]
+    return {
+        "tiers": tiers,
+        "text": random.choice(text_insights)
+    }
+
 class InsightGenerator:
-    def __init__(self, model: VariableElimination, categories: pd.DataFrame):
+    def __init__(self, model: "VariableElimination", categories: pd.DataFrame,
+                 cache_size: int = DEFAULT_QUERY_CACHE_SIZE):
         self.model = model
         self.categories = categories
+        # LRU cache of posteriors keyed on (variable, frozen evidence)
+        self.cache_size = cache_size
+        self._query_cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Cache misses by how they were answered: compiled table lookup or variable elimination
+        self.compiled_answers = 0
+        self.eliminated_answers = 0
+        # Conditional tables for the fixed query shapes, set by compile_queries()
+        self.compiled: Optional[CompiledQueries] = None
+
+    def compile_queries(self, signatures=COMPILED_QUERIES) -> int:
+        """
+        Precompute conditional tables for the given query shapes, so their posteriors
+        become array lookups instead of variable elimination.
+
+        Returns:
+            int: Bytes held by the compiled tables
+        """
+        self.compiled = CompiledQueries.compile(self.model, signatures)
+        return self.compiled.nbytes
+
+    def query_posterior(self, variable: str, evidence: dict) -> Tuple[np.ndarray, list]:
+        """
+        Posterior distribution of variable given evidence, as (values, state_names).
+        Results are memoized in a bounded LRU cache since the evidence is always discretized.
+        Query shapes compiled by compile_queries() are looked up instead of eliminated.
+        """
+        key = (variable, frozenset(evidence.items()))
+        with self._cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        result = self.compiled.query(variable, evidence) if self.compiled is not None else None
+        compiled = result is not None
+        if not compiled:
+            query: "DiscreteFactor" = self.model.query(variables=[variable], evidence=evidence)
+            values = query.values
+            values.setflags(write=False)  # Shared between callers through the cache
+            result = (values, query.state_names[variable])
+
+        with self._cache_lock:
+            if compiled:
+                self.compiled_answers += 1
+            else:
+                self.eliminated_answers += 1
+            if self.cache_size > 0:
+                self._query_cache[key] = result
+                if len(self._query_cache) > self.cache_size:
+                    self._query_cache.popitem(last=False)
+        return result
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy of the query cache."""
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / total if total > 0 else 0.0,
+                "compiled": self.compiled_answers,
+                "eliminated": self.eliminated_answers,
+                "size": len(self._query_cache),
+                "max_size": self.cache_size
+            }
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._query_cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.compiled_answers = 0
+            self.eliminated_answers = 0
+
+    def warm_up(self, df: pd.DataFrame, top_n: int = 20) -> int:
+        """
+        Pre-populate the query cache by generating insights for a representative flat
+        of each of the top_n most common town x flat_type combinations.
+
+        Returns:
+            int: Number of combinations warmed
+        """
+        # observed=True keeps unseen category pairs of a categorical frame out of the ranking
+        counts = df.groupby(['town', 'flat_type'], observed=True).size()
+        combos = counts[counts > 0].nlargest(top_n).index
+        warmed = 0
+        for town, flat_type in combos:
+            flats = df[(df['town'] == town) & (df['flat_type'] == flat_type)]
+            if flats['flat_model'].isna().all() or flats['resale_price'].isna().all():
+                continue
+            flats = flats[flats['flat_model'] == flats['flat_model'].mode().iloc[0]]
+            # Flat closest to the median price of the most common model
+            row = flats.iloc[(flats['resale_price'] - flats['resale_price'].median()).abs().argmin()]
+            try:
+                self.get_insights_on_row(row.copy())
+            except ValueError:
+                # Values outside the known category intervals
+                continue
+            warmed += 1
+        return warmed
 
     def query_top_k_var(self, evidence: dict, top_k=3, variable='resale_price') -> list[tuple[float, Any]]:
         """
         Query the top K most probable value of variable from the Bayesian network query result.
         """
-        query: DiscreteFactor = self.model.query(variables=[variable], evidence=evidence)
+        values, state_names = self.query_posterior(variable, evidence)
 
         # Handle top_k=0 to return all values
         if top_k == 0:
-            topk_indexes = query.values.argsort()[::-1] # Get all indexes, sorted descending
+            topk_indexes = values.argsort()[::-1] # Get all indexes, sorted descending
         else:
-            topk_indexes = query.values.argsort()[-top_k:]
+            topk_indexes = values.argsort()[-top_k:]
 
-        topk_probs = [query.values[i] for i in reversed(topk_indexes)]
-        topk_values : list[pd.Interval] = [query.state_names[variable][i] for i in reversed(topk_indexes)]
+        topk_probs = [values[i] for i in reversed(topk_indexes)]
+        topk_values : list[pd.Interval] = [state_names[i] for i in reversed(topk_indexes)]
 
         return list(zip(topk_probs, topk_values))
 
@@ -207,6 +355,13 @@ class InsightGenerator:
         """
         NEW: Returns a dictionary with all 3 tiers AND one featured text insight.
         """
+        return summarize_insights(self.get_all_insights_on_row(row))
+
+    def get_all_insights_on_row(self, row: pd.Series) -> List[Tuple[str, str]]:
+        """
+        Runs all three insight functions and returns their (tier, text) pairs,
+        in the order of INSIGHT_TIERS.
+        """
         row = convert_numeric_to_interval(row, self.categories)
 
         evidence = {
@@ -217,46 +372,62 @@ class InsightGenerator:
             'floor_area_sqm': row['floor_area_sqm'],
             'resale_price': row['resale_price']
         }
+        return self.get_all_insights(evidence)
+
+    def get_insights_batch(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Insight summaries for every row of df, as get_insights_on_row returns them.
+        All rows are discretized at once and each distinct evidence combination is
+        evaluated once, so inference follows the number of distinct combinations in
+        df rather than its length.
 
-        # Run all three insight functions
+        Raises:
+            ValueError: If a numeric value fits none of the known category intervals
+        """
+        if len(df) == 0:
+            return []
+
+        codes = [pd.factorize(df[col])[0] for col in CATEGORICAL_EVIDENCE]
+        intervals = {}
+        for col in NUMERIC_EVIDENCE:
+            intervals[col] = self.categories[col].dropna().tolist()
+            col_codes = interval_codes(df[col].to_numpy(dtype=float), intervals[col])
+            unfit = np.flatnonzero(col_codes < 0)
+            if len(unfit) > 0:
+                raise ValueError(f"Value {df[col].iloc[unfit[0]]} for column {col} does not fit in any known category intervals.")
+            codes.append(col_codes)
+
+        combos, first_rows, inverse = np.unique(np.column_stack(codes), axis=0,
+                                                return_index=True, return_inverse=True)
+        combo_insights = []
+        for combo, first_row in zip(combos, first_rows):
+            evidence = {col: df[col].iloc[first_row] for col in CATEGORICAL_EVIDENCE}
+            evidence.update({col: intervals[col][code]
+                             for col, code in zip(NUMERIC_EVIDENCE, combo[len(CATEGORICAL_EVIDENCE):])})
+            combo_insights.append(self.get_all_insights(evidence))
+
+        # Fan out; the featured text is still drawn per row
+        return [summarize_insights(combo_insights[i]) for i in inverse.reshape(-1)]
+
+    def get_all_insights(self, evidence: dict) -> List[Tuple[str, str]]:
+        """
+        (tier, text) pairs of the three insight functions for discretized evidence,
+        in the order of INSIGHT_TIERS; the default insight replaces any that fails.
+        """
         all_insights = []
-        
-        try:
-            all_insights.append(self.insight_over_gte_lease(evidence))
-        except InsufficentDataError:
-            all_insights.append(("Average", "Competitive value for its lease.")) # Default
-        except Exception:
-             all_insights.append(("Average", "Competitive value for its lease."))
-
-        try:
-            all_insights.append(self.insight_price_due_lease_depreciation(evidence))
-        except InsufficentDataError:
-            all_insights.append(("Average", "Standard resale risk.")) # Default
-        except Exception:
-            all_insights.append(("Average", "Standard resale risk."))
-
-        try:
-            all_insights.append(self.insight_floor_area(evidence))
-        except InsufficentDataError:
-            all_insights.append(("Average", "Average floor area for its price.")) # Default
-        except Exception:
-            all_insights.append(("Average", "Average floor area for its price."))
-
-        # Build the structured dictionary
-        tiers = {
-            "lease_value": all_insights[0][0],
-            "resale_risk": all_insights[1][0],
-            "size_value": all_insights[2][0]
-        }
-        
-        # Get all the long-form text
-        text_insights = [insight[1] for insight in all_insights]
-        
-        # Return the tiers AND one randomly selected long-form text
-        return {
-            "tiers": tiers,
-            "text": random.choice(text_insights)
-        }
+        insight_functions = [
+            self.insight_over_gte_lease,
+            self.insight_price_due_lease_depreciation,
+            self.insight_floor_area
+        ]
+        for insight, default in zip(insight_functions, DEFAULT_INSIGHTS):
+            try:
+                all_insights.append(insight(evidence))
+            except Exception:
+                # Includes InsufficentDataError
+                all_insights.append(default)
+
+        return all_insights
         
     def insight_over_gte_lease(self, evidence: dict) -> Tuple[str, str]:
         baseline_lease = evidence['remaining_lease_years']
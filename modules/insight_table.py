@@ -0,0 +1,232 @@
+"""
+Offline precomputed insight table.
+
+Every flat's insights depend only on its discretized evidence (town, flat_model,
+flat_type and the lease, floor area and price intervals), so the insights of every
+combination observed in the processed dataset can be computed once and stored on
+disk. The API memory-maps the table and serves insights with an array lookup
+instead of running Bayesian inference per request.
+
+Build with:
+    python -m modules.insight_table [processed_csv] [output_dir]
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.bayes_utils import interval_codes
+from modules.insight_generator import (CATEGORICAL_EVIDENCE, DEFAULT_INSIGHTS, INSIGHT_TIERS, NUMERIC_EVIDENCE,
+                                      summarize_insights)
+
+DEFAULT_TABLE_PATH = "insight_table"
+
+# Evidence columns, in the order they are packed into the table key
+EVIDENCE_COLUMNS = CATEGORICAL_EVIDENCE + NUMERIC_EVIDENCE
+
+
+class EvidenceEncoder:
+    """Packs a flat's discretized evidence into a single int64 key (mixed radix over category codes)."""
+
+    def __init__(self, categories: Dict[str, list], intervals: Dict[str, List[pd.Interval]]):
+        self.categories = categories
+        self.intervals = intervals
+        # Categories are matched case-insensitively, like the dataset's uppercased values
+        self.lookups = {col: {str(v).upper(): i for i, v in enumerate(values)}
+                        for col, values in categories.items()}
+        self.radix = [len(categories[col]) for col in CATEGORICAL_EVIDENCE] + \
+                     [len(intervals[col]) for col in NUMERIC_EVIDENCE]
+
+    @classmethod
+    def from_categories(cls, categories_df: pd.DataFrame) -> "EvidenceEncoder":
+        return cls(
+            {col: categories_df[col].dropna().tolist() for col in CATEGORICAL_EVIDENCE},
+            {col: categories_df[col].dropna().tolist() for col in NUMERIC_EVIDENCE}
+        )
+
+    def encode(self, df: pd.DataFrame) -> np.ndarray:
+        """Key per row of df, or -1 where any evidence value has no known category."""
+        keys = np.zeros(len(df), dtype=np.int64)
+        valid = np.ones(len(df), dtype=bool)
+        for col, base in zip(EVIDENCE_COLUMNS, self.radix):
+            if col in self.lookups:
+                codes = df[col].astype(str).str.upper().map(self.lookups[col]) \
+                               .fillna(-1).to_numpy(dtype=np.int64)
+            else:
+                codes = interval_codes(df[col].to_numpy(dtype=float), self.intervals[col])
+            valid &= codes >= 0
+            keys = keys * base + codes
+        keys[~valid] = -1
+        return keys
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'categories': {col: [str(v) for v in values] for col, values in self.categories.items()},
+            'intervals': {col: [[float(c.left), float(c.right)] for c in values] for col, values in self.intervals.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "EvidenceEncoder":
+        return cls(
+            data['categories'],
+            {col: [pd.Interval(left, right) for left, right in values]
+             for col, values in data['intervals'].items()}
+        )
+
+
+class InsightTable:
+    """
+    Read-only insight table: sorted evidence keys with the (tier, text) codes of
+    the three insights per key. Arrays are memory-mapped, so workers share pages.
+    """
+
+    def __init__(self, keys: np.ndarray, tiers: np.ndarray, texts: np.ndarray,
+                 tier_labels: List[str], text_labels: List[str], encoder: EvidenceEncoder):
+        self.keys = keys
+        self.tiers = tiers
+        self.texts = texts
+        self.tier_labels = tier_labels
+        self.text_labels = text_labels
+        self.encoder = encoder
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> "InsightTable":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(
+            np.load(os.path.join(path, "keys.npy"), mmap_mode='r'),
+            np.load(os.path.join(path, "tiers.npy"), mmap_mode='r'),
+            np.load(os.path.join(path, "texts.npy"), mmap_mode='r'),
+            meta['tier_labels'],
+            meta['text_labels'],
+            EvidenceEncoder.from_json(meta['encoder'])
+        )
+
+    def lookup_frame(self, df: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+        """
+        Insight summaries for every row of df, in the same shape as
+        InsightGenerator.get_insights_on_row; None for combinations not in the table.
+        """
+        keys = self.encoder.encode(df)
+        if len(self.keys) > 0:
+            pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            found = (keys >= 0) & (self.keys[pos] == keys)
+        else:
+            pos = np.zeros(len(keys), dtype=np.int64)
+            found = np.zeros(len(keys), dtype=bool)
+
+        results = []
+        for p, hit in zip(pos, found):
+            if not hit:
+                results.append(None)
+                continue
+            results.append(summarize_insights([
+                (self.tier_labels[tier], self.text_labels[text])
+                for tier, text in zip(self.tiers[p], self.texts[p])
+            ]))
+        n_found = int(found.sum())
+        with self._lock:
+            self.hits += n_found
+            self.misses += len(found) - n_found
+        return results
+
+    def get_insights_frame(self, df: pd.DataFrame, fallback=None) -> List[Dict[str, Any]]:
+        """
+        Table lookups for every row of df. Unseen combinations are answered by the
+        fallback InsightGenerator if given (in one batch), otherwise with the default insights.
+        """
+        results = self.lookup_frame(df)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        if fallback is not None:
+            live = fallback.get_insights_batch(df.iloc[missing])
+        else:
+            live = [summarize_insights(DEFAULT_INSIGHTS) for _ in missing]
+        for i, result in zip(missing, live):
+            results[i] = result
+        return results
+
+
+def build_insight_table(df: pd.DataFrame, insight_generator, output_dir: str = DEFAULT_TABLE_PATH,
+                        verbose: bool = True) -> int:
+    """
+    Precompute the insights of every evidence combination observed in df and write
+    them to output_dir as memory-mappable arrays plus a small JSON string table.
+
+    Args:
+        df: Processed HDB dataframe
+        insight_generator: InsightGenerator used to compute each combination once
+        output_dir: Directory to write keys.npy, tiers.npy, texts.npy and meta.json
+        verbose: Print progress if True
+
+    Returns:
+        int: Number of combinations in the table
+    """
+    encoder = EvidenceEncoder.from_categories(insight_generator.categories)
+    keys = encoder.encode(df)
+    valid = keys >= 0
+    unique_keys, first_pos = np.unique(keys[valid], return_index=True)
+    representatives = df[valid].iloc[first_pos]
+
+    if verbose:
+        print(f"Skipped {int((~valid).sum()):,} rows outside the known categories")
+        print(f"Computing insights for {len(unique_keys):,} evidence combinations...")
+
+    tier_labels: Dict[str, int] = {}
+    text_labels: Dict[str, int] = {}
+    tiers = np.zeros((len(unique_keys), len(INSIGHT_TIERS)), dtype=np.uint8)
+    texts = np.zeros((len(unique_keys), len(INSIGHT_TIERS)), dtype=np.int32)
+
+    start_time = time.time()
+    for i, (_, row) in enumerate(representatives.iterrows()):
+        for j, (tier, text) in enumerate(insight_generator.get_all_insights_on_row(row)):
+            tiers[i, j] = tier_labels.setdefault(tier, len(tier_labels))
+            texts[i, j] = text_labels.setdefault(text, len(text_labels))
+        if verbose and (i + 1) % 1000 == 0:
+            print(f"  {i + 1:,}/{len(unique_keys):,} combinations ({time.time() - start_time:.0f}s)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, "keys.npy"), unique_keys)
+    np.save(os.path.join(output_dir, "tiers.npy"), tiers)
+    np.save(os.path.join(output_dir, "texts.npy"), texts)
+    with open(os.path.join(output_dir, "meta.json"), 'w') as f:
+        json.dump({
+            'tier_labels': list(tier_labels),
+            'text_labels': list(text_labels),
+            'encoder': encoder.to_json()
+        }, f)
+
+    if verbose:
+        print(f"Wrote {len(unique_keys):,} combinations to {output_dir} in {time.time() - start_time:.0f}s")
+    return len(unique_keys)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from modules.bayes_utils import load_bayesian_model, get_categories_from_file
+    from modules.insight_generator import InsightGenerator
+
+    input_path = sys.argv[1] if len(sys.argv) > 1 else "ResaleFlatPricesData_processed.csv"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TABLE_PATH
+
+    generator = InsightGenerator(
+        load_bayesian_model("BayesianNetwork.pkl"),
+        get_categories_from_file("CategoricalColumnsCategories.pkl"),
+        cache_size=1_000_000
+    )
+    generator.compile_queries()
+    build_insight_table(pd.read_csv(input_path), generator, output_dir)
+    print(f"Query cache: {generator.cache_stats()}")
@@ -26,41 +26,95 @@ def normalize_column(series: pd.Series, direction: str) -> pd.Series:
     norm[~valid_mask] = np.nan  # Preserve NaNs
     return norm
 
+def normalize_matrix(values: np.ndarray, directions: List[str]) -> np.ndarray:
+    """
+    Column-wise min-max normalization of a 2D float array, one column per criterion.
+    Same semantics as normalize_column: NaNs are preserved and constant columns become 1.
+    """
+    norm = np.full(values.shape, np.nan)
+    for j, direction in enumerate(directions):
+        if direction not in ('benefit', 'cost'):
+            raise ValueError(f"Invalid direction '{direction}' for normalization")
+        col = values[:, j]
+        valid_mask = ~np.isnan(col)
+        if not valid_mask.any():
+            continue
+        min_val = col[valid_mask].min()
+        max_val = col[valid_mask].max()
+        if min_val == max_val:
+            norm[valid_mask, j] = 1.0
+        elif direction == 'benefit':
+            norm[:, j] = (col - min_val) / (max_val - min_val)
+        else:
+            norm[:, j] = (max_val - col) / (max_val - min_val)
+    return norm
+
+def top_k_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k best scores, ordered by score descending then position ascending.
+    Uses argpartition so only the selected rows are sorted.
+    """
+    n = len(scores)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    threshold = scores[candidates].min()
+    # Resolve ties at the cut-off by position so the result matches a stable full sort
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.lexsort((chosen, -scores[chosen]))]
+
+def top_k_after(scores: np.ndarray, k: int, after_score: float, after_position: int) -> np.ndarray:
+    """
+    Positions of the k best scores ranked strictly after (after_score, after_position)
+    in the order used by top_k_positions, where ties are broken by position.
+    Selects from the remaining rows with argpartition instead of re-sorting the
+    whole ranking.
+    """
+    remaining = scores < after_score
+    later = slice(after_position + 1, None)
+    remaining[later] |= scores[later] == after_score
+    remaining = np.flatnonzero(remaining)
+    return remaining[top_k_positions(scores[remaining], k)]
+
 def mcda_wsm(
     df: pd.DataFrame,
     criteria: Dict[str, Dict],
     weights: Optional[Dict[str, float]] = None,
-    rank_col: str = "score"
+    rank_col: str = "score",
+    top_k: Optional[int] = None
 ) -> pd.DataFrame:
     """
     Perform Weighted Sum Model ranking (MCDA) on filtered flats.
     criteria: dict mapping column name to {'direction': 'benefit'/'cost', 'label': <str>}
               e.g., {"resale_price": {"direction": "cost", ...}, "floor_area_sqm": {"direction": "benefit", ...}}
     weights: dict mapping column to float (should sum to 1; if None, equal weights used)
+    top_k: if set, only the top_k best rows are selected and returned (no full sort or copy)
     Returns: ranked DataFrame with normalized criteria columns and final score
     """
-    df = df.copy()  # don't mutate original
     criteria_cols = list(criteria.keys())
-    
-    # Validate weights
-    if weights is None:
-        weights = {col: 1 / len(criteria_cols) for col in criteria_cols}
-    else:
-        # Ensure all criteria have weights; fill missing as 0
-        weights = {col: weights.get(col, 0.0) for col in criteria_cols}
-        # Normalize to sum == 1
-        total = sum(weights.values())
-        if total == 0:
-            raise ValueError("All weights for MCDA are zero!")
-        weights = {col: w / total for col, w in weights.items()}
+    weights = _resolve_weights(criteria_cols, weights)
+
+    norm_cols = [col + "_norm" for col in criteria_cols]
+    meta = {
+        "criteria": criteria,
+        "weights": weights,
+        "norm_cols": norm_cols,
+        "rank_col": rank_col
+    }
+    if top_k is not None:
+        return _mcda_wsm_top_k(df, criteria, weights, rank_col, top_k), meta
+
+    df = df.copy()  # don't mutate original
 
     # Normalize each criterion
-    norm_cols = []
     for col in criteria_cols:
         direction = criteria[col]['direction']
         norm_col = col + "_norm"
         df[norm_col] = normalize_column(df[col], direction)
-        norm_cols.append(norm_col)
 
     # Compute weighted sum score
     df[rank_col] = 0.0
@@ -77,16 +131,76 @@ def mcda_wsm(
     df['rank'] = np.arange(1, len(df)+1)
     df = df.reset_index()
 
-    
-    # For transparency, bundle weights/labels for each criterion
-    meta = {
-        "criteria": criteria,
-        "weights": weights,
-        "norm_cols": norm_cols,
-        "rank_col": rank_col
-    }
     return df, meta
 
+def _resolve_weights(criteria_cols: List[str], weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Weights for every criterion, summing to 1 (equal weights if None)."""
+    if weights is None:
+        return {col: 1 / len(criteria_cols) for col in criteria_cols}
+    # Ensure all criteria have weights; fill missing as 0
+    weights = {col: weights.get(col, 0.0) for col in criteria_cols}
+    # Normalize to sum == 1
+    total = sum(weights.values())
+    if total == 0:
+        raise ValueError("All weights for MCDA are zero!")
+    return {col: w / total for col, w in weights.items()}
+
+def normalize_criteria(df: pd.DataFrame, criteria: Dict[str, Dict]) -> np.ndarray:
+    """
+    Normalized criteria matrix of df (one column per criterion, NaNs preserved).
+    Depends only on the rows, not the weights, so it can be shared by every
+    weighting of the same filtered set.
+    """
+    criteria_cols = list(criteria.keys())
+    values = df[criteria_cols].to_numpy(dtype=float)
+    return normalize_matrix(values, [criteria[col]['direction'] for col in criteria_cols])
+
+def weighted_scores(norm: np.ndarray, criteria: Dict[str, Dict],
+                    weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """0-10 WSM scores from a normalize_criteria matrix, rounded like mcda_wsm."""
+    criteria_cols = list(criteria.keys())
+    return _weighted_sum(norm, criteria_cols, _resolve_weights(criteria_cols, weights))
+
+def _weighted_sum(norm: np.ndarray, criteria_cols: List[str], weights: Dict[str, float]) -> np.ndarray:
+    weight_vec = np.array([weights[col] for col in criteria_cols])
+    return np.round((np.nan_to_num(norm, nan=0.0) @ weight_vec) * 10, 2)
+
+def mcda_scores(
+    df: pd.DataFrame,
+    criteria: Dict[str, Dict],
+    weights: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """
+    WSM scores of every row of df in row order, without ranking or copying the frame.
+    Same values as the score column of mcda_wsm(..., top_k=...). This is how the API
+    scores a filtered set; batches that weight one set several ways call
+    normalize_criteria once and weighted_scores per weighting instead.
+    """
+    return weighted_scores(normalize_criteria(df, criteria), criteria, weights)
+
+def _mcda_wsm_top_k(
+    df: pd.DataFrame,
+    criteria: Dict[str, Dict],
+    weights: Dict[str, float],
+    rank_col: str,
+    top_k: int
+) -> pd.DataFrame:
+    """
+    Top-K variant of mcda_wsm: scores every row with one matrix-vector product and
+    only materializes the selected rows, in the same layout as the full ranking.
+    """
+    criteria_cols = list(criteria.keys())
+    norm = normalize_criteria(df, criteria)
+    scores = _weighted_sum(norm, criteria_cols, weights)
+
+    positions = top_k_positions(scores, top_k)
+    top = df.iloc[positions].copy()
+    for j, col in enumerate(criteria_cols):
+        top[col + "_norm"] = norm[positions, j]
+    top[rank_col] = scores[positions]
+    top['rank'] = np.arange(1, len(top)+1)
+    return top.reset_index()
+
 def get_mcda_insight(row: pd.Series, criteria: Dict[str, Dict], weights: Dict[str, float]) -> str:
     """
     Generate a human-readable market insight for a flat based on scores/features.
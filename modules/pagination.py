@@ -0,0 +1,62 @@
+"""
+Opaque cursors for keyset pagination of ranked /recommend results.
+
+A cursor records the last row a client has seen as its (score, position)
+in the ranking, position being the row's offset within the query's filtered
+rows (which ties are broken by, as in top_k_positions), together with the dataset version and a digest of
+the query it belongs to. The next page is then "the best rows after this
+position", which is independent of how many pages came before, and a cursor
+minted against another dataset or query is rejected instead of silently
+returning shifted results.
+"""
+
+import base64
+import hashlib
+import json
+from typing import Any, Dict
+
+
+class CursorError(ValueError):
+    """Cursor that cannot be decoded or does not belong to the current query."""
+
+
+class StaleCursorError(CursorError):
+    """Cursor minted against a different dataset version."""
+
+
+def query_digest(key: str) -> str:
+    """Short digest of a result_key, so cursors do not carry the query itself."""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(dataset_version: str, query_key: str, score: float, position: int) -> str:
+    """URL-safe token for the ranking position after (score, position)."""
+    payload = {
+        'v': dataset_version,
+        'q': query_digest(query_key),
+        's': float(score),
+        'p': int(position)
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, dataset_version: str, query_key: str) -> Dict[str, Any]:
+    """
+    Decode a token from encode_cursor and check it against the current dataset
+    version and query. Returns {'score': float, 'position': int}.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        score, position = float(payload['s']), int(payload['p'])
+        version, digest = payload['v'], payload['q']
+    except (ValueError, TypeError, KeyError):
+        raise CursorError("Malformed cursor")
+    if version != dataset_version:
+        raise StaleCursorError("Cursor belongs to a previous dataset version; restart from the first page")
+    if digest != query_digest(query_key):
+        raise CursorError("Cursor does not belong to this query")
+    if position < 0:
+        raise CursorError("Malformed cursor")
+    return {'score': score, 'position': position}
@@ -1,6 +1,19 @@
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from typing import Tuple, Callable, Any
+
+
+def map_unique_values(series: pd.Series, func: Callable[[Any], Any]) -> pd.Series:
+    """
+    Applies func to each distinct value of series once and maps the results back to the rows.
+
+    Equivalent to series.apply(func), but columns such as storey_range and
+    remaining_lease only have a few hundred distinct values across ~900k rows.
+    """
+    codes, uniques = pd.factorize(series)
+    # Missing values get code -1, which indexes the result for NaN appended at the end
+    results = pd.Series([func(value) for value in uniques] + [func(np.nan)])
+    return pd.Series(results.to_numpy()[codes], index=series.index, name=series.name)
 
 
 def extract_remaining_lease_years(lease_str: str) -> float:
@@ -85,7 +98,7 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     else:
         print("No rows removed")
     
-    invalid_storey = ~clean_df['storey_range'].apply(validate_storey_range_format)
+    invalid_storey = ~map_unique_values(clean_df['storey_range'], validate_storey_range_format)
     invalid_count = invalid_storey.sum()
     
     if invalid_count > 0:
@@ -108,8 +121,8 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     clean_df['resale_price'] = pd.to_numeric(clean_df['resale_price'], errors='coerce')
     clean_df = clean_df.rename(columns={'month': 'transaction_date'})
 
-    clean_df['remaining_lease_years'] = clean_df['remaining_lease'].apply(
-        extract_remaining_lease_years
+    clean_df['remaining_lease_years'] = map_unique_values(
+        clean_df['remaining_lease'], extract_remaining_lease_years
     )
     
     print("Features extracted")
@@ -9,21 +9,51 @@ nearest MRT station.
 import pandas as pd
 import numpy as np
 import os
+import sys
+import io
 import json
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+import sqlite3
 import requests
+import threading
 import time
-from typing import Tuple, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from typing import Tuple, Dict, Any, Optional, Iterator, Iterable, Set, List
 from geopy.distance import great_circle
 from dotenv import load_dotenv 
 
+if __name__ == "__main__" and not __package__:
+    # Allow running as a script as well as with `python -m modules.preprocessing_distance`
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.preprocessing import map_unique_values
+from modules.streaming_stats import RunningStats, QuantileSketch
+from modules.dataset_store import DatasetStoreWriter, load_dataset
+
 load_dotenv()
 
 ONEMAP_API_TOKEN = os.environ.get("ONEMAP_API_TOKEN")
 ONEMAP_SEARCH_URL = "https://www.onemap.gov.sg/api/common/elastic/search"
 ONEMAP_MRT_URL = "https://www.onemap.gov.sg/api/public/nearbysvc/getNearestMrtStops"
 API_DELAY_SEC = float(os.environ.get("API_DELAY_SEC", "0.25"))
-CACHE_FILE = os.environ.get("CACHE_FILE", "data/location_cache.json")
+CACHE_FILE = os.environ.get("CACHE_FILE", "data/location_cache.sqlite")
+# Bundled MRT station coordinates (see build_mrt_station_file), used to compute
+# nearest-MRT lookups locally instead of calling getNearestMrtStops. Set it to an
+# empty value to opt in to the per-address OneMap lookups instead.
+DEFAULT_MRT_STATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mrt_stations.csv')
+MRT_STATIONS_FILE = os.environ.get("MRT_STATIONS_FILE", DEFAULT_MRT_STATIONS_FILE)
+# Radius tiers of the MRT search (km), matching get_mrt_with_retry
+MRT_SEARCH_TIERS_KM = (2.0, 5.0)
+# geopy's great_circle Earth radius, so local distances match the API-based path
+EARTH_RADIUS_KM = 6371.009
 REQUEST_TIMEOUT = 10
+# Concurrent enrichment: number of in-flight requests and the overall request rate.
+# The default rate matches the old one-request-per-API_DELAY_SEC pacing.
+API_MAX_WORKERS = int(os.environ.get("API_MAX_WORKERS", "8"))
+API_RATE_PER_SEC = float(os.environ.get("API_RATE_PER_SEC", str(1.0 / API_DELAY_SEC if API_DELAY_SEC > 0 else 4.0)))
 
 # Validate API token
 if not ONEMAP_API_TOKEN:
@@ -43,6 +73,76 @@ class OneMapAPIError(Exception):
     """Custom exception for OneMap API errors."""
     pass
 
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all enrichment workers.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; acquire()
+    blocks until one is available, so the workers together never exceed the rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size: int = API_MAX_WORKERS) -> requests.Session:
+    """HTTP session with a connection pool large enough for every worker to keep its connection alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if ONEMAP_API_TOKEN:
+        session.headers['Authorization'] = ONEMAP_API_TOKEN
+    return session
+
+
+# OneMap requests issued by this process, for the enrichment statistics
+_api_calls = 0
+_api_calls_lock = threading.Lock()
+
+
+def api_calls_issued() -> int:
+    """Number of OneMap requests issued so far by this process."""
+    with _api_calls_lock:
+        return _api_calls
+
+
+def _onemap_get(url: str, params: Dict[str, Any],
+                session: Optional[requests.Session] = None,
+                rate_limiter: Optional[TokenBucket] = None) -> requests.Response:
+    global _api_calls
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    with _api_calls_lock:
+        _api_calls += 1
+    if session is not None:
+        return session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+
+    headers = {}
+    if ONEMAP_API_TOKEN:
+        headers['Authorization'] = ONEMAP_API_TOKEN
+    return requests.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+
+
 def extract_remaining_lease_years(lease_str: str) -> float:
     """
     Extracts remaining lease as a number in years from string format that includes months.
@@ -108,7 +208,7 @@ def normalise_street_name(street_name: str) -> str:
 
 
 def load_cache(cache_path: str) -> Dict[str, Any]:
-    """Load cached API results from JSON file."""
+    """Load cached API results from a legacy JSON cache file."""
     if os.path.exists(cache_path):
         try:
             with open(cache_path, 'r') as f:
@@ -121,20 +221,150 @@ def load_cache(cache_path: str) -> Dict[str, Any]:
     return {}
 
 
-def save_cache(cache: Dict[str, Any], cache_path: str):
-    os.makedirs(os.path.dirname(cache_path) if os.path.dirname(cache_path) else '.', 
-                exist_ok=True)
-    with open(cache_path, 'w') as f:
-        json.dump(cache, f, indent=2)
+LOCATION_FIELDS = ['block', 'street_name', 'latitude', 'longitude',
+                   'nearest_mrt', 'dist_mrt_km', 'search_radius_km']
 
 
-def geocode_address(block: str, street: str) -> Optional[Tuple[float, float]]:
+class LocationCache:
+    """
+    SQLite store of OneMap location results keyed by address_key.
+
+    Every put() is a single-row upsert committed to the write-ahead log, so
+    writes cost O(1) per address and a crash loses at most the address in
+    flight. Lookups go through the primary-key index on address_key.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS locations ("
+                "address_key TEXT PRIMARY KEY, block TEXT, street_name TEXT, "
+                "latitude REAL, longitude REAL, nearest_mrt TEXT, "
+                "dist_mrt_km REAL, search_radius_km REAL)"
+            )
+            self.conn.commit()
+
+    def __enter__(self) -> "LocationCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+
+    def __contains__(self, address_key: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM locations WHERE address_key = ?",
+                                 (address_key,)).fetchone() is not None
+
+    @staticmethod
+    def _to_sql(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def put(self, address_key: str, result: Dict[str, Any]):
+        self.put_many([(address_key, result)])
+
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Upsert several results in one transaction."""
+        rows = [(key, *(self._to_sql(result.get(field)) for field in LOCATION_FIELDS))
+                for key, result in items]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO locations (address_key, {', '.join(LOCATION_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (len(LOCATION_FIELDS) + 1))})",
+                rows
+            )
+
+    def get(self, address_key: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(f"SELECT {', '.join(LOCATION_FIELDS)} FROM locations WHERE address_key = ?",
+                                (address_key,)).fetchone()
+        if row is None:
+            return None
+        return {field: (np.nan if value is None else value) for field, value in zip(LOCATION_FIELDS, row)}
+
+    def _select(self, columns: str, address_keys: Iterable[str], chunk_size: int = 900) -> list:
+        # Chunked to stay under SQLite's bound-parameter limit
+        keys = list(dict.fromkeys(address_keys))
+        rows = []
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            rows.extend(self.conn.execute(
+                f"SELECT {columns} FROM locations WHERE address_key IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        return rows
+
+    def cached_keys(self, address_keys: Iterable[str]) -> Set[str]:
+        """The subset of address_keys already in the cache."""
+        return {row[0] for row in self._select("address_key", address_keys)}
+
+    def to_dataframe(self, address_keys: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Cached results (optionally only for address_keys) with an address_key column."""
+        columns = ['address_key'] + LOCATION_FIELDS
+        if address_keys is None:
+            rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM locations").fetchall()
+        else:
+            rows = self._select(', '.join(columns), address_keys)
+        df = pd.DataFrame(rows, columns=columns)
+        for col in ['latitude', 'longitude', 'dist_mrt_km', 'search_radius_km']:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+        df['nearest_mrt'] = df['nearest_mrt'].where(df['nearest_mrt'].notna(), np.nan)
+        return df
+
+    def migrate_json(self, json_path: str) -> int:
+        """Import a legacy JSON cache. Entries already in the store are kept. Returns the count imported."""
+        legacy = load_cache(json_path)
+        existing = self.cached_keys(legacy.keys())
+        new_items = [(key, value) for key, value in legacy.items() if key not in existing]
+        if new_items:
+            self.put_many(new_items)
+            print(f"Migrated {len(new_items)} locations from {json_path} to {self.path}")
+        return len(new_items)
+
+
+def open_location_cache(cache_path: str) -> LocationCache:
+    """
+    Open the SQLite location cache, migrating a legacy JSON cache on first use
+    (either cache_path itself if it is JSON, or the .json file next to it).
+    """
+    root, ext = os.path.splitext(cache_path)
+    if ext == '.json':
+        json_path, cache_path = cache_path, root + '.sqlite'
+    else:
+        json_path = root + '.json'
+
+    is_new = not os.path.exists(cache_path)
+    cache = LocationCache(cache_path)
+    if is_new and os.path.exists(json_path):
+        cache.migrate_json(json_path)
+    return cache
+
+
+def geocode_address(block: str, street: str,
+                    session: Optional[requests.Session] = None,
+                    rate_limiter: Optional[TokenBucket] = None) -> Optional[Tuple[float, float]]:
     """
     Converts HDB block and street to geographic coordinates.
     
     Args:
         block: HDB block number
         street: Normalised street name
+        session: Optional shared HTTP session (connection pooling)
+        rate_limiter: Optional token bucket taken before every request
     
     Returns:
         Tuple of (latitude, longitude) or None if geocoding fails
@@ -144,10 +374,6 @@ def geocode_address(block: str, street: str) -> Optional[Tuple[float, float]]:
     """
     full_address = f"{block} {street}"
     
-    headers = {}
-    if ONEMAP_API_TOKEN:
-        headers['Authorization'] = ONEMAP_API_TOKEN
-    
     search_params = {
         'searchVal': full_address,
         'returnGeom': 'Y',
@@ -156,12 +382,7 @@ def geocode_address(block: str, street: str) -> Optional[Tuple[float, float]]:
     
     for attempt in range(3):
         try:
-            response = requests.get(
-                ONEMAP_SEARCH_URL,
-                params=search_params,
-                headers=headers,
-                timeout=REQUEST_TIMEOUT
-            )
+            response = _onemap_get(ONEMAP_SEARCH_URL, search_params, session, rate_limiter)
             response.raise_for_status()
             data = response.json()
             
@@ -183,7 +404,9 @@ def geocode_address(block: str, street: str) -> Optional[Tuple[float, float]]:
     
     return None
 
-def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000) -> Optional[Dict[str, Any]]: 
+def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000,
+                     session: Optional[requests.Session] = None,
+                     rate_limiter: Optional[TokenBucket] = None) -> Optional[Dict[str, Any]]:
     """
     Finds the nearest MRT station within a specified radius.
     
@@ -191,6 +414,8 @@ def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000) -> Optional[D
         lat: Latitude of the location
         lon: Longitude of the location
         radius_m: Search radius in meters (default: 2000)
+        session: Optional shared HTTP session (connection pooling)
+        rate_limiter: Optional token bucket taken before the request
     
     Returns:
         Dictionary with nearest MRT station information or None if not found.
@@ -198,10 +423,6 @@ def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000) -> Optional[D
     Raises:
         OneMapAPIError: If API request fails
     """
-    headers = {}
-    if ONEMAP_API_TOKEN:
-        headers['Authorization'] = ONEMAP_API_TOKEN
-
     nearby_params = {
         'latitude': lat,
         'longitude': lon,
@@ -209,12 +430,7 @@ def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000) -> Optional[D
     }
 
     try:
-        response = requests.get(
-            ONEMAP_MRT_URL,
-            params=nearby_params,
-            headers=headers,
-            timeout=REQUEST_TIMEOUT
-        )
+        response = _onemap_get(ONEMAP_MRT_URL, nearby_params, session, rate_limiter)
         response.raise_for_status()
         data = response.json()
 
@@ -242,20 +458,24 @@ def find_nearest_mrt(lat: float, lon: float, radius_m: int = 2000) -> Optional[D
     except requests.exceptions.RequestException as e:
         raise OneMapAPIError(f"MRT lookup failed: {str(e)}")
 
-def get_mrt_with_retry(lat: float, lon: float) -> Dict[str, Any]:
+def get_mrt_with_retry(lat: float, lon: float,
+                       session: Optional[requests.Session] = None,
+                       rate_limiter: Optional[TokenBucket] = None) -> Dict[str, Any]:
     """
     Multi-tier MRT search: 2km then 5km then None.
     
     Args:
         lat: Latitude coordinate
         lon: Longitude coordinate
+        session: Optional shared HTTP session
+        rate_limiter: Optional token bucket; when given it paces requests instead of fixed sleeps
     
     Returns:
         Dictionary with MRT data and search metadata
     """
     # Tier 1: Try 2km radius (most common case)
     try:
-        mrt_result = find_nearest_mrt(lat, lon, radius_m=2000)
+        mrt_result = find_nearest_mrt(lat, lon, radius_m=2000, session=session, rate_limiter=rate_limiter)
         if mrt_result:
             return {
                 'nearest_mrt': mrt_result['name'],
@@ -266,11 +486,12 @@ def get_mrt_with_retry(lat: float, lon: float) -> Dict[str, Any]:
         pass
     
     # Small delay between attempts
-    time.sleep(API_DELAY_SEC * 0.5)
+    if rate_limiter is None:
+        time.sleep(API_DELAY_SEC * 0.5)
     
     # Tier 2: Extend to 5km radius
     try:
-        mrt_result = find_nearest_mrt(lat, lon, radius_m=5000)
+        mrt_result = find_nearest_mrt(lat, lon, radius_m=5000, session=session, rate_limiter=rate_limiter)
         if mrt_result:
             return {
                 'nearest_mrt': mrt_result['name'],
@@ -286,13 +507,17 @@ def get_mrt_with_retry(lat: float, lon: float) -> Dict[str, Any]:
         'dist_mrt_km': np.nan,
         'search_radius_km': np.nan
     }
-def get_location_data_from_onemap(block: str, street: str) -> Optional[Dict[str, Any]]:
+def get_location_data_from_onemap(block: str, street: str,
+                                  session: Optional[requests.Session] = None,
+                                  rate_limiter: Optional[TokenBucket] = None) -> Optional[Dict[str, Any]]:
     """
     Fetches complete location data using OneMap API.
     
      Args:
         block: HDB block number
         street: Normalised street name
+        session: Optional shared HTTP session
+        rate_limiter: Optional token bucket; when given it paces requests instead of fixed sleeps
         
     Returns:
         Dictionary with location data:
@@ -308,7 +533,7 @@ def get_location_data_from_onemap(block: str, street: str) -> Optional[Dict[str,
     """
      # Step 1: Geocode address
     try:
-        coords = geocode_address(block, street)
+        coords = geocode_address(block, street, session=session, rate_limiter=rate_limiter)
         if not coords:
             return None
         
@@ -317,10 +542,11 @@ def get_location_data_from_onemap(block: str, street: str) -> Optional[Dict[str,
     except OneMapAPIError:
         return None
     
-    time.sleep(API_DELAY_SEC)
+    if rate_limiter is None:
+        time.sleep(API_DELAY_SEC)
     
     # Step 2: Find MRT with retry strategy
-    mrt_data = get_mrt_with_retry(lat, lon)
+    mrt_data = get_mrt_with_retry(lat, lon, session=session, rate_limiter=rate_limiter)
     
     return {
         'block': block,
@@ -331,38 +557,286 @@ def get_location_data_from_onemap(block: str, street: str) -> Optional[Dict[str,
     }
 
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+def build_mrt_station_file(output_path: str = MRT_STATIONS_FILE,
+                           session: Optional[requests.Session] = None) -> pd.DataFrame:
+    """
+    Build the station coordinates file from OneMap search results for "MRT STATION".
+
+    Search results name each station building with its line codes, e.g.
+    "BUKIT BATOK MRT STATION  (NS2)". Codes are stripped so names match the
+    getNearestMrtStops output, and interchanges are kept once.
+
+    Returns:
+        DataFrame with name, latitude, longitude (also written to output_path)
+    """
+    stations = {}
+    page, total_pages = 1, 1
+    while page <= total_pages:
+        response = _onemap_get(ONEMAP_SEARCH_URL, {
+            'searchVal': 'MRT STATION',
+            'returnGeom': 'Y',
+            'getAddrDetails': 'Y',
+            'pageNum': page
+        }, session)
+        response.raise_for_status()
+        data = response.json()
+        total_pages = int(data.get('totalNumPages', 1))
+
+        for result in data.get('results', []):
+            name = re.sub(r'\s*\(.*\)\s*$', '', str(result.get('BUILDING', ''))).strip().upper()
+            if name.endswith('MRT STATION') and name not in stations:
+                stations[name] = (float(result['LATITUDE']), float(result['LONGITUDE']))
+        page += 1
+        if page <= total_pages:
+            time.sleep(API_DELAY_SEC)
+
+    station_df = pd.DataFrame(
+        [(name, lat, lon) for name, (lat, lon) in sorted(stations.items())],
+        columns=['name', 'latitude', 'longitude']
+    )
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    station_df.to_csv(output_path, index=False)
+    print(f"Saved {len(station_df)} MRT stations to {output_path}")
+    return station_df
+
+
+def load_mrt_stations(stations_path: Optional[str] = MRT_STATIONS_FILE) -> Optional[pd.DataFrame]:
+    """
+    Load the station coordinates file. An empty stations_path returns None, which
+    makes enrichment look up nearest MRT stations through OneMap. So does the
+    default file when it has not been built yet, with a warning.
+
+    Raises:
+        FileNotFoundError: If a station file set explicitly (argument or
+            MRT_STATIONS_FILE) does not exist
+        ValueError: If the station file has no stations with coordinates
+    """
+    if not stations_path:
+        return None
+    if not os.path.exists(stations_path):
+        if stations_path == DEFAULT_MRT_STATIONS_FILE and "MRT_STATIONS_FILE" not in os.environ:
+            print(f"WARNING: MRT station file {stations_path} not found; nearest MRT stations will be "
+                  f"looked up through OneMap. Build it with 'python -m modules.preprocessing_distance stations'.")
+            return None
+        raise FileNotFoundError(
+            f"MRT station file {stations_path} not found. Build it once with "
+            f"'python -m modules.preprocessing_distance stations' (needs OneMap access), or set "
+            f"MRT_STATIONS_FILE= (empty) to look up nearest MRT stations through OneMap instead."
+        )
+    stations = pd.read_csv(stations_path)
+    stations = stations.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+    if len(stations) == 0:
+        raise ValueError(f"MRT station file {stations_path} has no stations with coordinates")
+    print(f"Loaded {len(stations)} MRT stations from {stations_path}")
+    return stations
+
+
+def nearest_mrt_stations(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    stations: pd.DataFrame,
+    chunk_size: int = 4096
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized nearest-station search over all stations at once.
+
+    Distances use the same great-circle formula and Earth radius as geopy, and
+    the result follows the get_mrt_with_retry tiers: stations within 2km get a
+    search radius of 2.0, within 5km 5.0, otherwise no station (NaN).
+
+    Returns:
+        (names, distances_km, search_radius_km) arrays aligned with the inputs
+    """
+    lat1 = np.radians(np.asarray(latitudes, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(longitudes, dtype=float))[:, None]
+    lat2 = np.radians(stations['latitude'].to_numpy(dtype=float))[None, :]
+    lon2 = np.radians(stations['longitude'].to_numpy(dtype=float))[None, :]
+    station_names = stations['name'].to_numpy(dtype=object)
+
+    n = lat1.shape[0]
+    nearest = np.zeros(n, dtype=np.int64)
+    distances = np.full(n, np.nan)
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        sin_lat1, cos_lat1 = np.sin(lat1[start:end]), np.cos(lat1[start:end])
+        delta_lon = lon2 - lon1[start:end]
+        cos_delta, sin_delta = np.cos(delta_lon), np.sin(delta_lon)
+        dist = EARTH_RADIUS_KM * np.arctan2(
+            np.sqrt((np.cos(lat2) * sin_delta) ** 2 +
+                    (cos_lat1 * np.sin(lat2) - sin_lat1 * np.cos(lat2) * cos_delta) ** 2),
+            sin_lat1 * np.sin(lat2) + cos_lat1 * np.cos(lat2) * cos_delta
+        )
+        dist = np.where(np.isnan(dist), np.inf, dist)
+        nearest[start:end] = dist.argmin(axis=1)
+        distances[start:end] = dist[np.arange(end - start), nearest[start:end]]
+
+    radius = np.full(n, np.nan)
+    for tier in reversed(MRT_SEARCH_TIERS_KM):
+        radius[distances <= tier] = tier
+    found = ~np.isnan(radius)
+
+    names = np.full(n, np.nan, dtype=object)
+    names[found] = station_names[nearest[found]]
+    return names, np.where(found, np.round(distances, 3), np.nan), radius
+
+
+def assign_nearest_mrt(df: pd.DataFrame, stations: pd.DataFrame) -> pd.DataFrame:
+    """Recompute nearest_mrt, dist_mrt_km and search_radius_km from latitude/longitude."""
+    names, distances, radius = nearest_mrt_stations(
+        df['latitude'].to_numpy(dtype=float), df['longitude'].to_numpy(dtype=float), stations
+    )
+    df = df.copy()
+    df['nearest_mrt'] = names
+    df['dist_mrt_km'] = distances
+    df['search_radius_km'] = radius
+    return df
+
+
+def _local_mrt_data(lat: float, lon: float, stations: pd.DataFrame) -> Dict[str, Any]:
+    names, distances, radius = nearest_mrt_stations(np.array([lat]), np.array([lon]), stations)
+    return {
+        'nearest_mrt': names[0],
+        'dist_mrt_km': float(distances[0]),
+        'search_radius_km': float(radius[0])
+    }
+
+
+def _fetch_address(row, needs_geocode: bool, session: requests.Session,
+                   rate_limiter: TokenBucket,
+                   stations: Optional[pd.DataFrame] = None) -> Optional[Dict[str, Any]]:
+    if stations is not None:
+        # Only geocoding goes to OneMap; the MRT lookup is local
+        try:
+            coords = geocode_address(row.block, row.clean_street_name,
+                                     session=session, rate_limiter=rate_limiter)
+        except OneMapAPIError:
+            return None
+        if not coords:
+            return None
+        return {
+            'block': row.block,
+            'street_name': row.clean_street_name,
+            'latitude': coords[0],
+            'longitude': coords[1],
+            **_local_mrt_data(coords[0], coords[1], stations)
+        }
+
+    if needs_geocode:
+        return get_location_data_from_onemap(row.block, row.clean_street_name,
+                                             session=session, rate_limiter=rate_limiter)
+    mrt_data = get_mrt_with_retry(row.latitude, row.longitude,
+                                  session=session, rate_limiter=rate_limiter)
+    return {
+        'block': row.block,
+        'street_name': row.clean_street_name,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        **mrt_data
+    }
+
+
+def fetch_locations_concurrently(
+    addresses_with_coords: pd.DataFrame,
+    addresses_without_coords: pd.DataFrame,
+    max_workers: int = API_MAX_WORKERS,
+    rate_per_sec: float = API_RATE_PER_SEC,
+    stations: Optional[pd.DataFrame] = None
+) -> Iterator[Tuple[Any, bool, Optional[Dict[str, Any]]]]:
+    """
+    Fetch location data for every address on a thread pool.
+
+    All workers share one pooled HTTP session and one token bucket, so the
+    overall request rate stays at rate_per_sec however many requests are in
+    flight. Retry/backoff inside geocode_address and the 2km/5km MRT tiers
+    are unchanged.
+
+    With a station table, addresses that already have coordinates are resolved
+    in one local batch without any request, and the others only need geocoding.
+
+    Yields:
+        (row, needs_geocode, result) tuples in completion order. result is None
+        when geocoding failed. Results are consumed on the calling thread, so
+        the caller can update the cache and statistics without locking.
+    """
+    if stations is not None and len(addresses_with_coords) > 0:
+        names, distances, radius = nearest_mrt_stations(
+            addresses_with_coords['latitude'].to_numpy(dtype=float),
+            addresses_with_coords['longitude'].to_numpy(dtype=float),
+            stations
+        )
+        for i, row in enumerate(addresses_with_coords.itertuples()):
+            yield row, False, {
+                'block': row.block,
+                'street_name': row.clean_street_name,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'nearest_mrt': names[i],
+                'dist_mrt_km': float(distances[i]),
+                'search_radius_km': float(radius[i])
+            }
+        addresses_with_coords = addresses_with_coords.iloc[0:0]
+
+    if len(addresses_with_coords) + len(addresses_without_coords) == 0:
+        return
+
+    rate_limiter = TokenBucket(rate_per_sec)
+    with create_session(max_workers) as session, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for needs_geocode, addresses in ((False, addresses_with_coords), (True, addresses_without_coords)):
+            for row in addresses.itertuples():
+                future = executor.submit(_fetch_address, row, needs_geocode, session, rate_limiter, stations)
+                futures[future] = (row, needs_geocode)
+
+        try:
+            for future in as_completed(futures):
+                row, needs_geocode = futures.pop(future)
+                yield row, needs_geocode, future.result()
+        finally:
+            # Stop queued work if the consumer bails out early
+            for future in futures:
+                future.cancel()
+
+
+def clean_data(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     """
     Cleans and preprocesses the HDB data by checking for missing values, converting data types
     and extracting useful features.
+
+    Args:
+        df: Raw HDB dataframe (or one chunk of it)
+        verbose: Print the cleaning report (off for per-chunk streaming)
     """    
     clean_df = df.copy()
     
     # Checks for missing values and remove rows with critical missing values
-    missing_counter = clean_df.isnull().sum()
-    if missing_counter.sum() > 0:
-        print("Missing values found:", missing_counter[missing_counter > 0])
-    else:
-        print("No missing values found")
+    if verbose:
+        missing_counter = clean_df.isnull().sum()
+        if missing_counter.sum() > 0:
+            print("Missing values found:", missing_counter[missing_counter > 0])
+        else:
+            print("No missing values found")
     
     initial_rows = len(clean_df)
     clean_df = clean_df.dropna(subset=['resale_price', 'floor_area_sqm', 'town', 'flat_type'])
     rows_removed = initial_rows - len(clean_df)
 
-    if rows_removed > 0:
-        print(f"Removed {rows_removed} rows with missing critical values")
-    else:
-        print("No rows removed")
+    if verbose:
+        if rows_removed > 0:
+            print(f"Removed {rows_removed} rows with missing critical values")
+        else:
+            print("No rows removed")
     
-    invalid_storey = ~clean_df['storey_range'].apply(validate_storey_range_format)
+    invalid_storey = ~map_unique_values(clean_df['storey_range'], validate_storey_range_format)
     invalid_count = invalid_storey.sum()
     
     if invalid_count > 0:
-        print(f"Warning: Found {invalid_count} records with invalid storey_range format")
-        print("Sample invalid values:")
-        print(clean_df[invalid_storey]['storey_range'].value_counts().head())
+        if verbose:
+            print(f"Warning: Found {invalid_count} records with invalid storey_range format")
+            print("Sample invalid values:")
+            print(clean_df[invalid_storey]['storey_range'].value_counts().head())
         clean_df = clean_df[~invalid_storey]
-    else:
+    elif verbose:
         print("All storey_range values are valid")
 
     # Ensures string columns are strings and uppercased for case-insensitive filtering 
@@ -379,32 +853,30 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
         clean_df = clean_df.rename(columns={'month': 'transaction_date'})
     
     if 'remaining_lease' in clean_df.columns:
-        clean_df['remaining_lease_years'] = clean_df['remaining_lease'].apply(
-            extract_remaining_lease_years
+        clean_df['remaining_lease_years'] = map_unique_values(
+            clean_df['remaining_lease'], extract_remaining_lease_years
         )
     
-    print(f"Core cleaning complete. Rows: {len(clean_df)}")
+    if verbose:
+        print(f"Core cleaning complete. Rows: {len(clean_df)}")
     return clean_df
 
 
-def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-    """Enriches dataset with location features using cached OneMap API calls."""
-    print("\n" + "="*60)
-    print("Location Enrichment Pipeline")
-    print("="*60)
-
-    print("\nStep 1: Normalising street names")
-    df['clean_street_name'] = df['street_name'].apply(normalise_street_name)
-    df['address_key'] = df['block'].astype(str) + ' ' + df['clean_street_name']
-
-    unique_addresses = df[['block', 'clean_street_name', 'address_key']]\
-        .drop_duplicates()\
-        .reset_index(drop=True)
+def update_location_cache(unique_addresses: pd.DataFrame, location_cache: LocationCache,
+                          stations: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Fetch location data for every address not yet in the cache.
 
-    print(f"Total unique addresses: {len(unique_addresses)}")
+    Args:
+        unique_addresses: DataFrame with block, clean_street_name and address_key
+        location_cache: Open cache that new results are written to
+        stations: Optional MRT station table for local nearest-MRT lookups
 
-    location_cache = load_cache(cache_path)
-    processed_keys = set(location_cache.keys())
+    Returns:
+        Fetch statistics (has_coords, no_coords, geocode_success, ...)
+    """
+    processed_keys = location_cache.cached_keys(unique_addresses['address_key'])
+    print(f"Location cache: {location_cache.path} ({len(location_cache):,} addresses)")
 
     print("\nStep 2: Merging with pre-existing coordinate data")
 
@@ -432,11 +904,17 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
     print(f"Have coordinates (need MRT only): {len(addresses_with_coords):,}")
     print(f"Missing coordinates (need geocode + MRT): {len(addresses_without_coords):,}")
 
-    total_api_calls_needed = len(addresses_with_coords) + (len(addresses_without_coords) * 2)
-    api_calls_saved = len(addresses_with_coords)
+    # A geocode plus an MRT search per address without either optimisation
+    calls_without_optimisation = (len(addresses_with_coords) + len(addresses_without_coords)) * 2
+    if stations is not None:
+        total_api_calls_needed = len(addresses_without_coords)
+    else:
+        total_api_calls_needed = len(addresses_with_coords) + (len(addresses_without_coords) * 2)
+    api_calls_saved = calls_without_optimisation - total_api_calls_needed
     print(f"\nAPI Call Optimisation:")
     print(f"  Total API calls needed: {total_api_calls_needed:,}")
-    print(f"  API calls saved by using pre-existing coordinates: {api_calls_saved:,}")
+    print(f"  API calls saved by pre-existing coordinates{' and local MRT lookups' if stations is not None else ''}: "
+          f"{api_calls_saved:,}")
 
     stats = {
         'total_processed': 0,
@@ -447,6 +925,7 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
         'mrt_2km': 0,
         'mrt_5km': 0,
         'no_mrt': 0,
+        'api_calls_made': 0,
         'api_calls_saved': api_calls_saved
     }
 
@@ -454,32 +933,28 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
 
     if total_to_process > 0:
         print("\nStep 3: Fetching location data")
-        print(f"Estimated time: ~{(len(addresses_with_coords) * 0.5 + len(addresses_without_coords) * 1.5):.0f} seconds")
-
-        if len(addresses_with_coords) > 0:
-            print(f"\nProcessing {len(addresses_with_coords)} addresses with existing coordinates (MRT lookup only)...")
-
-            for row in addresses_with_coords.itertuples():
-                stats['total_processed'] += 1
+        if stations is not None:
+            print(f"Nearest MRT computed locally from {len(stations)} stations")
+        print(f"Workers: {API_MAX_WORKERS} | Rate limit: {API_RATE_PER_SEC:g} requests/sec")
+        print(f"Estimated time: ~{total_api_calls_needed / API_RATE_PER_SEC:.0f} seconds")
+
+        calls_before = api_calls_issued()
+        for row, needs_geocode, result in fetch_locations_concurrently(addresses_with_coords,
+                                                                       addresses_without_coords,
+                                                                       stations=stations):
+            stats['total_processed'] += 1
+            if needs_geocode:
+                stats['no_coords'] += 1
+            else:
                 stats['has_coords'] += 1
 
-                if stats['total_processed'] % 50 == 1:
-                    print(f"Progress: {stats['total_processed']}/{total_to_process} | "
-                          f"Has coords: {stats['has_coords']} | Need geocode: {stats['no_coords']} | "
-                          f"MRT 2km: {stats['mrt_2km']} | 2-5km: {stats['mrt_5km']} | Failures: {stats['geocode_failed']}")
-
-                lat, lon = row.latitude, row.longitude
-                mrt_data = get_mrt_with_retry(lat, lon)
+            if stats['total_processed'] % 50 == 1:
+                print(f"Progress: {stats['total_processed']}/{total_to_process} | "
+                      f"Has coords: {stats['has_coords']} | Need geocode: {stats['no_coords']} | "
+                      f"MRT 2km: {stats['mrt_2km']} | 2-5km: {stats['mrt_5km']} | Failures: {stats['geocode_failed']}")
 
-                result = {
-                    'block': row.block,
-                    'street_name': row.clean_street_name,
-                    'latitude': lat,
-                    'longitude': lon,
-                    **mrt_data
-                }
-
-                location_cache[row.address_key] = result
+            if result:
+                location_cache.put(row.address_key, result)
                 stats['geocode_success'] += 1
 
                 if pd.notna(result.get('search_radius_km')):
@@ -489,57 +964,25 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
                         stats['mrt_5km'] += 1
                 else:
                     stats['no_mrt'] += 1
+            else:
+                stats['geocode_failed'] += 1
 
-                if stats['total_processed'] % 100 == 0:
-                    save_cache(location_cache, cache_path)
-                    print(f"  Intermediate save: {len(location_cache)} addresses cached")
-
-                time.sleep(API_DELAY_SEC)
-
-        if len(addresses_without_coords) > 0:
-            print(f"\nProcessing {len(addresses_without_coords)} addresses without coordinates (geocode + MRT)...")
-
-            for row in addresses_without_coords.itertuples():
-                stats['total_processed'] += 1
-                stats['no_coords'] += 1
-
-                if stats['total_processed'] % 50 == 1:
-                    print(f"Progress: {stats['total_processed']}/{total_to_process} | "
-                          f"Has coords: {stats['has_coords']} | Need geocode: {stats['no_coords']} | "
-                          f"MRT 2km: {stats['mrt_2km']} | 2-5km: {stats['mrt_5km']} | Failures: {stats['geocode_failed']}")
-
-                result = get_location_data_from_onemap(row.block, row.clean_street_name)
-
-                if result:
-                    location_cache[row.address_key] = result
-                    stats['geocode_success'] += 1
-
-                    if pd.notna(result.get('search_radius_km')):
-                        if result['search_radius_km'] == 2.0:
-                            stats['mrt_2km'] += 1
-                        elif result['search_radius_km'] == 5.0:
-                            stats['mrt_5km'] += 1
-                    else:
-                        stats['no_mrt'] += 1
-                else:
-                    stats['geocode_failed'] += 1
+        # Counted from the requests actually sent, retries and wider MRT searches included
+        stats['api_calls_made'] = api_calls_issued() - calls_before
+        stats['api_calls_saved'] = max(0, calls_without_optimisation - stats['api_calls_made'])
+        print(f"\nCompleted fetching. Total cached: {len(location_cache):,}")
 
-                if stats['total_processed'] % 100 == 0:
-                    save_cache(location_cache, cache_path)
-                    print(f"  Intermediate save: {len(location_cache)} addresses cached")
+    return stats
 
-                time.sleep(API_DELAY_SEC)
 
-        save_cache(location_cache, cache_path)
-        print(f"\nCompleted fetching. Total cached: {len(location_cache):,}")
-    
-    print("\nStep 4: Merging location data with dataset")
-    cache_df = pd.DataFrame(location_cache.values())
+def merge_location_features(df: pd.DataFrame, location_cache: LocationCache,
+                            stations: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Merge cached location features onto rows that carry an address_key column."""
+    cache_df = location_cache.to_dataframe(df['address_key'].unique())
     
     if len(cache_df) > 0:
-        cache_df['address_key'] = (
-            cache_df['block'].astype(str) + ' ' + cache_df['street_name']
-        )
+        if stations is not None:
+            cache_df = assign_nearest_mrt(cache_df, stations)
         
         location_features = cache_df[[
             'address_key', 'latitude', 'longitude',
@@ -554,6 +997,40 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
     else:
         print("Warning: No location data available")
         final_df = df
+    return final_df
+
+
+def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE,
+                              stations_path: Optional[str] = MRT_STATIONS_FILE) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Enriches dataset with location features using cached OneMap API calls.
+
+    With the MRT station file, nearest-MRT data is computed locally for every
+    address (cached ones included, so a newly opened line is picked up on rerun)
+    and OneMap is only called to geocode addresses without known coordinates.
+    With stations_path=None, nearest MRT stations are looked up through OneMap.
+    """
+    print("\n" + "="*60)
+    print("Location Enrichment Pipeline")
+    print("="*60)
+
+    print("\nStep 1: Normalising street names")
+    df['clean_street_name'] = map_unique_values(df['street_name'], normalise_street_name)
+    df['address_key'] = df['block'].astype(str) + ' ' + df['clean_street_name']
+
+    unique_addresses = df[['block', 'clean_street_name', 'address_key']]\
+        .drop_duplicates()\
+        .reset_index(drop=True)
+
+    print(f"Total unique addresses: {len(unique_addresses)}")
+
+    location_cache = open_location_cache(cache_path)
+    stations = load_mrt_stations(stations_path)
+    stats = update_location_cache(unique_addresses, location_cache, stations)
+
+    print("\nStep 4: Merging location data with dataset")
+    final_df = merge_location_features(df, location_cache, stations)
+    location_cache.close()
     
     # Calculate final statistics
     print("\n" + "="*60)
@@ -582,7 +1059,7 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
     print(f"Addresses with pre-existing coordinates: {stats.get('has_coords', 0):,}")
     print(f"Addresses that needed geocoding: {stats.get('no_coords', 0):,}")
     print(f"API calls saved by using pre-existing data: {stats.get('api_calls_saved', 0):,}")
-    total_calls_made = stats.get('has_coords', 0) + (stats.get('no_coords', 0) * 2)
+    total_calls_made = stats.get('api_calls_made', 0)
     total_calls_without_optimisation = (stats.get('has_coords', 0) + stats.get('no_coords', 0)) * 2
     if total_calls_without_optimisation > 0:
         reduction_pct = (stats.get('api_calls_saved', 0) / total_calls_without_optimisation) * 100
@@ -597,7 +1074,7 @@ def enrich_with_location_data(df: pd.DataFrame, cache_path: str = CACHE_FILE) ->
             'had_existing_coords': int(stats.get('has_coords', 0)),
             'needed_geocoding': int(stats.get('no_coords', 0)),
             'api_calls_saved': int(stats.get('api_calls_saved', 0)),
-            'total_api_calls_made': int(stats.get('has_coords', 0) + stats.get('no_coords', 0) * 2)
+            'total_api_calls_made': int(stats.get('api_calls_made', 0))
         },
         'geocode_success': int(stats.get('geocode_success', 0)),
         'geocode_failed': int(stats.get('geocode_failed', 0)),
@@ -648,6 +1125,127 @@ def get_processing_summary(df: pd.DataFrame) -> Dict[str, Any]:
     }
 
 
+class StreamingSummary:
+    """
+    Accumulates get_processing_summary (and MRT coverage) statistics chunk by chunk.
+
+    Counts, min/max, mean and std are exact; medians come from a QuantileSketch
+    and are within its relative accuracy (1% by default).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.total_records = 0
+        self.earliest: Optional[str] = None
+        self.latest: Optional[str] = None
+        self.price = RunningStats()
+        self.price_sketch = QuantileSketch(relative_accuracy)
+        self.towns: Set[str] = set()
+        self.flat_types: Set[str] = set()
+        self.months: Dict[str, int] = {}
+        self.has_location = False
+        self.distance = RunningStats()
+        self.distance_sketch = QuantileSketch(relative_accuracy)
+        self.mrt_2km = 0
+        self.mrt_5km = 0
+
+    def update(self, df: pd.DataFrame) -> "StreamingSummary":
+        if len(df) == 0:
+            return self
+        self.total_records += len(df)
+        if 'transaction_date' in df:
+            dates = df['transaction_date'].dropna().astype(str)
+            if len(dates):
+                self.earliest = min(filter(None, [self.earliest, dates.min()]))
+                self.latest = max(filter(None, [self.latest, dates.max()]))
+            for month, count in month_counts(df).items():
+                self.months[month] = self.months.get(month, 0) + count
+        prices = df['resale_price'].to_numpy(dtype=float)
+        self.price.update(prices)
+        self.price_sketch.update(prices)
+        self.towns.update(df['town'].unique().tolist())
+        self.flat_types.update(df['flat_type'].unique().tolist())
+
+        if 'dist_mrt_km' in df:
+            self.has_location = True
+            distances = df['dist_mrt_km'].to_numpy(dtype=float)
+            self.distance.update(distances)
+            self.distance_sketch.update(distances)
+            self.mrt_2km += int((df['search_radius_km'] == 2.0).sum())
+            self.mrt_5km += int((df['search_radius_km'] == 5.0).sum())
+        return self
+
+    def merge(self, other: "StreamingSummary") -> "StreamingSummary":
+        """Combine with a summary of other chunks (e.g. from another worker)."""
+        self.total_records += other.total_records
+        self.earliest = min(filter(None, [self.earliest, other.earliest]), default=None)
+        self.latest = max(filter(None, [self.latest, other.latest]), default=None)
+        self.price.merge(other.price)
+        self.price_sketch.merge(other.price_sketch)
+        self.towns |= other.towns
+        self.flat_types |= other.flat_types
+        for month, count in other.months.items():
+            self.months[month] = self.months.get(month, 0) + count
+        self.has_location = self.has_location or other.has_location
+        self.distance.merge(other.distance)
+        self.distance_sketch.merge(other.distance_sketch)
+        self.mrt_2km += other.mrt_2km
+        self.mrt_5km += other.mrt_5km
+        return self
+
+    def result(self, fetch_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Summary in the get_processing_summary layout, plus mrt_coverage when location data was seen."""
+        summary = {
+            'dataset_info': {
+                'total_records': self.total_records,
+                'date_range': {'earliest': self.earliest, 'latest': self.latest}
+            },
+            'price_statistics': {
+                'min': self.price.min,
+                'max': self.price.max,
+                'median': self.price_sketch.quantile(0.5),
+                'mean': self.price.mean,
+                'std': self.price.std
+            },
+            'property_distribution': {
+                'unique_towns': len(self.towns),
+                'unique_flat_types': len(self.flat_types),
+                'towns': sorted(self.towns),
+                'flat_types': sorted(self.flat_types)
+            }
+        }
+        if self.has_location and self.total_records:
+            has_mrt = self.distance.count
+            no_mrt = self.total_records - has_mrt
+            coverage = {
+                'total_properties': self.total_records,
+                'mrt_coverage': {
+                    'total_has_mrt': has_mrt,
+                    'coverage_percentage': has_mrt / self.total_records * 100,
+                    'within_2km': self.mrt_2km,
+                    'between_2_5km': self.mrt_5km,
+                    'no_mrt_within_5km': no_mrt,
+                    'no_mrt_percentage': no_mrt / self.total_records * 100
+                },
+                'distance_statistics': {
+                    'median_km': self.distance_sketch.quantile(0.5),
+                    'mean_km': self.distance.mean if has_mrt else None,
+                    'min_km': self.distance.min if has_mrt else None,
+                    'max_km': self.distance.max if has_mrt else None
+                }
+            }
+            if fetch_stats:
+                coverage['optimisation_metrics'] = {
+                    'had_existing_coords': int(fetch_stats.get('has_coords', 0)),
+                    'needed_geocoding': int(fetch_stats.get('no_coords', 0)),
+                    'api_calls_saved': int(fetch_stats.get('api_calls_saved', 0)),
+                    'total_api_calls_made': int(fetch_stats.get('api_calls_made', 0))
+                }
+                coverage['geocode_success'] = int(fetch_stats.get('geocode_success', 0))
+                coverage['geocode_failed'] = int(fetch_stats.get('geocode_failed', 0))
+            summary['mrt_coverage'] = coverage
+        return summary
+
+
 def preprocess_hdb_data(
     filepath: str,
     include_location: bool = True,
@@ -720,41 +1318,617 @@ def preprocess_hdb_data(
     return df_enriched, summary
 
 
+MANIFEST_VERSION = 1
+
+
+def manifest_paths(output_path: str) -> Tuple[str, str]:
+    """Manifest and row-hash sidecar paths for a processed CSV."""
+    base = os.path.splitext(output_path)[0]
+    return base + '_manifest.json', base + '_row_hashes.npy'
+
+
+def read_raw_csv(filepath: str) -> pd.DataFrame:
+    """Read the raw CSV with every column as text, so row hashes do not depend on type inference."""
+    return pd.read_csv(filepath, dtype=str)
+
+
+def row_content_hashes(raw_df: pd.DataFrame) -> np.ndarray:
+    """Hash (uint64) of each raw row's values, independent of the index and of other rows."""
+    return pd.util.hash_pandas_object(raw_df.astype(str), index=False).to_numpy()
+
+
+def number_duplicate_hashes(row_hash: np.ndarray) -> np.ndarray:
+    """
+    Combine each content hash with its occurrence number, so identical rows, which
+    do occur for same-month sales in one block, get distinct hashes.
+    """
+    occurrence = pd.Series(row_hash).groupby(row_hash).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'row': row_hash, 'occurrence': occurrence}), index=False
+    ).to_numpy()
+
+
+def hash_rows(raw_df: pd.DataFrame) -> np.ndarray:
+    """Content hash (uint64) of each raw row, with identical rows told apart by occurrence."""
+    return number_duplicate_hashes(row_content_hashes(raw_df))
+
+
+def month_counts(df: pd.DataFrame) -> Dict[str, int]:
+    """Processed rows per transaction month."""
+    if len(df) == 0:
+        return {}
+    return {str(month): int(count) for month, count in df['transaction_date'].astype(str).value_counts().items()}
+
+
+def load_manifest(output_path: str) -> Optional[Dict[str, Any]]:
+    """The manifest of a processed CSV, or None if it has none (or the CSV is missing)."""
+    manifest_path, hashes_path = manifest_paths(output_path)
+    if not (os.path.exists(output_path) and os.path.exists(manifest_path) and os.path.exists(hashes_path)):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != MANIFEST_VERSION:
+        print(f"Warning: unsupported manifest version in {manifest_path}")
+        return None
+    return manifest
+
+
+def _atomic_write(path: str, write, mode: str = 'w'):
+    """Write through a temporary file and rename it over path, so a crash never leaves it half-written."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_manifest(output_path: str, source_path: str, partition_counts: Dict[str, int],
+                   raw_hashes: np.ndarray, manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Record processed rows: partition_counts (rows per transaction month, see
+    month_counts) are added to the manifest and raw_hashes are merged into the
+    row-hash sidecar.
+    """
+    manifest_path, hashes_path = manifest_paths(output_path)
+    manifest, seen_hashes = _updated_manifest(output_path, source_path, partition_counts, raw_hashes, manifest)
+    _atomic_write(hashes_path, lambda f: np.save(f, seen_hashes), mode='wb')
+    _atomic_write(manifest_path, lambda f: json.dump(manifest, f, indent=2))
+    return manifest
+
+
+def _updated_manifest(output_path: str, source_path: str, partition_counts: Dict[str, int],
+                      raw_hashes: np.ndarray, manifest: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], np.ndarray]:
+    """The manifest and row-hash set after recording partition_counts and raw_hashes; writes nothing."""
+    _, hashes_path = manifest_paths(output_path)
+    if manifest is None:
+        manifest = {
+            'format_version': MANIFEST_VERSION,
+            'source': os.path.abspath(source_path),
+            'total_rows': 0,
+            'last_transaction_date': None,
+            'partitions': {},
+            'runs': []
+        }
+        seen_hashes = np.unique(raw_hashes)
+    else:
+        manifest = json.loads(json.dumps(manifest))  # Callers keep the manifest they passed in
+        seen_hashes = np.union1d(np.load(hashes_path), raw_hashes)
+
+    for month, count in sorted(partition_counts.items()):
+        manifest['partitions'][month] = manifest['partitions'].get(month, 0) + count
+    if partition_counts:
+        latest = max(partition_counts)
+        if manifest['last_transaction_date'] is None or latest > manifest['last_transaction_date']:
+            manifest['last_transaction_date'] = latest
+    appended_rows = sum(partition_counts.values())
+    manifest['total_rows'] += appended_rows
+    manifest['runs'].append({
+        'processed_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'new_raw_rows': int(len(raw_hashes)),
+        'appended_rows': appended_rows
+    })
+    return manifest, seen_hashes
+
+
+def append_processed_rows(output_path: str, source_path: str, df: pd.DataFrame,
+                          raw_hashes: np.ndarray, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Append processed rows to output_path and record them in the manifest as one
+    recoverable step, so an interrupted run never leaves rows in the CSV that the
+    manifest does not know about (which the next run would append again).
+
+    The new row-hash set is staged next to the sidecar and the manifest is marked
+    pending with the CSV's size before the append. The rows are then appended,
+    the staged hashes renamed over the sidecar and the final manifest written.
+    recover_pending_append undoes or completes a run stopped in between.
+    """
+    manifest_path, hashes_path = manifest_paths(output_path)
+    updated, seen_hashes = _updated_manifest(output_path, source_path, month_counts(df), raw_hashes, manifest)
+
+    _atomic_write(hashes_path + '.pending', lambda f: np.save(f, seen_hashes), mode='wb')
+    pending = dict(manifest, pending={'csv_bytes': os.path.getsize(output_path), 'manifest': updated})
+    _atomic_write(manifest_path, lambda f: json.dump(pending, f, indent=2))
+
+    with open(output_path, 'a', newline='') as out:
+        df.to_csv(out, header=False, index=False)
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(hashes_path + '.pending', hashes_path)
+    _atomic_write(manifest_path, lambda f: json.dump(updated, f, indent=2))
+    return updated
+
+
+def recover_pending_append(output_path: str) -> Optional[str]:
+    """
+    Finish or undo an append_processed_rows run that was interrupted. While the
+    staged hashes still exist the append may be partial, so the CSV is truncated
+    back to its size before it and the rows are processed again by the next run;
+    once they have been renamed into place only the final manifest is missing.
+
+    Returns:
+        'rolled_back', 'completed' or None when nothing was pending
+    """
+    manifest = load_manifest(output_path)
+    if manifest is None or 'pending' not in manifest:
+        return None
+    manifest_path, hashes_path = manifest_paths(output_path)
+    pending = manifest.pop('pending')
+    if os.path.exists(hashes_path + '.pending'):
+        with open(output_path, 'r+b') as f:
+            f.truncate(pending['csv_bytes'])
+        os.remove(hashes_path + '.pending')
+        outcome = 'rolled_back'
+    else:
+        manifest = pending['manifest']
+        outcome = 'completed'
+    _atomic_write(manifest_path, lambda f: json.dump(manifest, f, indent=2))
+    print(f"Recovered an interrupted incremental run on {output_path}: {outcome.replace('_', ' ')}")
+    return outcome
+
+
+def preprocess_incremental(filepath: str, output_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Clean and enrich only raw rows not yet in the processed CSV, and append them.
+
+    New rows are found by content hash against the manifest's row-hash sidecar, so
+    rows added to any month, old or new, are appended. Corrections are not
+    reconciled: a corrected raw row is appended as a new transaction while the
+    processed row it replaces stays. Raw rows that have disappeared from the input
+    are counted and reported, and a full build is needed to drop them. Without a
+    manifest a full build is run first.
+
+    Returns:
+        Tuple of (appended rows, statistics dictionary for the appended rows)
+    """
+    print("\n" + "="*60)
+    print("INCREMENTAL PREPROCESSING")
+    print("="*60)
+
+    recover_pending_append(output_path)
+    manifest = load_manifest(output_path)
+    if manifest is None:
+        print(f"\nNo manifest for {output_path}; running a full build")
+        df_final, summary = preprocess_hdb_data(filepath)
+        df_final.to_csv(output_path, index=False)
+        write_manifest(output_path, filepath, month_counts(df_final), hash_rows(read_raw_csv(filepath)))
+        return df_final, summary
+
+    raw = read_raw_csv(filepath)
+    raw_hashes = hash_rows(raw)
+    _, hashes_path = manifest_paths(output_path)
+    seen_hashes = np.load(hashes_path)
+    new_mask = ~np.isin(raw_hashes, seen_hashes)
+    superseded = int((~np.isin(seen_hashes, raw_hashes)).sum())
+    if superseded:
+        print(f"\nWarning: {superseded:,} processed raw rows are no longer in {filepath} (corrected or "
+              f"removed upstream); their processed rows are kept. Run a full build to drop them.")
+
+    new_rows = raw[new_mask]
+    last_date = manifest['last_transaction_date']
+    if 'month' in new_rows.columns and last_date is not None:
+        newer = int((new_rows['month'] > last_date).sum())
+        print(f"\nLast processed month: {last_date}")
+        print(f"New rows: {len(new_rows):,} ({newer:,} after {last_date}, {len(new_rows) - newer:,} in earlier months)")
+    else:
+        print(f"\nNew rows: {len(new_rows):,}")
+
+    if len(new_rows) == 0:
+        print("Processed data is up to date")
+        return new_rows, {}
+
+    df_cleaned = clean_data(new_rows)
+    if len(df_cleaned) > 0:
+        df_enriched, coverage_stats = enrich_with_location_data(df_cleaned)
+    else:
+        df_enriched, coverage_stats = df_cleaned, {}
+
+    columns = pd.read_csv(output_path, nrows=0).columns
+    df_enriched = df_enriched.reindex(columns=columns)
+    print(f"\nAppending {len(df_enriched):,} rows to {output_path}")
+    manifest = append_processed_rows(output_path, filepath, df_enriched, raw_hashes[new_mask], manifest)
+
+    summary = get_processing_summary(df_enriched) if len(df_enriched) else {}
+    if coverage_stats:
+        summary['mrt_coverage'] = coverage_stats
+    summary['incremental'] = {
+        'new_raw_rows': int(len(new_rows)),
+        'appended_rows': int(len(df_enriched)),
+        'superseded_raw_rows': superseded,
+        'total_rows': manifest['total_rows'],
+        'last_transaction_date': manifest['last_transaction_date']
+    }
+    return df_enriched, summary
+
+
+# Working-set budget for one streamed chunk, and how many copies of a chunk's raw
+# text size exist at once (raw frame, cleaned copy, merged copy, CSV buffer)
+PREPROCESS_MEMORY_MB = float(os.environ.get("PREPROCESS_MEMORY_MB", "256"))
+CHUNK_MEMORY_FACTOR = 4
+
+
+def estimate_chunk_rows(filepath: str, memory_budget_mb: float = PREPROCESS_MEMORY_MB,
+                        sample_rows: int = 2000) -> int:
+    """Rows per chunk so that one chunk's working set stays within memory_budget_mb."""
+    sample = pd.read_csv(filepath, dtype=str, nrows=sample_rows)
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return max(1000, int(memory_budget_mb * 1024 ** 2 / (bytes_per_row * CHUNK_MEMORY_FACTOR)))
+
+
+def csv_partitions(filepath: str, n_partitions: int) -> List[Tuple[int, int]]:
+    """
+    Split the data rows of a CSV (after the header) into up to n_partitions byte
+    ranges that start and end on line boundaries. Assumes no quoted newlines,
+    which holds for the HDB resale data.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        data_size = size - bounds[0]
+        for i in range(1, n_partitions):
+            target = bounds[0] + data_size * i // n_partitions
+            if target <= bounds[-1]:
+                continue
+            f.seek(target)
+            f.readline()  # Advance to the start of the next line
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+class _BoundedReader(io.RawIOBase):
+    """A binary file read from its current position up to byte offset end, and no further."""
+
+    def __init__(self, f, end: int):
+        self.f = f
+        self.end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.end - self.f.tell())
+        if n <= 0:
+            return 0
+        return self.f.readinto(memoryview(buffer)[:n])
+
+
+def read_csv_partition(filepath: str, start: int, end: int, names: List[str],
+                       chunk_rows: int, usecols: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read the rows in one byte range from csv_partitions as text chunks. The range
+    is streamed, so only about one chunk of it is held in memory at a time.
+    """
+    with open(filepath, 'rb', buffering=0) as f:
+        f.seek(start)
+        with io.BufferedReader(_BoundedReader(f, end)) as reader:
+            yield from pd.read_csv(reader, header=None, names=names, dtype=str,
+                                   usecols=usecols, chunksize=chunk_rows)
+
+
+def _chunk_addresses(chunk: pd.DataFrame) -> Set[Tuple[str, str]]:
+    blocks = chunk['block'].astype(str).str.upper()
+    streets = map_unique_values(chunk['street_name'], normalise_street_name)
+    return set(zip(blocks, streets))
+
+
+def _addresses_frame(addresses: Set[Tuple[str, str]]) -> pd.DataFrame:
+    unique_addresses = pd.DataFrame(sorted(addresses), columns=['block', 'clean_street_name'])
+    unique_addresses['address_key'] = unique_addresses['block'] + ' ' + unique_addresses['clean_street_name']
+    return unique_addresses
+
+
+def collect_unique_addresses(filepath: str, chunk_rows: int) -> pd.DataFrame:
+    """Unique (block, normalised street) pairs of a raw CSV, read one chunk at a time."""
+    addresses = set()
+    for chunk in pd.read_csv(filepath, dtype=str, usecols=['block', 'street_name'], chunksize=chunk_rows):
+        addresses |= _chunk_addresses(chunk)
+    return _addresses_frame(addresses)
+
+
+def _partition_addresses(task: Dict[str, Any]) -> Set[Tuple[str, str]]:
+    addresses = set()
+    for chunk in read_csv_partition(task['filepath'], task['start'], task['end'], task['names'],
+                                    task['chunk_rows'], usecols=['block', 'street_name']):
+        addresses |= _chunk_addresses(chunk)
+    return addresses
+
+
+def process_chunk(chunk: pd.DataFrame, location_cache: Optional[LocationCache] = None,
+                  stations: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Clean one raw chunk and, with a location cache, merge its cached location features."""
+    cleaned = clean_data(chunk, verbose=False)
+    if location_cache is None or len(cleaned) == 0:
+        return cleaned
+    cleaned['clean_street_name'] = map_unique_values(cleaned['street_name'], normalise_street_name)
+    cleaned['address_key'] = cleaned['block'].astype(str) + ' ' + cleaned['clean_street_name']
+    return merge_location_features(cleaned, location_cache, stations)
+
+
+def _write_processed_chunks(chunks: Iterable[pd.DataFrame], output_path: str, columns: Optional[List[str]],
+                            location_cache: Optional[LocationCache], stations: Optional[pd.DataFrame],
+                            header: bool, store_path: Optional[str] = None,
+                            build_index: bool = True) -> Tuple[StreamingSummary, np.ndarray, Optional[List[str]]]:
+    """
+    Process raw chunks into output_path, and into a columnar store at store_path
+    when given; returns the summary, raw content hashes and the column order.
+    """
+    summary = StreamingSummary()
+    content_hashes = [np.array([], dtype=np.uint64)]
+    store = DatasetStoreWriter(store_path, build_index=build_index) if store_path else None
+    with open(output_path, 'w', newline='') as out:
+        for chunk in chunks:
+            content_hashes.append(row_content_hashes(chunk))
+            processed = process_chunk(chunk, location_cache, stations)
+            if columns is None:
+                columns = list(processed.columns)
+            processed = processed.reindex(columns=columns)
+            processed.to_csv(out, header=header, index=False)
+            header = False
+            summary.update(processed)
+            if store is not None:
+                store.append(processed)
+    if store is not None:
+        store.close()
+    return summary, np.concatenate(content_hashes), columns
+
+
+def _process_partition(task: Dict[str, Any]) -> Tuple[StreamingSummary, np.ndarray]:
+    """Worker: clean and enrich one byte range of the raw CSV into its own part file."""
+    location_cache = LocationCache(task['cache_path'], read_only=True) if task['cache_path'] else None
+    stations = load_mrt_stations(task['stations_path']) if task['cache_path'] else None
+    try:
+        chunks = read_csv_partition(task['filepath'], task['start'], task['end'],
+                                    task['names'], task['chunk_rows'])
+        summary, content_hashes, _ = _write_processed_chunks(
+            chunks, task['part_path'], task['columns'], location_cache, stations, header=False,
+            store_path=task['part_store_path'], build_index=False
+        )
+    finally:
+        if location_cache is not None:
+            location_cache.close()
+    return summary, content_hashes
+
+
+def preprocess_hdb_data_streaming(
+    filepath: str,
+    output_path: str,
+    include_location: bool = True,
+    memory_budget_mb: float = PREPROCESS_MEMORY_MB,
+    chunk_rows: Optional[int] = None,
+    cache_path: str = CACHE_FILE,
+    stations_path: Optional[str] = MRT_STATIONS_FILE,
+    workers: int = 1,
+    store_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Streaming version of preprocess_hdb_data that writes the processed CSV chunk by chunk.
+
+    A first pass over the block and street columns fills the location cache for
+    every unique address. The second pass reads, cleans, enriches from the cache
+    and appends one chunk at a time, so peak memory is set by the chunk size
+    (derived from memory_budget_mb unless chunk_rows is given), not the input
+    size. Statistics are accumulated with StreamingSummary, and the manifest used
+    by --incremental runs is written at the end.
+
+    With workers > 1 both passes run on a process pool over byte-range partitions
+    of the CSV. Workers only read the location cache; the addresses they find
+    are fetched by this process before the second pass. Part files and
+    statistics are combined in partition order, so the output is identical to a
+    single-process run. The memory budget applies to each worker.
+
+    With store_path, the columnar store the API loads is written alongside the
+    CSV from the same chunks (per partition with workers, then merged in
+    partition order), so it also never holds the whole dataset in memory.
+
+    Returns:
+        Statistics dictionary (the get_processing_summary layout)
+    """
+    print("\n" + "="*60)
+    print("HDB DATA PREPROCESSING PIPELINE (STREAMING)")
+    print("="*60)
+
+    chunk_rows = chunk_rows or estimate_chunk_rows(filepath, memory_budget_mb)
+    print(f"\nInput: {filepath}")
+    print(f"Chunk size: {chunk_rows:,} rows | Workers: {workers}")
+
+    names = list(pd.read_csv(filepath, nrows=0).columns)
+    partitions = csv_partitions(filepath, workers * 4) if workers > 1 else []
+    tasks = [{'filepath': filepath, 'start': start, 'end': end, 'names': names, 'chunk_rows': chunk_rows}
+             for start, end in partitions]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    location_cache, stations, fetch_stats = None, None, None
+    partial_path = output_path + '.partial'
+    partial_store_path = store_path + '.partial' if store_path else None
+    if partial_store_path:
+        shutil.rmtree(partial_store_path, ignore_errors=True)  # Left over from an interrupted run
+    try:
+        if include_location:
+            print("\nPass 1: Collecting unique addresses")
+            if executor is not None:
+                addresses = set()
+                for partition_addresses in executor.map(_partition_addresses, tasks):
+                    addresses |= partition_addresses
+                unique_addresses = _addresses_frame(addresses)
+            else:
+                unique_addresses = collect_unique_addresses(filepath, chunk_rows)
+            print(f"Total unique addresses: {len(unique_addresses):,}")
+            location_cache = open_location_cache(cache_path)
+            stations = load_mrt_stations(stations_path)
+            fetch_stats = update_location_cache(unique_addresses, location_cache, stations)
+
+        print("\nPass 2: Cleaning and enriching chunks")
+        if executor is None:
+            summary, content_hashes, _ = _write_processed_chunks(
+                pd.read_csv(filepath, dtype=str, chunksize=chunk_rows), partial_path, None,
+                location_cache, stations, header=True, store_path=partial_store_path
+            )
+        else:
+            # Fix the column order up front so every part file lines up
+            sample = pd.read_csv(filepath, dtype=str, nrows=min(chunk_rows, 1000))
+            columns = list(process_chunk(sample, location_cache, stations).columns)
+            part_paths = [f"{partial_path}.{i:04d}" for i in range(len(tasks))]
+            part_store_paths = [f"{path}.store" if store_path else None for path in part_paths]
+            for task, part_path, part_store_path in zip(tasks, part_paths, part_store_paths):
+                task.update(part_path=part_path, part_store_path=part_store_path, columns=columns,
+                            stations_path=stations_path,
+                            cache_path=location_cache.path if location_cache is not None else None)
+
+            summary, content_hashes = StreamingSummary(), []
+            try:
+                for i, (part_summary, part_hashes) in enumerate(executor.map(_process_partition, tasks)):
+                    summary.merge(part_summary)
+                    content_hashes.append(part_hashes)
+                    print(f"  Partition {i + 1}/{len(tasks)} done, {summary.total_records:,} rows so far")
+
+                with open(partial_path, 'w', newline='') as out:
+                    pd.DataFrame(columns=columns).to_csv(out, index=False)
+                with open(partial_path, 'ab') as out:
+                    for part_path in part_paths:
+                        with open(part_path, 'rb') as part:
+                            while block := part.read(1 << 20):
+                                out.write(block)
+
+                if store_path:
+                    # Re-encode the part stores against one dictionary, a chunk at a time
+                    store = DatasetStoreWriter(partial_store_path)
+                    for part_store_path in part_store_paths:
+                        part = load_dataset(part_store_path, mmap=True)
+                        for start in range(0, len(part), chunk_rows):
+                            store.append(part.iloc[start:start + chunk_rows])
+                        del part
+                    store.close()
+            finally:
+                for part_path, part_store_path in zip(part_paths, part_store_paths):
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    if part_store_path:
+                        shutil.rmtree(part_store_path, ignore_errors=True)
+            content_hashes = np.concatenate(content_hashes) if content_hashes else np.array([], dtype=np.uint64)
+        os.replace(partial_path, output_path)
+        if store_path:
+            if os.path.isdir(store_path):
+                shutil.rmtree(store_path)
+            os.replace(partial_store_path, store_path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if location_cache is not None:
+            location_cache.close()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        if partial_store_path:
+            shutil.rmtree(partial_store_path, ignore_errors=True)
+
+    write_manifest(output_path, filepath, summary.months, number_duplicate_hashes(content_hashes))
+
+    result = summary.result(fetch_stats)
+    print(f"\nFinal dataset: {result['dataset_info']['total_records']:,} records written to {output_path}"
+          + (f" and {store_path}" if store_path else ""))
+    return result
+
 if __name__ == "__main__":
-    import sys
+    import argparse
+    from modules.dataset_store import save_dataset
     
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    input_path = os.path.join(script_dir, '..', 'ResaleFlatPricesData.csv')
-    
-    # Check for test mode
-    test_mode = len(sys.argv) > 1 and sys.argv[1].lower() == 'test'
+
+    parser = argparse.ArgumentParser(description="HDB preprocessing pipeline with location enrichment")
+    parser.add_argument('mode', nargs='?', default='full', choices=['full', 'test', 'stations'],
+                        help="full build (default), 1000-row test run, or rebuild the MRT station file")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process raw rows not yet in the processed CSV and append them")
+    parser.add_argument('--input', default=os.path.join(script_dir, '..', 'ResaleFlatPricesData.csv'))
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--memory-mb', type=float, default=PREPROCESS_MEMORY_MB,
+                        help="memory budget for one streamed chunk (full builds)")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="rows per streamed chunk, overriding --memory-mb")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes for full builds, each handling partitions of the raw CSV")
+    args = parser.parse_args()
+
+    if args.mode == 'stations':
+        build_mrt_station_file(MRT_STATIONS_FILE)
+        sys.exit(0)
+
+    input_path = args.input
+    test_mode = args.mode == 'test'
     
     if test_mode:
         print("\n" + "="*60)
         print("TEST MODE - Processing 1000 rows")
         print("="*60)
-        output_path = os.path.join(script_dir, '..', 'ResaleFlatPricesData_test.csv')
+        output_path = args.output or os.path.join(script_dir, '..', 'ResaleFlatPricesData_test.csv')
         stats_path = 'test_statistics.json'
     else:
         print("\n" + "="*60)
-        print("FULL PROCESSING MODE")
+        print("INCREMENTAL PROCESSING MODE" if args.incremental else "FULL PROCESSING MODE")
         print("="*60)
-        output_path = os.path.join(script_dir, '..', 'ResaleFlatPricesData_processed.csv')
+        output_path = args.output or os.path.join(script_dir, '..', 'ResaleFlatPricesData_processed.csv')
         stats_path = 'processing_statistics.json'
     
     print(f"Input: {input_path}")
     print(f"Output: {output_path}")
     
+    # Typed columnar copy that the API loads instead of re-parsing the CSV
+    store_path = os.path.splitext(output_path)[0]
+
     # Run pipeline
-    df_final, summary = preprocess_hdb_data(
-        input_path, 
-        test_mode=test_mode,
-        test_rows=1000
-    )
-    
-    # Save outputs
-    print(f"\nSaving processed data to: {output_path}")
-    df_final.to_csv(output_path, index=False)
+    if test_mode:
+        df_final, summary = preprocess_hdb_data(
+            input_path, 
+            test_mode=True,
+            test_rows=1000
+        )
+        print(f"\nSaving processed data to: {output_path}")
+        df_final.to_csv(output_path, index=False)
+        print(f"Saving columnar dataset to: {store_path}")
+        save_dataset(df_final, store_path)
+    elif args.incremental:
+        df_new, summary = preprocess_incremental(input_path, output_path)
+        if len(df_new) > 0:
+            # Rebuilt from the whole processed CSV, which is still far cheaper than reprocessing
+            print(f"Saving columnar dataset to: {store_path}")
+            save_dataset(pd.read_csv(output_path), store_path)
+    else:
+        # Written chunk by chunk alongside the CSV
+        summary = preprocess_hdb_data_streaming(
+            input_path,
+            output_path,
+            memory_budget_mb=args.memory_mb,
+            chunk_rows=args.chunk_rows,
+            workers=args.workers,
+            store_path=store_path
+        )
     
     print(f"Saving statistics to: {stats_path}")
     with open(stats_path, 'w') as f:
@@ -763,4 +1937,3 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("Preprocessing complete")
     print("="*60)
-    
\ No newline at end of file
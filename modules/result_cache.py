@@ -0,0 +1,150 @@
+"""
+Server-side cache of ranked /recommend result sets.
+
+The frontend requests one page at a time, and every page used to re-run
+csp_filter_flats and mcda_wsm over the whole dataset. A cached entry keeps
+the filtered row labels and the ranked prefix (row labels plus scores) for
+one canonical query, so later pages and repeat searches only slice arrays.
+Cursor pagination additionally keeps the scores of every filtered row, so a
+page after any cursor is a partial selection over one array.
+Entries expire after a TTL and are evicted least-recently-used once the
+cache exceeds its memory budget.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Fixed per-entry allowance for the key, the entry object and dict bookkeeping
+ENTRY_OVERHEAD_BYTES = 512
+
+
+class RankedResult:
+    """
+    Filtered row labels of one query and the ranked prefix computed so far.
+    filtered_scores, when set, holds the score of every filtered row in filtered row order.
+    """
+
+    def __init__(self, filtered_labels: np.ndarray, ranked_labels: np.ndarray, scores: np.ndarray,
+                 filtered_scores: Optional[np.ndarray] = None):
+        self.filtered_labels = filtered_labels
+        self.ranked_labels = ranked_labels
+        self.scores = scores
+        self.filtered_scores = filtered_scores
+
+    @property
+    def total_found(self) -> int:
+        return len(self.filtered_labels)
+
+    @property
+    def complete(self) -> bool:
+        """True when every filtered row has been ranked."""
+        return len(self.ranked_labels) >= len(self.filtered_labels)
+
+    def covers(self, end: int) -> bool:
+        """True if rows up to position `end` of the ranking are available."""
+        return self.complete or len(self.ranked_labels) >= end
+
+    @property
+    def nbytes(self) -> int:
+        extra = 0 if self.filtered_scores is None else self.filtered_scores.nbytes
+        return (self.filtered_labels.nbytes + self.ranked_labels.nbytes + self.scores.nbytes
+                + extra + ENTRY_OVERHEAD_BYTES)
+
+
+def canonical_constraints(constraints: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize constraints so equivalent queries share a key. Follows the filter's
+    own rules: None values and empty lists are ignored, and list matching is
+    case-insensitive and order-independent.
+    """
+    canonical = {}
+    for name, value in constraints.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            if not value:
+                continue
+            value = sorted({str(v).upper() for v in value})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        canonical[name] = value
+    return canonical
+
+
+def result_key(constraints: Dict[str, Any], priority: str, dataset_version: Any) -> str:
+    """Cache key for a query: canonical constraints, ranking priority and dataset version."""
+    return json.dumps({
+        'constraints': canonical_constraints(constraints),
+        'priority': priority,
+        'dataset_version': dataset_version
+    }, sort_keys=True, default=str)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of RankedResult entries bounded by total array bytes,
+    with a time-to-live per entry (ttl_seconds <= 0 disables expiry).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[RankedResult]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl_seconds > 0 and time.monotonic() - item[1] > self.ttl_seconds:
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, result: RankedResult):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if result.nbytes > self.max_bytes:
+                return  # Larger than the whole budget: not worth evicting everything for
+            self._entries[key] = (result, time.monotonic())
+            self.nbytes += result.nbytes
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        result, _ = self._entries.pop(key)
+        self.nbytes -= result.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
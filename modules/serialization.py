@@ -0,0 +1,97 @@
+"""
+Fast JSON encoding of recommendation pages.
+
+DataFrame.to_dict(orient="records") boxes every cell separately and FastAPI's
+generic encoder then walks each record again before json.dumps. Here each column
+is converted to Python values in one vectorized tolist() call (missing values
+become None, so NaN is emitted as null), the records are zipped from those lists,
+and the result is encoded with orjson when it is installed. Values are the same
+Python types to_dict produces, so the JSON is unchanged apart from null for NaN.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the standard library encoder
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def column_values(series: pd.Series) -> list:
+    """Values of one column as Python objects, with missing values as None."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categorical = series.array
+        codes = categorical.codes
+        values = categorical.categories.to_numpy().take(codes).astype(object)
+        values[codes < 0] = None
+        return values.tolist()
+    values = series.to_numpy()
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        if missing.any():
+            values = values.astype(object)
+            values[missing] = None
+        return values.tolist()
+    if values.dtype.kind in 'iub':
+        return values.tolist()
+    # Object and other columns: tolist() unboxes NumPy scalars; pd.isna catches None/NaN/NaT
+    values = values.astype(object)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Same records as df.to_dict(orient="records"), built column-wise, with None for NaN."""
+    columns = [str(col) for col in df.columns]
+    values = [column_values(series) for _, series in df.items()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to compact UTF-8 JSON; NaN and infinities become null."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_replace_nan(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _replace_nan(value: Any) -> Any:
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _replace_nan(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_nan(v) for v in value]
+    return value
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return _replace_nan(value.item())
+    if isinstance(value, np.ndarray):
+        return _replace_nan(value.tolist())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(Response):
+    """JSONResponse replacement that encodes with dumps() instead of FastAPI's generic path."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def ndjson_lines(header: Dict[str, Any], records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """NDJSON body: the header object on the first line, then one record per line."""
+    yield dumps(header) + b"\n"
+    for record in records:
+        yield dumps(record) + b"\n"
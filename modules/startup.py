@@ -0,0 +1,158 @@
+"""
+Staged application startup in background threads.
+
+Loading the dataset, the flat index, the Bayesian network and the insight
+table used to run serially before the API answered anything, so health checks
+failed for the whole load and rolling deploys stalled. StartupStages runs each
+named load stage in its own thread as soon as the stages it depends on have
+finished, records its status and duration, and reports progress for a
+readiness endpoint. A failed stage marks the stages that depend on it as
+skipped instead of leaving half-initialized state behind. Optional stages,
+such as cache warm-ups, run the same way but never gate readiness.
+"""
+
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable[[], Any], after: tuple, optional: bool):
+        self.name = name
+        self.func = func
+        self.after = after
+        self.optional = optional
+        self.status = PENDING
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.finished = threading.Event()
+
+
+class StartupStages:
+    """
+    Named load stages with dependencies, run concurrently once start() is called.
+    on_finish, if given, is called with progress() after the last stage ends.
+    """
+
+    def __init__(self, on_finish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._stages: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._all_finished = threading.Event()
+        self._on_finish = on_finish
+
+    def add(self, name: str, func: Callable[[], Any], after: Iterable[str] = (),
+            optional: bool = False) -> "StartupStages":
+        """
+        Register a stage that runs once the stages in after have loaded. An optional
+        stage is reported in progress() but is not waited for by ready, and its
+        failure does not make the run failed.
+        """
+        after = tuple(after)
+        unknown = [dep for dep in after if dep not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages {unknown}")
+        if not optional and any(self._stages[dep].optional for dep in after):
+            raise ValueError(f"Required stage {name} cannot depend on optional stages")
+        self._stages[name] = _Stage(name, func, after, optional)
+        return self
+
+    def start(self):
+        """Start every stage in a daemon thread; returns immediately."""
+        self._started_at = time.perf_counter()
+        if not self._stages:
+            self._finish()
+            return
+        for stage in self._stages.values():
+            threading.Thread(target=self._run, args=(stage,), name=f"startup-{stage.name}", daemon=True).start()
+
+    def _run(self, stage: _Stage):
+        for dep in stage.after:
+            self._stages[dep].finished.wait()
+        failed = [dep for dep in stage.after if self._stages[dep].status != DONE]
+        if failed:
+            with self._lock:
+                stage.status = SKIPPED
+                stage.error = f"Depends on {', '.join(failed)}, which did not load"
+        else:
+            with self._lock:
+                stage.status = RUNNING
+            start = time.perf_counter()
+            try:
+                stage.func()
+                status, error = DONE, None
+            except Exception as e:
+                traceback.print_exc()
+                status, error = FAILED, f"{type(e).__name__}: {e}"
+            with self._lock:
+                stage.seconds = time.perf_counter() - start
+                stage.status, stage.error = status, error
+        stage.finished.set()
+
+        with self._lock:
+            # Exactly one thread, the first to see every stage ended, finishes the run
+            last = self._finished_at is None and all(s.finished.is_set() for s in self._stages.values())
+            if last:
+                self._finished_at = time.perf_counter()
+        if last:
+            self._finish()
+
+    def _finish(self):
+        if self._finished_at is None:
+            self._finished_at = time.perf_counter()
+        try:
+            if self._on_finish is not None:
+                self._on_finish(self.progress())
+        finally:
+            self._all_finished.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every stage, optional ones included, has ended; returns ready."""
+        self._all_finished.wait(timeout)
+        return self.ready
+
+    @property
+    def finished(self) -> bool:
+        return self._all_finished.is_set()
+
+    def _ready(self) -> bool:
+        return self._started_at is not None and all(s.status == DONE for s in self._stages.values() if not s.optional)
+
+    @property
+    def ready(self) -> bool:
+        """True once every required stage has loaded successfully."""
+        with self._lock:
+            return self._ready()
+
+    @property
+    def failed(self) -> bool:
+        """True once a required stage has failed or been skipped; the run can no longer become ready."""
+        with self._lock:
+            return any(s.status in (FAILED, SKIPPED) for s in self._stages.values() if not s.optional)
+
+    def progress(self) -> Dict[str, Any]:
+        """Readiness, elapsed time and status, duration and error of every stage."""
+        with self._lock:
+            if self._started_at is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+            stages = {
+                s.name: {
+                    'status': s.status,
+                    'seconds': None if s.seconds is None else round(s.seconds, 3),
+                    **({'optional': True} if s.optional else {}),
+                    **({'error': s.error} if s.error else {})
+                }
+                for s in self._stages.values()
+            }
+            ready = self._ready()
+        return {'ready': ready, 'elapsed_seconds': round(elapsed, 3), 'stages': stages}
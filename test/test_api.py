@@ -0,0 +1,321 @@
+import unittest
+import asyncio
+import io
+import json
+import threading
+import time
+from unittest import mock
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+import api
+from modules.executor import WorkExecutor
+from modules.flat_index import FlatIndex
+from modules.result_cache import ResultCache
+from modules.startup import StartupStages
+
+REQUEST = {'constraints': {}, 'page': 1}
+
+class TestReadiness(unittest.TestCase):
+    """Readiness gating, without running the startup handler (the client is not entered)."""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        for attr in ('startup', 'df'):
+            if hasattr(api.app.state, attr):
+                delattr(api.app.state, attr)
+
+    def start(self, stages: StartupStages) -> StartupStages:
+        api.app.state.startup = stages
+        stages.start()
+        return stages
+
+    def test_loading(self):
+        stages = self.start(StartupStages().add('dataset', lambda: self.release.wait(5)))
+        self.assertEqual(self.client.get('/health').status_code, 200)
+
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['stages']['dataset']['status'], 'running')
+
+        response = self.client.post('/recommend', json=REQUEST)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+        self.release.set()
+        self.assertTrue(stages.wait(5))
+        self.assertEqual(self.client.get('/ready').status_code, 200)
+
+    def test_failed_stage(self):
+        def broken():
+            raise FileNotFoundError("ResaleFlatPricesData_processed.csv")
+        self.start(StartupStages().add('dataset', broken).add('flat_index', lambda: None, after=['dataset'])).wait(5)
+
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['stages']['flat_index']['status'], 'skipped')
+
+        response = self.client.post('/recommend', json=REQUEST)
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn('retry-after', response.headers)
+
+    def test_optional_stage_does_not_gate(self):
+        def broken_warmup():
+            raise IndexError("single positional indexer is out-of-bounds")
+        stages = StartupStages()
+        stages.add('dataset', lambda: None)
+        stages.add('insight_warmup', broken_warmup, after=['dataset'], optional=True)
+        self.assertTrue(self.start(stages).wait(5))
+
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stages']['insight_warmup']['status'], 'failed')
+
+class TestRunWork(unittest.TestCase):
+    """Status codes of run_work, with /recommend's work function replaced."""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+        self.release = threading.Event()
+        self.executor = WorkExecutor(max_workers=1, max_queue=0, timeout_seconds=0.2)
+        api.app.state.executor = self.executor
+        api.app.state.startup = StartupStages()
+        api.app.state.startup.start()
+        api.app.state.df = pd.DataFrame()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+        for attr in ('executor', 'startup', 'df'):
+            delattr(api.app.state, attr)
+
+    def block(self, *args):
+        self.release.wait(5)
+
+    def test_saturated(self):
+        threading.Thread(target=asyncio.run, args=(self.executor.run(self.block),), daemon=True).start()
+        while self.executor.running == 0:
+            time.sleep(0.01)
+        response = self.client.post('/recommend', json=REQUEST)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+    def test_timeout(self):
+        with mock.patch.object(api, 'recommend_page', self.block):
+            self.assertEqual(self.client.post('/recommend', json=REQUEST).status_code, 504)
+
+    def test_error(self):
+        def broken(*args):
+            raise KeyError('resale_price')
+        with mock.patch.object(api, 'recommend_page', broken):
+            self.assertEqual(self.client.post('/recommend', json=REQUEST).status_code, 500)
+
+class StubInsights:
+    """Stands in for the Bayesian insight generator: one summary per row, derived from the row."""
+
+    def get_insights_batch(self, df: pd.DataFrame) -> list:
+        return [{'flat_id': int(flat_id)} for flat_id in df['flat_id']]
+
+def synthetic_flats(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Processed-dataset columns with coarse values, so many rows tie on score, under a shuffled index."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'flat_id': np.arange(n_rows),
+        'town': rng.choice(['BISHAN', 'BEDOK', 'TAMPINES', 'YISHUN'], n_rows),
+        'flat_type': rng.choice(['3 ROOM', '4 ROOM', '5 ROOM'], n_rows),
+        'storey_range': rng.choice(['01 TO 03', '04 TO 06', '07 TO 09'], n_rows),
+        'flat_model': rng.choice(['Model A', 'Improved'], n_rows),
+        'resale_price': rng.choice([400000, 450000, 500000], n_rows),
+        'floor_area_sqm': rng.choice([70.0, 90.0, 110.0], n_rows),
+        'remaining_lease_years': rng.choice([60.0, 75.0, 90.0], n_rows),
+        'dist_mrt_km': rng.choice([0.5, 1.0], n_rows)
+    })
+    df.index = rng.permutation(np.arange(10 * n_rows))[:n_rows]
+    return df
+
+class RecommendTestCase(unittest.TestCase):
+    """Endpoints served from a synthetic dataset, without running the startup handler."""
+
+    STATE = ('df', 'flat_index', 'dataset_version', 'result_cache', 'insight_generator',
+             'insight_table', 'mcda_criteria', 'executor', 'startup')
+
+    def setUp(self):
+        df = synthetic_flats(3000)
+        state = api.app.state
+        state.df = df
+        state.flat_index = FlatIndex(df)
+        state.dataset_version = 'v1'
+        state.result_cache = ResultCache()
+        state.insight_generator = StubInsights()
+        state.insight_table = None
+        state.mcda_criteria = json.load(open('config/mcda_criteria.json'))
+        state.executor = WorkExecutor(max_workers=1, max_queue=16, timeout_seconds=30)
+        state.startup = StartupStages()
+        state.startup.start()
+        self.client = TestClient(api.app)
+
+    def tearDown(self):
+        api.app.state.executor.shutdown()
+        for attr in self.STATE:
+            delattr(api.app.state, attr)
+
+    def recommend(self, body: dict) -> dict:
+        response = self.client.post('/recommend', json=body)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def offset_ranking(self, constraints: dict, priority: str) -> list:
+        """Every recommendation of a query, walked through the offset pages of /recommend."""
+        body = {'constraints': constraints, 'priority': priority, 'page': 1}
+        rows = []
+        while True:
+            page = self.recommend(body)['recommendations']
+            if not page:
+                return rows
+            rows.extend(page)
+            body['page'] += 1
+
+class TestCursorPagination(RecommendTestCase):
+
+    def test_cursor_pages_match_offset_pages(self):
+        constraints = {'towns': ['BISHAN', 'TAMPINES']}
+        for priority in ('Price', 'None - treat equally'):
+            expected = self.offset_ranking(constraints, priority)
+            body = {'constraints': constraints, 'priority': priority, 'page_size': 25}
+            walked = []
+            while True:
+                response = self.client.post('/recommend/cursor', json=body)
+                self.assertEqual(response.status_code, 200)
+                content = response.json()
+                walked.extend(content['recommendations'])
+                if content['next_cursor'] is None:
+                    break
+                body['cursor'] = content['next_cursor']
+            self.assertEqual(content['total_found'], len(expected))
+            self.assertEqual(walked, expected)
+
+class TestResultCache(RecommendTestCase):
+    """get_ranked_result through /recommend: cache hits, longer prefixes and dataset versions."""
+
+    BODY = {'constraints': {'towns': ['YISHUN']}, 'priority': 'Lease'}
+
+    def setUp(self):
+        super().setUp()
+        mock.patch.object(api, 'RESULT_CACHE_MIN_RANKED', 20).start()
+        self.filter_and_score = mock.patch.object(api, 'filter_and_score', wraps=api.filter_and_score).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def cached(self):
+        key = api.result_key(self.BODY['constraints'], self.BODY['priority'], api.app.state.dataset_version)
+        return api.app.state.result_cache.get(key)
+
+    def uncached_page(self, page: int) -> dict:
+        api.app.state.result_cache = ResultCache()
+        return self.recommend(dict(self.BODY, page=page))
+
+    def test_hit(self):
+        first = self.recommend(dict(self.BODY, page=1))
+        second = self.recommend(dict(self.BODY, page=2))
+        self.assertEqual(self.filter_and_score.call_count, 1)
+        self.assertEqual(api.app.state.result_cache.hits, 1)
+        self.assertEqual(first, self.recommend(dict(self.BODY, page=1)))
+        self.assertEqual(second, self.uncached_page(2))
+
+    def test_deep_page_extends_prefix(self):
+        self.recommend(dict(self.BODY, page=1))
+        self.assertEqual(len(self.cached().ranked_labels), 20)
+        deep = self.recommend(dict(self.BODY, page=6))
+        # The cached filtered rows are re-ranked to a longer prefix without filtering again
+        self.assertEqual(self.filter_and_score.call_count, 1)
+        self.assertEqual(len(self.cached().ranked_labels), 60)
+        self.assertEqual(len(deep['recommendations']), 10)
+        self.assertEqual(deep, self.uncached_page(6))
+
+    def test_new_dataset_version_misses(self):
+        self.recommend(dict(self.BODY, page=1))
+        api.app.state.dataset_version = 'v2'
+        self.recommend(dict(self.BODY, page=1))
+        self.assertEqual(self.filter_and_score.call_count, 2)
+        self.assertEqual(len(api.app.state.result_cache), 2)
+
+    def test_page_must_be_positive(self):
+        for page in (0, -1):
+            response = self.client.post('/recommend', json=dict(self.BODY, page=page))
+            self.assertEqual(response.status_code, 422)
+        response = self.client.post('/recommend/batch', json={'requests': [dict(self.BODY, page=0)]})
+        self.assertEqual(response.status_code, 422)
+
+class TestBatch(RecommendTestCase):
+
+    def test_matches_individual_requests(self):
+        bishan = {'towns': ['BISHAN']}
+        requests = [
+            # One constraint shared by several pages and priorities
+            {'constraints': bishan, 'priority': 'Price', 'page': 1},
+            {'constraints': bishan, 'priority': 'Price', 'page': 3},
+            {'constraints': bishan, 'priority': 'Nearest MRT', 'page': 2},
+            # A different constraint selecting the same rows, ranked by other priorities
+            {'constraints': dict(bishan, max_price=10 ** 7), 'priority': 'Lease', 'page': 1},
+            {'constraints': dict(bishan, max_price=10 ** 7), 'priority': 'None - treat equally', 'page': 4},
+            {'constraints': {'towns': ['BISHAN', 'BEDOK'], 'flat_models': ['Improved']}, 'page': 2},
+            # No matching rows, and a page past the end
+            {'constraints': {'towns': ['PUNGGOL']}, 'page': 1},
+            {'constraints': bishan, 'priority': 'Price', 'page': 1000}
+        ]
+        expected = []
+        for body in requests:
+            api.app.state.result_cache = ResultCache()
+            expected.append(self.recommend(body))
+        self.assertEqual(expected[6], {'recommendations': [], 'total_found': 0})
+
+        api.app.state.result_cache = ResultCache()
+        response = self.client.post('/recommend/batch', json={'requests': requests})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], expected)
+
+class TestExport(RecommendTestCase):
+
+    def test_export_matches_recommend_order(self):
+        constraints = {'towns': ['BEDOK'], 'flat_types': ['4 ROOM', '5 ROOM']}
+        expected = self.offset_ranking(constraints, 'Floor Area')
+        completed = api.app.state.executor.completed
+        with mock.patch.object(api, 'EXPORT_CHUNK_ROWS', 40):
+            response = self.client.post('/recommend/export', json={
+                'constraints': constraints, 'priority': 'Floor Area', 'format': 'csv', 'include_insights': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['x-total-found'], str(len(expected)))
+        exported = pd.read_csv(io.StringIO(response.text))
+        self.assertEqual(exported['flat_id'].tolist(), [row['flat_id'] for row in expected])
+        np.testing.assert_array_equal(exported['score'], [row['score'] for row in expected])
+        self.assertEqual(exported['insight_summary'].map(json.loads).tolist(),
+                         [row['insight_summary'] for row in expected])
+        # Ranking, then every chunk (and the end of the stream) as separate work items
+        n_chunks = -(-len(expected) // 40)
+        self.assertEqual(api.app.state.executor.completed - completed, 1 + n_chunks + 1)
+
+    def test_latency_covers_streamed_body(self):
+        build_page_frame = api.build_page_frame
+
+        def slow_frame(*args):
+            time.sleep(0.1)
+            return build_page_frame(*args)
+        series = api.REQUEST_SECONDS._series
+        before = series.get(('/recommend/export',), [None, 0.0])[1]
+        with mock.patch.object(api, 'build_page_frame', slow_frame), mock.patch.object(api, 'EXPORT_CHUNK_ROWS', 100):
+            response = self.client.post('/recommend/export', json={'constraints': {'towns': ['BEDOK']}})
+        self.assertEqual(response.status_code, 200)
+        n_chunks = -(-int(response.headers['x-total-found']) // 100)
+        self.assertGreaterEqual(series[('/recommend/export',)][1] - before, 0.1 * n_chunks)
+
+    def test_empty_export(self):
+        response = self.client.post('/recommend/export', json={'constraints': {'towns': ['PUNGGOL']}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['x-total-found'], '0')
+        self.assertEqual(response.text.splitlines()[0].split(',')[0], 'flat_id')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import pickle
+import itertools
+import numpy as np
+from pgmpy.models import DiscreteBayesianNetwork
+from pgmpy.factors.discrete import TabularCPD
+from pgmpy.inference import VariableElimination
+from modules.compiled_inference import CompiledQueries, compile_conditional, requisite_evidence
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BayesianNetwork.pkl')
+
+def small_network() -> VariableElimination:
+    """town -> model -> type, town -> price <- type, type -> area; one model never occurs in town 'B'."""
+    network = DiscreteBayesianNetwork([('town', 'model'), ('model', 'type'), ('town', 'price'),
+                                       ('type', 'price'), ('type', 'area')])
+    network.add_cpds(
+        TabularCPD('town', 2, [[0.6], [0.4]], state_names={'town': ['A', 'B']}),
+        TabularCPD('model', 3, [[0.5, 0.7], [0.3, 0.3], [0.2, 0.0]], evidence=['town'], evidence_card=[2],
+                   state_names={'model': ['m1', 'm2', 'm3'], 'town': ['A', 'B']}),
+        TabularCPD('type', 2, [[0.9, 0.4, 0.1], [0.1, 0.6, 0.9]], evidence=['model'], evidence_card=[3],
+                   state_names={'type': ['3 ROOM', '4 ROOM'], 'model': ['m1', 'm2', 'm3']}),
+        TabularCPD('price', 3, [[0.6, 0.3, 0.4, 0.1], [0.3, 0.4, 0.4, 0.3], [0.1, 0.3, 0.2, 0.6]],
+                   evidence=['town', 'type'], evidence_card=[2, 2],
+                   state_names={'price': ['low', 'mid', 'high'], 'town': ['A', 'B'], 'type': ['3 ROOM', '4 ROOM']}),
+        TabularCPD('area', 2, [[0.8, 0.3], [0.2, 0.7]], evidence=['type'], evidence_card=[2],
+                   state_names={'area': ['small', 'large'], 'type': ['3 ROOM', '4 ROOM']})
+    )
+    return VariableElimination(network)
+
+class TestCompiledInference(unittest.TestCase):
+
+    def assert_matches_elimination(self, inference, table, target, evidence_vars):
+        network = inference.model
+        states = [network.get_cpds(var).state_names[var] for var in evidence_vars]
+        compiled = 0
+        for combo in itertools.product(*states):
+            evidence = dict(zip(evidence_vars, combo))
+            values = table.lookup(evidence)
+            if values is None:
+                continue  # Zero-probability evidence: answered by elimination instead
+            expected = inference.query([target], evidence=evidence, show_progress=False)
+            self.assertEqual(table.target_states, expected.state_names[target])
+            np.testing.assert_allclose(values, expected.values, atol=1e-12)
+            compiled += 1
+        return compiled
+
+    def test_requisite_evidence(self):
+        network = small_network().model
+        self.assertEqual(requisite_evidence(network, 'price', ['town', 'model', 'type']), ['town', 'type'])
+        self.assertEqual(requisite_evidence(network, 'area', ['town', 'model', 'type', 'price']), ['type'])
+        self.assertEqual(requisite_evidence(network, 'price', ['model']), ['model'])
+
+    def test_parent_table_matches_elimination(self):
+        inference = small_network()
+        table = compile_conditional(inference, 'price', ['town', 'model', 'type'])
+        self.assertEqual(table.values.shape, (2, 2, 3))
+        # The CPD answers every combination, including model m3 in town B
+        self.assertEqual(self.assert_matches_elimination(inference, table, 'price', ['town', 'model', 'type']), 12)
+
+    def test_joint_table_matches_elimination(self):
+        inference = small_network()
+        table = compile_conditional(inference, 'price', ['town', 'model'])
+        self.assertEqual(self.assert_matches_elimination(inference, table, 'price', ['town', 'model']), 5)
+        self.assertIsNone(table.lookup({'town': 'B', 'model': 'm3'}))
+
+    def test_compiled_queries(self):
+        compiled = CompiledQueries.compile(small_network(), [('price', ['town', 'model', 'type']),
+                                                             ('area', ['town', 'type'])])
+        values, states = compiled.query('area', {'type': '4 ROOM', 'town': 'A'})
+        np.testing.assert_allclose(values, [0.3, 0.7])
+        self.assertEqual(states, ['small', 'large'])
+        self.assertIsNone(compiled.query('area', {'type': '4 ROOM'}))  # Not a compiled shape
+        self.assertIsNone(compiled.query('price', {'town': 'C', 'model': 'm1', 'type': '3 ROOM'}))
+        self.assertFalse(compiled.tables[('area', frozenset(['town', 'type']))].values.flags.writeable)
+
+    def test_too_large(self):
+        self.assertIsNone(compile_conditional(small_network(), 'price', ['town', 'type'], max_cells=6))
+
+    @unittest.skipUnless(os.path.isfile(MODEL_PATH), "BayesianNetwork.pkl not available")
+    def test_insight_queries_match_elimination(self):
+        from modules.insight_generator import COMPILED_QUERIES
+        with open(MODEL_PATH, "rb") as f:
+            inference = pickle.load(f)
+        rng = np.random.default_rng(0)
+        for target, evidence_vars in COMPILED_QUERIES:
+            table = compile_conditional(inference, target, evidence_vars)
+            states = {var: inference.model.get_cpds(var).state_names[var] for var in evidence_vars}
+            for _ in range(50):
+                evidence = {var: values[rng.integers(len(values))] for var, values in states.items()}
+                expected = inference.query([target], evidence=evidence, show_progress=False)
+                np.testing.assert_allclose(table.lookup(evidence), expected.values, atol=1e-12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from modules.dataset_store import (save_dataset, load_dataset, load_processed_dataset, load_flat_index,
+                                   DatasetStoreWriter)
+from modules.csp_filter import csp_filter_flats
+
+class TestDatasetStore(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'transaction_date': ['2017-01', '2017-02', '2017-01'],
+            'town': ['BISHAN', 'ANG MO KIO', 'BISHAN'],
+            'flat_type': ['4 ROOM', '5 ROOM', '3 ROOM'],
+            'block': ['123A', '45', '7'],
+            'floor_area_sqm': [92.5, 110.0, 67.0],
+            'resale_price': [450000.0, 550000.0, 300000.0],
+            'lease_commence_date': [1985, 1990, 2001],
+            'remaining_lease_years': [61.33, 70.0, 80.75],
+            'nearest_mrt': ['BISHAN MRT STATION', np.nan, 'BISHAN MRT STATION'],
+            'dist_mrt_km': [0.512, np.nan, 0.3]
+        })
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "store")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip_types(self):
+        save_dataset(self.df, self.path)
+        loaded = load_dataset(self.path)
+
+        self.assertEqual(list(loaded.columns), list(self.df.columns))
+        self.assertIsInstance(loaded['town'].dtype, pd.CategoricalDtype)
+        self.assertEqual(loaded['resale_price'].dtype, np.int32)
+        self.assertEqual(loaded['lease_commence_date'].dtype, np.int32)
+        self.assertEqual(loaded['dist_mrt_km'].dtype, np.float32)
+        self.assertEqual(loaded['remaining_lease_years'].dtype, np.float64)
+
+    def test_round_trip_values(self):
+        save_dataset(self.df, self.path)
+        loaded = load_dataset(self.path)
+
+        self.assertEqual(loaded['town'].tolist(), self.df['town'].tolist())
+        self.assertEqual(loaded['block'].tolist(), self.df['block'].tolist())
+        self.assertTrue(pd.isna(loaded['nearest_mrt'].iloc[1]))
+        self.assertEqual(loaded['resale_price'].tolist(), [450000, 550000, 300000])
+        np.testing.assert_allclose(loaded['dist_mrt_km'], self.df['dist_mrt_km'], rtol=1e-6)
+        self.assertEqual(loaded['remaining_lease_years'].tolist(), self.df['remaining_lease_years'].tolist())
+
+    def test_prefers_store_over_csv(self):
+        csv_path = os.path.join(self.tmpdir.name, "processed.csv")
+        self.df.to_csv(csv_path, index=False)
+
+        from_csv = load_processed_dataset(csv_path, self.path)
+        self.assertEqual(from_csv['town'].dtype, object)
+
+        save_dataset(self.df, self.path)
+        from_store = load_processed_dataset(csv_path, self.path)
+        self.assertIsInstance(from_store['town'].dtype, pd.CategoricalDtype)
+
+    def test_memory_mapped_load(self):
+        save_dataset(self.df, self.path)
+        loaded = load_dataset(self.path, mmap=True)
+
+        prices = loaded['resale_price'].to_numpy()
+        self.assertFalse(prices.flags.owndata)
+        self.assertFalse(prices.flags.writeable)
+        self.assertFalse(loaded['town'].cat.codes.to_numpy().flags.writeable)
+        pd.testing.assert_frame_equal(loaded, load_dataset(self.path))
+
+    def test_stored_index_matches_scan(self):
+        save_dataset(self.df, self.path)
+        loaded = load_dataset(self.path, mmap=True)
+        index = load_flat_index(loaded, self.path, mmap=True)
+        self.assertIsInstance(index.sorted_values['dist_mrt_km'], np.memmap)
+
+        # float32 distances must compare the same way through the index and the scan
+        for constraints in [{'max_mrt_distance': 0.3}, {'towns': ['bishan'], 'min_price': 400000},
+                            {'max_mrt_distance': 0.512, 'min_floor_area': 90}]:
+            expected, _ = csp_filter_flats(loaded, constraints)
+            actual, _ = csp_filter_flats(loaded, constraints, index=index)
+            pd.testing.assert_frame_equal(actual, expected)
+        self.assertEqual(len(csp_filter_flats(loaded, {'max_mrt_distance': 0.3}, index=index)[0]), 1)
+
+    def test_chunked_writer_matches_save(self):
+        df = self.df.copy()
+        df['flat_model'] = pd.Categorical(['STANDARD', 'IMPROVED', 'STANDARD'], categories=['STANDARD', 'IMPROVED'])
+        save_dataset(df, self.path)
+
+        chunked_path = os.path.join(self.tmpdir.name, "chunked")
+        writer = DatasetStoreWriter(chunked_path)
+        # nearest_mrt and dist_mrt_km are all null in the second chunk
+        for rows in ([0], [1], [2], []):
+            writer.append(df.iloc[rows])
+        self.assertEqual(writer.close()['n_rows'], 3)
+
+        pd.testing.assert_frame_equal(load_dataset(chunked_path), load_dataset(self.path))
+        self.assertEqual(load_dataset(chunked_path)['flat_model'].cat.categories.tolist(), ['STANDARD', 'IMPROVED'])
+        self.assertEqual(load_flat_index(load_dataset(chunked_path), chunked_path).n_rows, 3)
+        self.assertEqual(sorted(f for f in os.listdir(chunked_path) if f.endswith('.raw')), [])
+
+    def test_writer_rejects_changing_kinds(self):
+        writer = DatasetStoreWriter(self.path)
+        writer.append(pd.DataFrame({'block': [123]}))
+        with self.assertRaises(ValueError):
+            writer.append(pd.DataFrame({'block': ['123A']}))
+
+    def test_index_rebuilt_when_missing(self):
+        index = load_flat_index(self.df, os.path.join(self.tmpdir.name, "missing"))
+        self.assertEqual(index.n_rows, len(self.df))
+
+if __name__ == '__main__':
+    unittest.main()
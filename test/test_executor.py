@@ -0,0 +1,80 @@
+import unittest
+import asyncio
+import threading
+from modules.executor import WorkExecutor, ExecutorSaturated
+
+class TestWorkExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def block(self, value=None):
+        self.release.wait(5)
+        return value
+
+    def test_runs_work_off_the_event_loop(self):
+        executor = WorkExecutor(max_workers=2, max_queue=0, timeout_seconds=5)
+
+        async def main():
+            work = asyncio.ensure_future(executor.run(self.block, 'done'))
+            # The loop keeps serving other coroutines while the work blocks its thread
+            await asyncio.sleep(0.05)
+            self.assertFalse(work.done())
+            self.release.set()
+            return await work
+
+        self.assertEqual(asyncio.run(main()), 'done')
+        stats = executor.stats()
+        self.assertEqual((stats['completed'], stats['in_flight']), (1, 0))
+        executor.shutdown(wait=True)
+
+    def test_sheds_load_when_saturated(self):
+        executor = WorkExecutor(max_workers=1, max_queue=1, timeout_seconds=5)
+
+        async def main():
+            running = asyncio.ensure_future(executor.run(self.block))
+            queued = asyncio.ensure_future(executor.run(self.block))
+            await asyncio.sleep(0.05)
+            self.assertEqual((executor.running, executor.queued), (1, 1))
+            with self.assertRaises(ExecutorSaturated):
+                await executor.run(self.block)
+            self.release.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(main())
+        stats = executor.stats()
+        self.assertEqual((stats['rejected'], stats['completed'], stats['max_queue_seen']), (1, 2, 1))
+        executor.shutdown(wait=True)
+
+    def test_timeout_keeps_slot_until_work_finishes(self):
+        executor = WorkExecutor(max_workers=1, max_queue=0, timeout_seconds=0.05)
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await executor.run(self.block)
+            # The abandoned work is still running, so there is no free slot
+            with self.assertRaises(ExecutorSaturated):
+                await executor.run(self.block)
+
+        asyncio.run(main())
+        self.assertEqual(executor.stats()['timeouts'], 1)
+        self.release.set()
+        executor.shutdown(wait=True)
+        self.assertEqual(executor.stats()['in_flight'], 0)
+
+    def test_errors_propagate(self):
+        executor = WorkExecutor(max_workers=1, max_queue=0, timeout_seconds=5)
+
+        def fail():
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(executor.run(fail))
+        executor.shutdown(wait=True)
+        self.assertEqual(executor.stats()['failed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import io
+import json
+import numpy as np
+import pandas as pd
+from modules.export import csv_chunks, ndjson_chunks, arrow_chunks
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'town': pd.Categorical(['BISHAN', 'BEDOK', 'BISHAN', 'TAMPINES', 'BEDOK']),
+            'resale_price': np.array([450000, 550000, 300000, 610000, 380000], dtype=np.int32),
+            'dist_mrt_km': np.array([0.5, np.nan, 0.25, 1.5, 2.0], dtype=np.float32),
+            'score': [9.1, 8.5, 8.5, 7.0, 3.2],
+            'insight_summary': [{'tiers': {'lease_value': 'Good'}, 'text': 'Best value'}] * 5
+        }, index=[7, 3, 11, 0, 42])
+        self.chunks = [self.df.iloc[:2], self.df.iloc[2:4], self.df.iloc[4:]]
+
+    def test_csv_single_header(self):
+        text = b"".join(csv_chunks(self.chunks)).decode("utf-8")
+        loaded = pd.read_csv(io.StringIO(text))
+        self.assertEqual(len(loaded), 5)
+        self.assertEqual(list(loaded.columns), list(self.df.columns))
+        self.assertEqual(loaded['town'].tolist(), self.df['town'].tolist())
+        self.assertEqual(json.loads(loaded['insight_summary'][0])['text'], 'Best value')
+
+    def test_ndjson_rows(self):
+        lines = b"".join(ndjson_chunks(self.chunks)).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertIsNone(json.loads(lines[1])['dist_mrt_km'])
+        self.assertEqual(json.loads(lines[4])['insight_summary']['tiers'], {'lease_value': 'Good'})
+
+    def test_arrow_stream(self):
+        import pyarrow as pa
+        data = b"".join(arrow_chunks(self.chunks))
+        table = pa.ipc.open_stream(data).read_all()
+        self.assertEqual(table.num_rows, 5)
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('town').type))
+        loaded = table.to_pandas()
+        self.assertEqual(loaded['resale_price'].tolist(), self.df['resale_price'].tolist())
+        self.assertEqual(loaded['town'].astype(str).tolist(), self.df['town'].astype(str).tolist())
+        self.assertTrue(np.isnan(loaded['dist_mrt_km'][1]))
+
+    def test_empty_export(self):
+        import pyarrow as pa
+        empty = [self.df.iloc[:0]]
+        self.assertEqual(b"".join(csv_chunks(empty)).decode("utf-8").strip(),
+                         ",".join(self.df.columns))
+        self.assertEqual(b"".join(ndjson_chunks(empty)), b"")
+        table = pa.ipc.open_stream(b"".join(arrow_chunks(empty))).read_all()
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, list(self.df.columns))
+
+if __name__ == '__main__':
+    unittest.main()
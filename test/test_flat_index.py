@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from modules.flat_index import FlatIndex
+from modules.csp_filter import csp_filter_flats
+
+class TestFlatIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'town': ['BISHAN', 'ANG MO KIO', 'TAMPINES', 'BISHAN', 'QUEENSTOWN', 'BISHAN', 'TAMPINES'],
+            'flat_type': ['EXECUTIVE', '5 ROOM', '3 ROOM', '4 ROOM', '5 ROOM', '4 ROOM', '4 ROOM'],
+            'resale_price': [850000, 550000, 300000, 480000, 600000, 420000, 500000],
+            'floor_area_sqm': [143, 110, 75, 92, 120, 88, 90],
+            'storey_range': ['01 TO 03', '07 TO 09', '04 TO 06', '04 TO 06', '10 TO 12', '07 TO 09', '04 TO 06'],
+            'remaining_lease_years': [74, 70, 80, 60, 55, 68, np.nan],
+            'flat_model': ['APARTMENT', 'IMPROVED', 'STANDARD', 'MODEL A', 'PREMIUM', 'MODEL A', 'MODEL A'],
+            'dist_mrt_km': [0.5, 1.2, 0.8, 0.3, 1.5, 0.6, np.nan]
+        })
+        self.index = FlatIndex(self.df)
+
+    def assertSameResult(self, constraints):
+        expected, _ = csp_filter_flats(self.df, constraints)
+        actual, _ = csp_filter_flats(self.df, constraints, index=self.index)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_no_constraints(self):
+        self.assertTrue(self.index.filter_mask({}).all())
+        self.assertSameResult({})
+
+    def test_categorical_constraints(self):
+        self.assertSameResult({'towns': ['bishan', 'TAMPINES']})
+        self.assertSameResult({'flat_types': ['4 ROOM'], 'flat_models': ['MODEL A']})
+        self.assertSameResult({'storey_ranges': ['04 TO 06', '07 TO 09']})
+        self.assertSameResult({'towns': ['UNKNOWN TOWN']})
+        self.assertSameResult({'towns': [], 'storey_ranges': None})
+
+    def test_range_constraints(self):
+        self.assertSameResult({'min_price': 400000, 'max_price': 500000})
+        self.assertSameResult({'max_price': 480000})
+        self.assertSameResult({'min_floor_area': 90, 'max_floor_area': 120})
+        self.assertSameResult({'min_remaining_lease': 68})
+        self.assertSameResult({'max_mrt_distance': 0.6})
+        self.assertSameResult({'min_price': None, 'max_mrt_distance': None})
+
+    def test_all_constraints(self):
+        self.assertSameResult({
+            'min_price': 400000,
+            'max_price': 500000,
+            'towns': ['BISHAN'],
+            'flat_types': ['4 ROOM'],
+            'min_floor_area': 90,
+            'storey_ranges': ['04 TO 06'],
+            'min_remaining_lease': 60,
+            'flat_models': ['MODEL A'],
+            'max_mrt_distance': 1.0
+        })
+
+    def test_mask_cache_reuse(self):
+        cache = {}
+        first = self.index.filter_mask({'towns': ['BISHAN'], 'max_price': 500000}, mask_cache=cache)
+        second = self.index.filter_mask({'towns': ['bishan'], 'max_price': 500000}, mask_cache=cache)
+        self.assertEqual(len(cache), 2)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(first.sum(), 2)
+
+    def test_filter_shares_mask_cache(self):
+        cache = {}
+        constraints = [{'towns': ['BISHAN'], 'max_price': 500000},
+                       {'towns': ['BISHAN'], 'min_floor_area': 90},
+                       {'max_price': 500000, 'min_floor_area': 90}]
+        for c in constraints:
+            expected, _ = csp_filter_flats(self.df, c)
+            actual, _ = csp_filter_flats(self.df, c, index=self.index, mask_cache=cache)
+            pd.testing.assert_frame_equal(actual, expected)
+        self.assertEqual(len(cache), 3)  # One bitmap per distinct constraint
+
+    def test_save_and_load(self):
+        constraints = {'towns': ['BISHAN', 'QUEENSTOWN'], 'min_floor_area': 90, 'max_mrt_distance': 1.0}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.index.save(tmpdir)
+            loaded = FlatIndex.load(tmpdir)
+            np.testing.assert_array_equal(loaded.filter_mask(constraints), self.index.filter_mask(constraints))
+            del loaded  # Release the memory maps before the directory is removed
+
+    def test_mismatched_dataframe(self):
+        with self.assertRaises(ValueError):
+            csp_filter_flats(self.df.head(3), {}, index=self.index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from modules.insight_generator import InsightGenerator
+
+PRICES = [pd.Interval(100000, 300000), pd.Interval(300000, 500000), pd.Interval(500000, 700000)]
+
+class CountingModel:
+    """Stand-in for VariableElimination that counts how often inference runs."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def query(self, variables, evidence):
+        self.calls += 1
+        return SimpleNamespace(values=np.array([0.2, 0.5, 0.3]),
+                               state_names={variables[0]: PRICES})
+
+class TestInsightQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.model = CountingModel()
+        self.generator = InsightGenerator(self.model, pd.DataFrame(), cache_size=2)
+        self.evidence = {'town': 'BISHAN', 'flat_type': '4 ROOM'}
+
+    def test_repeated_queries_hit_cache(self):
+        first = self.generator.query_top_k_var(self.evidence, top_k=1)
+        second = self.generator.query_top_k_var(dict(reversed(list(self.evidence.items()))), top_k=1)
+
+        self.assertEqual(first, [(0.5, PRICES[1])])
+        self.assertEqual(first, second)
+        self.assertEqual(self.model.calls, 1)
+        stats = self.generator.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+    def test_variable_is_part_of_key(self):
+        self.generator.query_top_k_var(self.evidence)
+        self.generator.query_top_k_var(self.evidence, variable='floor_area_sqm')
+        self.assertEqual(self.model.calls, 2)
+
+    def test_lru_eviction(self):
+        for town in ['BISHAN', 'BEDOK', 'BISHAN', 'TAMPINES', 'BEDOK']:
+            self.generator.query_top_k_var({'town': town})
+        # BEDOK was evicted by TAMPINES, BISHAN stayed because it was used most recently
+        self.assertEqual(self.model.calls, 4)
+        self.assertEqual(self.generator.cache_stats()['size'], 2)
+
+    def test_answers_counted_by_source(self):
+        compiled_states = ['compiled']
+        self.generator.compiled = SimpleNamespace(
+            query=lambda variable, evidence: (np.array([1.0]), compiled_states) if variable == 'resale_price' else None)
+        self.generator.query_posterior('resale_price', self.evidence)
+        self.generator.query_posterior('resale_price', self.evidence)
+        self.generator.query_posterior('floor_area_sqm', self.evidence)
+        stats = self.generator.cache_stats()
+        self.assertEqual((stats['hits'], stats['compiled'], stats['eliminated']), (1, 1, 1))
+        self.assertEqual(self.model.calls, 1)
+
+    def test_cache_disabled(self):
+        generator = InsightGenerator(self.model, pd.DataFrame(), cache_size=0)
+        generator.query_top_k_var(self.evidence)
+        generator.query_top_k_var(self.evidence)
+        self.assertEqual(self.model.calls, 2)
+        self.assertEqual(generator.cache_stats()['size'], 0)
+
+LEASE = [pd.Interval(40, 60), pd.Interval(60, 80), pd.Interval(80, 100)]
+AREA = [pd.Interval(30, 90), pd.Interval(90, 150)]
+
+class IntervalModel(CountingModel):
+    """Posteriors over the interval states of the queried variable."""
+
+    def query(self, variables, evidence):
+        self.calls += 1
+        states = AREA if variables[0] == 'floor_area_sqm' else PRICES
+        values = np.linspace(1, 2, len(states)) if evidence.get('town') == 'BISHAN' else np.linspace(2, 1, len(states))
+        return SimpleNamespace(values=values / values.sum(), state_names={variables[0]: states})
+
+class TestInsightBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.categories = pd.DataFrame({
+            'town': pd.Series(['BISHAN', 'TAMPINES']),
+            'flat_type': pd.Series(['4 ROOM', '5 ROOM']),
+            'remaining_lease_years': pd.Series(LEASE),
+            'floor_area_sqm': pd.Series(AREA),
+            'resale_price': pd.Series(PRICES)
+        })
+        # Rows 0, 1 and 4 share every category and interval
+        self.df = pd.DataFrame({
+            'town': pd.Categorical(['BISHAN', 'BISHAN', 'TAMPINES', 'BISHAN', 'BISHAN']),
+            'flat_model': ['MODEL A', 'MODEL A', 'IMPROVED', 'MODEL A', 'MODEL A'],
+            'flat_type': ['4 ROOM', '4 ROOM', '5 ROOM', '4 ROOM', '4 ROOM'],
+            'remaining_lease_years': [61.5, 70.0, 85.0, 45.0, 79.9],
+            'floor_area_sqm': [92.0, 95.0, 110.0, 60.0, 149.0],
+            'resale_price': [450000, 420000, 650000, 200000, 310000]
+        }, index=[10, 11, 12, 13, 14])
+
+    def test_batch_matches_row_by_row(self):
+        generator = InsightGenerator(IntervalModel(), self.categories, cache_size=0)
+        batch = generator.get_insights_batch(self.df)
+
+        self.assertEqual(len(batch), len(self.df))
+        for summary, (_, row) in zip(batch, self.df.iterrows()):
+            expected = generator.get_all_insights_on_row(row.copy())
+            self.assertEqual(list(summary['tiers'].values()), [tier for tier, _ in expected])
+            self.assertIn(summary['text'], [text for _, text in expected])
+
+    def test_each_combination_inferred_once(self):
+        row_model, batch_model = IntervalModel(), IntervalModel()
+        row_generator = InsightGenerator(row_model, self.categories, cache_size=0)
+        for _, row in self.df.iloc[[0, 2, 3]].iterrows():
+            row_generator.get_insights_on_row(row.copy())
+
+        InsightGenerator(batch_model, self.categories, cache_size=0).get_insights_batch(self.df)
+        self.assertEqual(batch_model.calls, row_model.calls)
+
+    def test_value_outside_intervals(self):
+        generator = InsightGenerator(IntervalModel(), self.categories)
+        self.df.loc[12, 'resale_price'] = 5000
+        with self.assertRaises(ValueError):
+            generator.get_insights_batch(self.df)
+        self.assertEqual(generator.get_insights_batch(self.df.iloc[:0]), [])
+
+    def test_warm_up_categorical_frame(self):
+        generator = InsightGenerator(IntervalModel(), self.categories)
+        df = self.df.iloc[[0, 1, 2]].astype({'town': 'category', 'flat_type': 'category', 'flat_model': 'category'})
+        df['town'] = df['town'].cat.add_categories(['ANG MO KIO'])
+        # Only two of the 2 x 3 town and flat_type pairs have rows
+        self.assertEqual(generator.warm_up(df, top_n=5), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from modules.bayes_utils import interval_codes
+from modules.insight_table import InsightTable, build_insight_table
+
+LEASE = [pd.Interval(40, 60), pd.Interval(60, 80), pd.Interval(80, 100)]
+AREA = [pd.Interval(30, 90), pd.Interval(90, 150)]
+PRICE = [pd.Interval(100000, 500000), pd.Interval(500000, 900000)]
+
+class FakeGenerator:
+    """Insights derived directly from the row, counting how often they are computed."""
+
+    def __init__(self):
+        self.categories = pd.DataFrame({
+            'town': pd.Series(['BISHAN', 'TAMPINES']),
+            'flat_model': pd.Series(['Model A', 'Improved']),
+            'flat_type': pd.Series(['4 ROOM', '5 ROOM']),
+            'remaining_lease_years': pd.Series(LEASE),
+            'floor_area_sqm': pd.Series(AREA),
+            'resale_price': pd.Series(PRICE)
+        })
+        self.calls = 0
+
+    def get_all_insights_on_row(self, row):
+        self.calls += 1
+        tier = "Good" if row['resale_price'] < 500000 else "Bad"
+        return [(tier, f"{row['town']} lease"), ("Average", "risk"), ("Average", f"{row['flat_type']} size")]
+
+    def get_insights_on_row(self, row):
+        return {"tiers": {"lease_value": "Live"}, "text": "live"}
+
+    def get_insights_batch(self, df):
+        return [self.get_insights_on_row(row) for _, row in df.iterrows()]
+
+class TestInsightTable(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'town': ['BISHAN', 'BISHAN', 'TAMPINES', 'BISHAN'],
+            'flat_model': ['MODEL A', 'MODEL A', 'IMPROVED', 'MODEL A'],
+            'flat_type': ['4 ROOM', '4 ROOM', '5 ROOM', '4 ROOM'],
+            'remaining_lease_years': [61.5, 70.0, 85.0, 65.0],
+            'floor_area_sqm': [92.0, 95.0, 110.0, 120.0],
+            'resale_price': [480000, 450000, 650000, 700000]
+        })
+        self.generator = FakeGenerator()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.count = build_insight_table(self.df, self.generator, self.tmpdir.name, verbose=False)
+        self.table = InsightTable.load(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_interval_codes(self):
+        codes = interval_codes(np.array([40, 59.9, 60, 99.9, 100, 10, np.nan]), LEASE)
+        np.testing.assert_array_equal(codes, [0, 0, 1, 2, -1, -1, -1])
+
+    def test_one_entry_per_combination(self):
+        # The first two rows share town, model, type and every interval
+        self.assertEqual(self.count, 3)
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.generator.calls, 3)
+
+    def test_lookup_matches_generator(self):
+        results = self.table.lookup_frame(self.df)
+        self.assertEqual(results[0]['tiers'], {"lease_value": "Good", "resale_risk": "Average", "size_value": "Average"})
+        self.assertIn(results[2]['text'], ["TAMPINES lease", "risk", "5 ROOM size"])
+        self.assertEqual(results[3]['tiers']['lease_value'], "Bad")
+        self.assertEqual(self.table.hits, 4)
+
+    def test_counters_under_concurrent_lookups(self):
+        unseen = self.df.assign(remaining_lease_years=20.0)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: self.table.lookup_frame(self.df if i % 2 else unseen), range(400)))
+        self.assertEqual((self.table.hits, self.table.misses), (200 * 4, 200 * 4))
+
+    def test_unseen_combination(self):
+        unseen = self.df.head(2).copy()
+        unseen.loc[1, 'town'] = 'TAMPINES'
+        unseen.loc[0, 'remaining_lease_years'] = 20.0  # Outside every interval
+
+        self.assertEqual(self.table.lookup_frame(unseen), [None, None])
+        live = self.table.get_insights_frame(unseen, fallback=self.generator)
+        self.assertEqual(live[0]['text'], "live")
+        default = self.table.get_insights_frame(unseen)
+        self.assertEqual(default[1]['tiers']['resale_risk'], "Average")
+
+if __name__ == '__main__':
+    unittest.main()
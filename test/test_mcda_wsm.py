@@ -1,7 +1,8 @@
 import unittest
 import pandas as pd
 import numpy as np
-from modules.mcda_wsm import normalize_column, mcda_wsm
+from modules.mcda_wsm import (normalize_column, mcda_wsm, mcda_scores, normalize_criteria,
+                              weighted_scores, top_k_positions, top_k_after)
 
 class TestMCDA(unittest.TestCase):
 
@@ -67,5 +68,75 @@ class TestMCDA(unittest.TestCase):
         ranked_df, _ = mcda_wsm(empty_df, self.criteria)
         self.assertTrue(ranked_df.empty)
 
+    def test_top_k_matches_full_ranking(self):
+        """Tests that top-K mode returns the head of the full ranking."""
+        rng = np.random.default_rng(42)
+        df = pd.DataFrame({
+            'resale_price': rng.choice([400000, 450000, 500000, np.nan], 200),
+            'floor_area_sqm': rng.choice([70, 90, 110], 200),
+        }, index=np.arange(1000, 1200))
+        weights = {'resale_price': 0.6, 'floor_area_sqm': 0.4}
+        full_df, _ = mcda_wsm(df, self.criteria, weights)
+        top_df, _ = mcda_wsm(df, self.criteria, weights, top_k=25)
+
+        self.assertEqual(len(top_df), 25)
+        self.assertEqual(list(top_df['rank']), list(range(1, 26)))
+        np.testing.assert_allclose(top_df['score'], full_df['score'].iloc[:25])
+        self.assertTrue(top_df['score'].is_monotonic_decreasing)
+        # Ties are broken by original position
+        for _, group in top_df.groupby('score'):
+            self.assertTrue(group['index'].is_monotonic_increasing)
+        full_scores = full_df.set_index('index')['score']
+        np.testing.assert_allclose(top_df['score'], full_scores.loc[top_df['index']])
+        np.testing.assert_allclose(top_df['floor_area_sqm_norm'],
+                                   full_df.set_index('index')['floor_area_sqm_norm'].loc[top_df['index']])
+
+    def test_top_k_larger_than_frame(self):
+        """Tests top-K with K beyond the number of rows and on an empty frame."""
+        ranked_df, _ = mcda_wsm(self.df, self.criteria, {'resale_price': 0.8, 'floor_area_sqm': 0.2}, top_k=10)
+        self.assertEqual(list(ranked_df['resale_price']), [400000, 500000, 600000])
+        self.assertAlmostEqual(ranked_df.iloc[0]['score'], 8.0)
+
+        empty_df = pd.DataFrame(columns=['resale_price', 'floor_area_sqm'])
+        ranked_df, _ = mcda_wsm(empty_df, self.criteria, top_k=10)
+        self.assertTrue(ranked_df.empty)
+
+    def test_top_k_positions(self):
+        scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0])
+        np.testing.assert_array_equal(top_k_positions(scores, 3), [1, 3, 2])
+        np.testing.assert_array_equal(top_k_positions(scores, 10), [1, 3, 2, 4, 0])
+        self.assertEqual(len(top_k_positions(scores, 0)), 0)
+
+    def test_top_k_after_walks_full_ranking(self):
+        """Paging with (score, position) cursors yields the stable full ranking, ties included."""
+        rng = np.random.default_rng(3)
+        scores = np.round(rng.uniform(0, 10, 500), 1)  # Coarse rounding forces many ties
+        expected = np.argsort(-scores, kind='stable')
+
+        walked = list(top_k_positions(scores, 7))
+        while True:
+            last = walked[-1]
+            page = top_k_after(scores, 7, scores[last], last)
+            if len(page) == 0:
+                break
+            walked.extend(page)
+        np.testing.assert_array_equal(walked, expected)
+
+    def test_mcda_scores_match_top_k_scores(self):
+        df = pd.DataFrame({
+            'resale_price': [400000, np.nan, 600000, 450000],
+            'floor_area_sqm': [80, 100, 120, 90]
+        })
+        weights = {'resale_price': 0.7, 'floor_area_sqm': 0.3}
+        scores = mcda_scores(df, self.criteria, weights)
+        ranked_df, _ = mcda_wsm(df, self.criteria, weights, top_k=len(df))
+        np.testing.assert_array_equal(scores[ranked_df['index']], ranked_df['score'])
+
+    def test_shared_normalization_across_weightings(self):
+        norm = normalize_criteria(self.df, self.criteria)
+        for weights in [None, {'resale_price': 0.8, 'floor_area_sqm': 0.2}, {'floor_area_sqm': 1.0}]:
+            np.testing.assert_array_equal(weighted_scores(norm, self.criteria, weights),
+                                          mcda_scores(self.df, self.criteria, weights))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+from modules.metrics import (MetricsRegistry, RequestTimer, stage, start_request_timer,
+                             end_request_timer, STAGE_SECONDS)
+from modules.executor import WorkExecutor
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_render(self):
+        counter = self.registry.counter("app_requests_total", "Requests.", labelnames=("status",))
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        counter.inc(status=500)
+        lines = self.registry.render().splitlines()
+
+        self.assertIn("# TYPE app_requests_total counter", lines)
+        self.assertIn('app_requests_total{status="200"} 3', lines)
+        self.assertIn('app_requests_total{status="500"} 1', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("app_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 3.0]:
+            histogram.observe(value)
+        lines = self.registry.render().splitlines()
+
+        self.assertIn('app_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('app_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('app_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn('app_seconds_count 4', lines)
+        self.assertIn('app_seconds_sum 3.65', lines)
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.counter("app_total", "Total.", labelnames=("path",))
+        counter.inc(path='a"b\\c')
+        self.assertIn('app_total{path="a\\"b\\\\c"} 1', self.registry.render())
+
+    def test_collectors_read_at_scrape_time(self):
+        state = {'hits': 1}
+        self.registry.collect(lambda: [("app_hits_total", "counter", "Hits.", [({}, state['hits'])])])
+        self.assertIn("app_hits_total 1", self.registry.render())
+        state['hits'] = 5
+        self.assertIn("app_hits_total 5", self.registry.render())
+
+    def test_broken_collector_does_not_fail_scrape(self):
+        def broken():
+            raise RuntimeError("gone")
+        self.registry.counter("app_total", "Total.").inc()
+        self.registry.collect(broken)
+        output = self.registry.render()
+        self.assertIn("app_total 1", output)
+        self.assertIn("# collector error: gone", output)
+
+    def test_stage_records_into_current_timer(self):
+        timer, token = start_request_timer()
+        try:
+            with stage("filter"):
+                pass
+            with stage("filter"):
+                pass
+            with stage("score"):
+                pass
+        finally:
+            end_request_timer(token)
+        with stage("score"):
+            pass  # Outside the request: histogram only
+
+        self.assertEqual(list(timer.stages), ["filter", "score"])
+        header = timer.server_timing()
+        self.assertRegex(header, r"^filter;dur=\d+\.\d{2}, score;dur=\d+\.\d{2}$")
+        self.assertIn('flatwise_stage_duration_seconds_count{stage="filter"}', "\n".join(STAGE_SECONDS.render()))
+
+    def test_timer_follows_work_into_executor(self):
+        executor = WorkExecutor(max_workers=1, max_queue=0, timeout_seconds=5)
+
+        def work():
+            with stage("rank"):
+                return 1
+
+        async def main():
+            timer, token = start_request_timer()
+            try:
+                await executor.run(work)
+            finally:
+                end_request_timer(token)
+            return timer
+
+        timer = asyncio.run(main())
+        executor.shutdown()
+        self.assertIn("rank", timer.stages)
+
+    def test_empty_timer(self):
+        self.assertEqual(RequestTimer().server_timing(), "")
+
+if __name__ == '__main__':
+    unittest.main()
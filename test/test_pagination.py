@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from modules.pagination import encode_cursor, decode_cursor, CursorError, StaleCursorError
+from modules.result_cache import result_key
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.key = result_key({'towns': ['BISHAN']}, 'Price', 'v1')
+
+    def test_round_trip(self):
+        token = encode_cursor('v1', self.key, np.float64(7.35), np.int64(1234))
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token, 'v1', self.key), {'score': 7.35, 'position': 1234})
+
+    def test_stale_version_rejected(self):
+        token = encode_cursor('v1', self.key, 5.0, 10)
+        with self.assertRaises(StaleCursorError):
+            decode_cursor(token, 'v2', self.key)
+
+    def test_other_query_rejected(self):
+        token = encode_cursor('v1', self.key, 5.0, 10)
+        other = result_key({'towns': ['BEDOK']}, 'Price', 'v1')
+        with self.assertRaises(CursorError) as ctx:
+            decode_cursor(token, 'v1', other)
+        self.assertNotIsInstance(ctx.exception, StaleCursorError)
+
+    def test_malformed_rejected(self):
+        negative = encode_cursor('v1', self.key, 5.0, -1)
+        for token in ['', 'not a cursor', 'e30', 'WzEsMl0', negative]:  # '{}' and '[1,2]'
+            with self.assertRaises(CursorError):
+                decode_cursor(token, 'v1', self.key)
+
+if __name__ == '__main__':
+    unittest.main()
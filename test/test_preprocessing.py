@@ -0,0 +1,351 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+import modules.preprocessing as preprocessing
+import modules.preprocessing_distance as preprocessing_distance
+from modules.dataset_store import save_dataset, load_dataset
+
+class TestUniqueValueMapping(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        leases = ['61 years 04 months', '70 years', '95 years 11 months', '5 months', None,
+                  '55 years 1 month', '  80 years  ', '']
+        storeys = ['01 TO 03', '10 TO 12', '1 TO 3', '12 TO 10', '04 to 06', None,
+                   '07 TO 09 ', 'AB TO CD', '40 TO 42', '01 TO 05 TO 07']
+        streets = ["ANG MO KIO AVE 3", "LOR 24 GEYLANG", "C'WEALTH CL", " jln bt merah ",
+                   None, "TG PAGAR PLAZA", "UPP BOON KENG RD"]
+        n = 2000
+        self.df = pd.DataFrame({
+            'month': ['2017-01'] * n,
+            'town': rng.choice(['BISHAN', 'tampines', 'Ang Mo Kio'], n),
+            'flat_type': rng.choice(['4 ROOM', '5 room'], n),
+            'block': rng.choice(['1', '123A', '45'], n),
+            'street_name': rng.choice(np.array(streets, dtype=object), n),
+            'storey_range': rng.choice(np.array(storeys, dtype=object), n),
+            'floor_area_sqm': rng.uniform(40, 150, n),
+            'flat_model': rng.choice(['Model A', 'Improved'], n),
+            'lease_commence_date': rng.integers(1970, 2020, n),
+            'remaining_lease': rng.choice(np.array(leases, dtype=object), n),
+            'resale_price': rng.uniform(2e5, 1e6, n)
+        })
+
+    def test_matches_apply(self):
+        for module in (preprocessing, preprocessing_distance):
+            for col, func in [('storey_range', module.validate_storey_range_format),
+                              ('remaining_lease', module.extract_remaining_lease_years)]:
+                expected = self.df[col].apply(func)
+                actual = module.map_unique_values(self.df[col], func)
+                pd.testing.assert_series_equal(actual, expected)
+
+        expected = self.df['street_name'].apply(preprocessing_distance.normalise_street_name)
+        actual = preprocessing_distance.map_unique_values(self.df['street_name'],
+                                                          preprocessing_distance.normalise_street_name)
+        pd.testing.assert_series_equal(actual, expected)
+
+    def test_non_default_index(self):
+        series = pd.Series(['01 TO 03', None, '01 TO 03'], index=[10, 5, 7], name='storey_range')
+        mapped = preprocessing.map_unique_values(series, preprocessing.validate_storey_range_format)
+        pd.testing.assert_series_equal(mapped, series.apply(preprocessing.validate_storey_range_format))
+
+    def test_clean_data_parity(self):
+        for module in (preprocessing, preprocessing_distance):
+            df = self.df.dropna(subset=['storey_range']).copy()
+            reference = df[df['storey_range'].apply(module.validate_storey_range_format)].copy()
+            cleaned = module.clean_data(df)
+
+            self.assertEqual(cleaned.index.tolist(), reference.index.tolist())
+            pd.testing.assert_series_equal(
+                cleaned['remaining_lease_years'],
+                reference['remaining_lease'].apply(module.extract_remaining_lease_years),
+                check_names=False
+            )
+
+def fake_enrich(df, *args, **kwargs):
+    """Stands in for the OneMap enrichment: one fixed location per block."""
+    df = df.copy()
+    df['latitude'] = 1.3 + pd.to_numeric(df['block'].str.extract(r'(\d+)')[0]) / 1000
+    df['longitude'] = 103.8
+    df['nearest_mrt'] = 'TEST MRT STATION'
+    df['dist_mrt_km'] = 0.5
+    df['search_radius_km'] = 2.0
+    return df, {}
+
+class TestIncrementalPreprocessing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmpdir.name, 'raw.csv')
+        self.output_path = os.path.join(self.tmpdir.name, 'processed.csv')
+        self.raw = pd.DataFrame({
+            'month': ['2017-01', '2017-01', '2017-01', '2017-02', '2017-02'],
+            'town': ['BISHAN', 'BISHAN', 'TAMPINES', 'BISHAN', 'TAMPINES'],
+            'flat_type': ['4 ROOM'] * 5,
+            'block': ['1', '1', '2', '3', '4'],
+            'street_name': ['BISHAN ST 11', 'BISHAN ST 11', 'TAMPINES AVE 4', 'BISHAN ST 12', 'TAMPINES AVE 4'],
+            'storey_range': ['01 TO 03', '01 TO 03', '04 TO 06', '07 TO 09', 'BAD'],
+            'floor_area_sqm': [92.0, 92.0, 100.0, 90.0, 95.0],
+            'flat_model': ['Model A'] * 5,
+            'lease_commence_date': [1985] * 5,
+            'remaining_lease': ['61 years 04 months'] * 5,
+            'resale_price': [400000.0, 400000.0, 500000.0, 450000.0, 470000.0]
+        })
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_incremental(self, raw):
+        raw.to_csv(self.input_path, index=False)
+        with mock.patch.object(preprocessing_distance, 'enrich_with_location_data', fake_enrich):
+            return preprocessing_distance.preprocess_incremental(self.input_path, self.output_path)
+
+    def test_hash_rows_distinguishes_duplicates(self):
+        hashes = preprocessing_distance.hash_rows(self.raw.astype(str))
+        self.assertEqual(len(np.unique(hashes)), 5)
+        np.testing.assert_array_equal(preprocessing_distance.hash_rows(self.raw.iloc[:2].astype(str)), hashes[:2])
+
+    def test_appends_only_new_rows(self):
+        first, _ = self.run_incremental(self.raw)
+        self.assertEqual(len(first), 4)  # The BAD storey range is dropped
+
+        later = pd.concat([self.raw, pd.DataFrame({
+            'month': ['2017-01', '2017-03', '2017-03'],
+            'town': ['BISHAN', 'BISHAN', 'TAMPINES'],
+            'flat_type': ['4 ROOM'] * 3,
+            'block': ['1', '5', '6'],
+            'street_name': ['BISHAN ST 11', 'BISHAN ST 13', 'TAMPINES AVE 5'],
+            'storey_range': ['01 TO 03', '10 TO 12', '01 TO 03'],
+            'floor_area_sqm': [92.0, 110.0, 67.0],
+            'flat_model': ['Model A'] * 3,
+            'lease_commence_date': [1985] * 3,
+            'remaining_lease': ['61 years 04 months'] * 3,
+            'resale_price': [400000.0, 600000.0, 300000.0]
+        })], ignore_index=True)
+        appended, summary = self.run_incremental(later)
+        self.assertEqual(len(appended), 3)  # A third identical 2017-01 sale plus two new months
+        self.assertEqual(summary['incremental']['last_transaction_date'], '2017-03')
+
+        # The appended file holds the same rows as a full rebuild of the latest input
+        with mock.patch.object(preprocessing_distance, 'enrich_with_location_data', fake_enrich):
+            rebuilt, _ = preprocessing_distance.preprocess_hdb_data(self.input_path)
+        output = pd.read_csv(self.output_path)
+        key = ['transaction_date', 'block', 'resale_price']
+        pd.testing.assert_frame_equal(
+            output.sort_values(key).reset_index(drop=True),
+            pd.read_csv(io.StringIO(rebuilt.to_csv(index=False))).sort_values(key).reset_index(drop=True),
+            check_dtype=False
+        )
+
+        manifest_path, _ = preprocessing_distance.manifest_paths(self.output_path)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['partitions'], {'2017-01': 4, '2017-02': 1, '2017-03': 2})
+        self.assertEqual(manifest['total_rows'], 7)
+
+        unchanged, _ = self.run_incremental(later)
+        self.assertEqual(len(unchanged), 0)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 7)
+
+    def test_corrections_are_appended_and_reported(self):
+        self.run_incremental(self.raw)
+        corrected = self.raw.copy()
+        corrected.loc[3, 'resale_price'] = 455000.0
+        appended, summary = self.run_incremental(corrected)
+
+        # The corrected sale is a new row; the row it replaces is kept until a full build
+        self.assertEqual(appended['resale_price'].tolist(), [455000.0])
+        self.assertEqual(summary['incremental']['superseded_raw_rows'], 1)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 5)
+
+    def test_interrupted_append_is_recovered(self):
+        self.run_incremental(self.raw.iloc[:3])
+        manifest_path, hashes_path = preprocessing_distance.manifest_paths(self.output_path)
+        replace = os.replace
+
+        def interrupt_before(dst):
+            def checked_replace(src, target):
+                if target == dst:
+                    raise KeyboardInterrupt
+                replace(src, target)
+            return checked_replace
+
+        # Stopped after the rows were appended but before their hashes were published: rolled back
+        with mock.patch.object(preprocessing_distance.os, 'replace', interrupt_before(hashes_path)):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_incremental(self.raw)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 4)
+        appended, _ = self.run_incremental(self.raw)
+        self.assertEqual(len(appended), 1)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 4)
+        self.assertFalse(os.path.exists(hashes_path + '.pending'))
+
+        # Stopped after the hashes were published but before the final manifest: completed
+        later = pd.concat([self.raw, self.raw.iloc[[0]].assign(month='2017-03')], ignore_index=True)
+        published = []
+
+        def interrupt_final_manifest(src, target):
+            if target == manifest_path and hashes_path in published:
+                raise KeyboardInterrupt
+            published.append(target)
+            replace(src, target)
+        with mock.patch.object(preprocessing_distance.os, 'replace', interrupt_final_manifest):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_incremental(later)
+        appended, _ = self.run_incremental(later)
+        self.assertEqual(len(appended), 0)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 5)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assertNotIn('pending', manifest)
+        self.assertEqual(manifest['total_rows'], 5)
+
+class TestStreamingPreprocessing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmpdir.name, 'raw.csv')
+        self.output_path = os.path.join(self.tmpdir.name, 'processed.csv')
+        self.cache_path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+        rng = np.random.default_rng(2)
+        n = 500
+        blocks = rng.choice(['1', '2', '3', '10A'], n)
+        self.raw = pd.DataFrame({
+            'month': rng.choice(['2017-01', '2017-02', '2018-05'], n),
+            'town': rng.choice(['BISHAN', 'TAMPINES'], n),
+            'flat_type': rng.choice(['4 ROOM', '5 ROOM'], n),
+            'block': blocks,
+            'street_name': rng.choice(['BISHAN ST 11', 'TAMPINES AVE 4'], n),
+            'storey_range': rng.choice(['01 TO 03', '04 TO 06', 'BAD'], n),
+            'floor_area_sqm': rng.choice([67.0, 92.0, 110.5], n),
+            'flat_model': 'Model A',
+            'lease_commence_date': 1985,
+            'remaining_lease': rng.choice(['61 years 04 months', '70 years'], n),
+            'resale_price': rng.integers(200, 900, n) * 1000.0
+        })
+        self.raw.to_csv(self.input_path, index=False)
+
+        # Every address is cached, so enrichment needs no OneMap calls
+        with preprocessing_distance.LocationCache(self.cache_path) as cache:
+            for i, block in enumerate(['1', '2', '3', '10A']):
+                for street in ['BISHAN STREET 11', 'TAMPINES AVENUE 4']:
+                    far = block == '3' and street.startswith('TAMPINES')
+                    cache.put(f"{block} {street}", {
+                        'block': block, 'street_name': street, 'latitude': 1.3 + i / 100,
+                        'longitude': 103.8, 'nearest_mrt': np.nan if far else f"STATION {i}",
+                        'dist_mrt_km': np.nan if far else 0.3 * (i + 1),
+                        'search_radius_km': np.nan if far else (2.0 if i < 3 else 5.0)
+                    })
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_matches_in_memory_pipeline(self):
+        summary = preprocessing_distance.preprocess_hdb_data_streaming(
+            self.input_path, self.output_path, chunk_rows=64,
+            cache_path=self.cache_path, stations_path=None
+        )
+        expected = preprocessing_distance.clean_data(preprocessing_distance.read_raw_csv(self.input_path),
+                                                     verbose=False)
+        expected, coverage = preprocessing_distance.enrich_with_location_data(
+            expected, cache_path=self.cache_path, stations_path=None
+        )
+        expected = pd.read_csv(io.StringIO(expected.to_csv(index=False)))
+        pd.testing.assert_frame_equal(pd.read_csv(self.output_path), expected)
+
+        reference = preprocessing_distance.get_processing_summary(expected)
+        self.assertEqual(summary['dataset_info'], reference['dataset_info'])
+        self.assertEqual(summary['property_distribution'], reference['property_distribution'])
+        for stat in ('min', 'max', 'mean', 'std'):
+            self.assertAlmostEqual(summary['price_statistics'][stat], reference['price_statistics'][stat], places=4)
+        self.assertLessEqual(abs(summary['price_statistics']['median'] - reference['price_statistics']['median'])
+                             / reference['price_statistics']['median'], 0.02)
+        self.assertEqual(summary['mrt_coverage']['mrt_coverage'], coverage['mrt_coverage'])
+        self.assertAlmostEqual(summary['mrt_coverage']['distance_statistics']['mean_km'],
+                               coverage['distance_statistics']['mean_km'])
+
+    def test_writes_manifest_for_incremental_runs(self):
+        preprocessing_distance.preprocess_hdb_data_streaming(self.input_path, self.output_path,
+                                                             include_location=False, chunk_rows=100)
+        manifest = preprocessing_distance.load_manifest(self.output_path)
+        self.assertEqual(manifest['total_rows'], len(pd.read_csv(self.output_path)))
+        self.assertEqual(manifest['last_transaction_date'], '2018-05')
+
+        # Chunked hashing gives the same row hashes as hashing the whole file
+        with mock.patch.object(preprocessing_distance, 'enrich_with_location_data', fake_enrich):
+            appended, _ = preprocessing_distance.preprocess_incremental(self.input_path, self.output_path)
+        self.assertEqual(len(appended), 0)
+
+    def test_parallel_matches_single_process(self):
+        serial = preprocessing_distance.preprocess_hdb_data_streaming(
+            self.input_path, self.output_path, chunk_rows=50,
+            cache_path=self.cache_path, stations_path=None
+        )
+        with open(self.output_path, 'rb') as f:
+            expected = f.read()
+        parallel_path = os.path.join(self.tmpdir.name, 'parallel.csv')
+        parallel = preprocessing_distance.preprocess_hdb_data_streaming(
+            self.input_path, parallel_path, chunk_rows=50,
+            cache_path=self.cache_path, stations_path=None, workers=3
+        )
+        with open(parallel_path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertEqual(parallel['dataset_info'], serial['dataset_info'])
+        self.assertEqual(parallel['mrt_coverage']['mrt_coverage'], serial['mrt_coverage']['mrt_coverage'])
+        self.assertAlmostEqual(parallel['price_statistics']['std'], serial['price_statistics']['std'])
+
+        _, serial_hashes = preprocessing_distance.manifest_paths(self.output_path)
+        _, parallel_hashes = preprocessing_distance.manifest_paths(parallel_path)
+        np.testing.assert_array_equal(np.load(parallel_hashes), np.load(serial_hashes))
+        self.assertEqual(os.listdir(self.tmpdir.name).count('parallel.csv.partial'), 0)
+
+    def test_writes_columnar_store_while_streaming(self):
+        store_path = os.path.join(self.tmpdir.name, 'processed')
+        preprocessing_distance.preprocess_hdb_data_streaming(
+            self.input_path, self.output_path, chunk_rows=50,
+            cache_path=self.cache_path, stations_path=None, store_path=store_path
+        )
+        expected_path = os.path.join(self.tmpdir.name, 'expected')
+        save_dataset(pd.read_csv(self.output_path), expected_path)
+        expected = load_dataset(expected_path)
+        pd.testing.assert_frame_equal(load_dataset(store_path), expected)
+        self.assertTrue(os.path.isfile(os.path.join(store_path, 'index', 'meta.json')))
+
+        # Part stores are merged against one dictionary, in partition order
+        parallel_path = os.path.join(self.tmpdir.name, 'parallel')
+        preprocessing_distance.preprocess_hdb_data_streaming(
+            self.input_path, parallel_path + '.csv', chunk_rows=50,
+            cache_path=self.cache_path, stations_path=None, workers=3, store_path=parallel_path
+        )
+        pd.testing.assert_frame_equal(load_dataset(parallel_path, mmap=True), expected)
+        self.assertEqual(sorted(name for name in os.listdir(self.tmpdir.name) if 'partial' in name), [])
+
+    def test_csv_partitions_cover_every_row(self):
+        partitions = preprocessing_distance.csv_partitions(self.input_path, 7)
+        names = list(self.raw.columns)
+        rows = pd.concat([chunk for start, end in partitions for chunk in
+                          preprocessing_distance.read_csv_partition(self.input_path, start, end, names, 1000)],
+                         ignore_index=True)
+        pd.testing.assert_frame_equal(rows, preprocessing_distance.read_raw_csv(self.input_path))
+        self.assertEqual(len(partitions), 7)
+
+        # Small chunks stop at the end of their range instead of running into the next one
+        start, end = partitions[1]
+        chunks = list(preprocessing_distance.read_csv_partition(self.input_path, start, end, names, 2))
+        self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks, ignore_index=True),
+            next(preprocessing_distance.read_csv_partition(self.input_path, start, end, names, 1000)))
+
+    def test_chunk_rows_from_memory_budget(self):
+        small = preprocessing_distance.estimate_chunk_rows(self.input_path, memory_budget_mb=1)
+        large = preprocessing_distance.estimate_chunk_rows(self.input_path, memory_budget_mb=64)
+        self.assertGreaterEqual(small, 1000)
+        self.assertGreater(large, small)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,296 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from geopy.distance import great_circle
+import modules.preprocessing_distance as pdist
+
+# Geocoding results served by the stub, keyed by searchVal
+STUB_ADDRESSES = {
+    '999 STUB ROAD': (1.35, 103.85),
+    '5 FAR ROAD': (1.45, 103.70),
+}
+
+class StubOneMapHandler(BaseHTTPRequestHandler):
+    """Minimal OneMap search and nearest-MRT endpoints."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(0.02)
+            if url.path == '/search':
+                search = params['searchVal']
+                with server.lock:
+                    fail = server.failures.get(search, 0)
+                    if fail:
+                        server.failures[search] = fail - 1
+                if fail:
+                    return self._send(500, {'error': 'busy'})
+                coords = STUB_ADDRESSES.get(search)
+                results = [{'LATITUDE': str(coords[0]), 'LONGITUDE': str(coords[1])}] if coords else []
+                return self._send(200, {'results': results})
+            if url.path == '/mrt':
+                lat, lon = float(params['latitude']), float(params['longitude'])
+                with server.lock:
+                    server.mrt_requests += 1
+                if lat > 1.4 and int(params['radius_in_meters']) < 5000:
+                    return self._send(200, [])
+                return self._send(200, [{'name': 'STUB MRT STATION', 'lat': lat + 0.001, 'lon': lon}])
+            self._send(404, {})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class TestConcurrentEnrichment(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOneMapHandler)
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.urls = (pdist.ONEMAP_SEARCH_URL, pdist.ONEMAP_MRT_URL, pdist.API_DELAY_SEC)
+        pdist.ONEMAP_SEARCH_URL = base + '/search'
+        pdist.ONEMAP_MRT_URL = base + '/mrt'
+        pdist.API_DELAY_SEC = 0.01
+
+    @classmethod
+    def tearDownClass(cls):
+        pdist.ONEMAP_SEARCH_URL, pdist.ONEMAP_MRT_URL, pdist.API_DELAY_SEC = cls.urls
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = 0
+        self.server.mrt_requests = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.failures = {}
+
+    def test_token_bucket_rate(self):
+        bucket = pdist.TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        # The first token is available immediately, the other ten take 1/50s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_geocode_retries_server_errors(self):
+        self.server.failures['999 STUB ROAD'] = 2
+        with pdist.create_session(2) as session:
+            coords = pdist.geocode_address('999', 'STUB ROAD', session=session)
+        self.assertEqual(coords, (1.35, 103.85))
+        self.assertEqual(self.server.requests, 3)
+
+    def test_mrt_tiers(self):
+        limiter = pdist.TokenBucket(rate=1000)
+        near = pdist.get_mrt_with_retry(1.35, 103.85, rate_limiter=limiter)
+        far = pdist.get_mrt_with_retry(1.45, 103.70, rate_limiter=limiter)
+        self.assertEqual(near['search_radius_km'], 2.0)
+        self.assertEqual(far['search_radius_km'], 5.0)
+        self.assertEqual(far['nearest_mrt'], 'STUB MRT STATION')
+
+    def test_fetch_concurrently(self):
+        with_coords = pd.DataFrame({
+            'block': [str(i) for i in range(20)],
+            'clean_street_name': ['KNOWN ROAD'] * 20,
+            'address_key': [f"{i} KNOWN ROAD" for i in range(20)],
+            'latitude': [1.3] * 20,
+            'longitude': [103.8] * 20
+        })
+        without_coords = pd.DataFrame({
+            'block': ['999', '404'],
+            'clean_street_name': ['STUB ROAD', 'MISSING ROAD'],
+            'address_key': ['999 STUB ROAD', '404 MISSING ROAD'],
+            'latitude': [float('nan')] * 2,
+            'longitude': [float('nan')] * 2
+        })
+        results = {row.address_key: (needs_geocode, result) for row, needs_geocode, result in
+                   pdist.fetch_locations_concurrently(with_coords, without_coords,
+                                                      max_workers=8, rate_per_sec=1000)}
+
+        self.assertEqual(len(results), 22)
+        self.assertEqual(results['3 KNOWN ROAD'][1]['nearest_mrt'], 'STUB MRT STATION')
+        self.assertFalse(results['3 KNOWN ROAD'][0])
+        self.assertEqual(results['999 STUB ROAD'][1]['latitude'], 1.35)
+        self.assertIsNone(results['404 MISSING ROAD'][1])
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    def test_enrich_with_location_data(self):
+        df = pd.DataFrame({
+            'block': ['1', '999', '999', '404'],
+            'street_name': ['LOR 24 GEYLANG', 'STUB RD', 'STUB RD', 'MISSING RD'],
+            'resale_price': [400000, 500000, 510000, 300000]
+        })
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, 'cache.sqlite')
+            enriched, stats = pdist.enrich_with_location_data(df.copy(), cache_path=cache_path,
+                                                              stations_path=None)
+            first_run_requests = self.server.requests
+            with pdist.LocationCache(cache_path, read_only=True) as cache:
+                cached = set(cache.to_dataframe()['address_key'])
+
+            # A second run only fetches addresses that are still missing
+            self.server.requests = 0
+            rerun, _ = pdist.enrich_with_location_data(df.copy(), cache_path=cache_path,
+                                                       stations_path=None)
+            self.assertEqual(self.server.requests, 1)  # Only the search for 404 MISSING ROAD
+
+        self.assertEqual(len(enriched), 4)
+        self.assertEqual(enriched['nearest_mrt'].tolist()[:3], ['STUB MRT STATION'] * 3)
+        self.assertAlmostEqual(enriched['latitude'].iloc[1], 1.35)
+        self.assertTrue(pd.isna(enriched['latitude'].iloc[3]))
+        self.assertEqual(cached, {'1 LORONG 24 GEYLANG', '999 STUB ROAD'})
+        pd.testing.assert_frame_equal(rerun, enriched)
+        self.assertEqual(stats['optimisation_metrics']['had_existing_coords'], 1)
+        self.assertEqual(stats['geocode_failed'], 1)
+        self.assertEqual(stats['optimisation_metrics']['total_api_calls_made'], first_run_requests)
+
+    def test_fetch_with_local_stations(self):
+        stations = pd.DataFrame({'name': ['A MRT STATION', 'B MRT STATION'],
+                                 'latitude': [1.351, 1.30], 'longitude': [103.85, 103.80]})
+        with_coords = pd.DataFrame({'block': ['1'], 'clean_street_name': ['KNOWN ROAD'],
+                                    'address_key': ['1 KNOWN ROAD'],
+                                    'latitude': [1.301], 'longitude': [103.80]})
+        without_coords = pd.DataFrame({'block': ['999', '5'], 'clean_street_name': ['STUB ROAD', 'FAR ROAD'],
+                                       'address_key': ['999 STUB ROAD', '5 FAR ROAD'],
+                                       'latitude': [float('nan')] * 2, 'longitude': [float('nan')] * 2})
+        results = {row.address_key: result for row, _, result in
+                   pdist.fetch_locations_concurrently(with_coords, without_coords,
+                                                      rate_per_sec=1000, stations=stations)}
+
+        self.assertEqual(self.server.mrt_requests, 0)
+        self.assertEqual(self.server.requests, 2)  # Geocoding only
+        self.assertEqual(results['1 KNOWN ROAD']['nearest_mrt'], 'B MRT STATION')
+        self.assertEqual(results['999 STUB ROAD']['nearest_mrt'], 'A MRT STATION')
+        self.assertEqual(results['999 STUB ROAD']['search_radius_km'], 2.0)
+        self.assertTrue(pd.isna(results['5 FAR ROAD']['nearest_mrt']))
+
+class TestLocationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.record = {'block': '1', 'street_name': 'LORONG 24 GEYLANG', 'latitude': 1.31,
+                       'longitude': 103.88, 'nearest_mrt': 'ALJUNIED MRT STATION',
+                       'dist_mrt_km': 0.523, 'search_radius_km': 2.0}
+        self.no_mrt = dict(self.record, block='2', nearest_mrt=np.nan, dist_mrt_km=np.nan,
+                           search_radius_km=np.nan)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_put_and_lookup(self):
+        path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+        with pdist.LocationCache(path) as cache:
+            cache.put('1 LORONG 24 GEYLANG', self.record)
+            cache.put('2 LORONG 24 GEYLANG', self.no_mrt)
+            cache.put('1 LORONG 24 GEYLANG', dict(self.record, dist_mrt_km=np.float64(0.5)))
+
+        with pdist.LocationCache(path, read_only=True) as cache:
+            self.assertEqual(len(cache), 2)
+            self.assertIn('2 LORONG 24 GEYLANG', cache)
+            self.assertEqual(cache.get('1 LORONG 24 GEYLANG')['dist_mrt_km'], 0.5)
+            self.assertIsNone(cache.get('3 LORONG 24 GEYLANG'))
+            self.assertEqual(cache.cached_keys(['2 LORONG 24 GEYLANG', 'X']), {'2 LORONG 24 GEYLANG'})
+            df = cache.to_dataframe(['2 LORONG 24 GEYLANG'])
+            self.assertEqual(len(df), 1)
+            self.assertTrue(pd.isna(df['nearest_mrt'].iloc[0]) and np.isnan(df['dist_mrt_km'].iloc[0]))
+
+    def test_migrates_json_cache(self):
+        json_path = os.path.join(self.tmpdir.name, 'location_cache.json')
+        with open(json_path, 'w') as f:
+            json.dump({'1 LORONG 24 GEYLANG': self.record, '2 LORONG 24 GEYLANG': self.no_mrt}, f)
+
+        with pdist.open_location_cache(json_path) as cache:
+            self.assertTrue(cache.path.endswith('location_cache.sqlite'))
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.get('1 LORONG 24 GEYLANG'), self.record)
+
+class TestNearestMrtStations(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.stations = pd.DataFrame({
+            'name': [f"STATION {i}" for i in range(40)],
+            'latitude': rng.uniform(1.25, 1.45, 40),
+            'longitude': rng.uniform(103.65, 104.0, 40)
+        })
+        self.lats = np.append(rng.uniform(1.2, 1.5, 500), [np.nan, 1.9])
+        self.lons = np.append(rng.uniform(103.6, 104.05, 500), [103.8, 103.8])
+
+    def test_matches_great_circle_loop(self):
+        names, distances, radius = pdist.nearest_mrt_stations(self.lats, self.lons, self.stations, chunk_size=64)
+        for i in range(len(self.lats) - 2):
+            dists = [great_circle((self.lats[i], self.lons[i]), (s.latitude, s.longitude)).km
+                     for s in self.stations.itertuples()]
+            best = int(np.argmin(dists))
+            if dists[best] <= 5.0:
+                self.assertEqual(names[i], self.stations['name'][best])
+                self.assertEqual(distances[i], round(dists[best], 3))
+                self.assertEqual(radius[i], 2.0 if dists[best] <= 2.0 else 5.0)
+            else:
+                self.assertTrue(pd.isna(names[i]) and np.isnan(distances[i]) and np.isnan(radius[i]))
+
+    def test_missing_and_distant_coordinates(self):
+        names, distances, radius = pdist.nearest_mrt_stations(self.lats, self.lons, self.stations)
+        self.assertTrue(pd.isna(names[-2]) and np.isnan(distances[-2]) and np.isnan(radius[-2]))
+        self.assertTrue(pd.isna(names[-1]) and np.isnan(radius[-1]))
+
+    def test_assign_nearest_mrt(self):
+        df = pd.DataFrame({'latitude': self.lats[:3], 'longitude': self.lons[:3], 'nearest_mrt': ['OLD'] * 3})
+        assigned = pdist.assign_nearest_mrt(df, self.stations)
+        names, _, _ = pdist.nearest_mrt_stations(self.lats[:3], self.lons[:3], self.stations)
+        self.assertEqual(assigned['nearest_mrt'].tolist(), names.tolist())
+        self.assertEqual(df['nearest_mrt'].tolist(), ['OLD'] * 3)
+
+    def test_load_station_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'mrt_stations.csv')
+            with self.assertRaises(FileNotFoundError):
+                pdist.load_mrt_stations(path)
+            self.stations.iloc[:0].to_csv(path, index=False)
+            with self.assertRaises(ValueError):
+                pdist.load_mrt_stations(path)
+            self.stations.to_csv(path, index=False)
+            self.assertEqual(len(pdist.load_mrt_stations(path)), 40)
+        self.assertIsNone(pdist.load_mrt_stations(None))
+
+    def test_missing_default_station_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            default = os.path.join(tmpdir, 'mrt_stations.csv')
+            environ = {k: v for k, v in os.environ.items() if k != 'MRT_STATIONS_FILE'}
+            with mock.patch.object(pdist, 'DEFAULT_MRT_STATIONS_FILE', default), \
+                    mock.patch.dict(os.environ, environ, clear=True):
+                # Falls back to OneMap lookups with a warning
+                self.assertIsNone(pdist.load_mrt_stations(default))
+                os.environ['MRT_STATIONS_FILE'] = default
+                with self.assertRaises(FileNotFoundError):
+                    pdist.load_mrt_stations(default)
+
+if __name__ == '__main__':
+    unittest.main()
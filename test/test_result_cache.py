@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+import numpy as np
+from modules.result_cache import ResultCache, RankedResult, result_key, canonical_constraints
+
+def make_result(n_filtered, n_ranked):
+    labels = np.arange(n_filtered, dtype=np.int64)
+    return RankedResult(labels, labels[:n_ranked], np.linspace(10, 0, n_ranked))
+
+class TestResultCache(unittest.TestCase):
+
+    def test_equivalent_queries_share_a_key(self):
+        a = result_key({'towns': ['Bishan', 'BEDOK'], 'max_price': 800000}, 'Price', 'v1')
+        b = result_key({'max_price': 800000.0, 'towns': ['bedok', 'bishan'], 'flat_types': [],
+                        'max_mrt_distance': None}, 'Price', 'v1')
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, result_key({'towns': ['BISHAN']}, 'Price', 'v1'))
+        self.assertNotEqual(a, result_key({'towns': ['Bishan', 'BEDOK'], 'max_price': 800000}, 'Lease', 'v1'))
+        self.assertNotEqual(a, result_key({'towns': ['Bishan', 'BEDOK'], 'max_price': 800000}, 'Price', 'v2'))
+        self.assertEqual(canonical_constraints({'towns': ['b', 'B', 'a']}), {'towns': ['A', 'B']})
+
+    def test_ranked_prefix_coverage(self):
+        partial = make_result(500, 100)
+        self.assertEqual(partial.total_found, 500)
+        self.assertTrue(partial.covers(100))
+        self.assertFalse(partial.covers(110))
+        self.assertTrue(make_result(50, 50).covers(1000))
+
+    def test_lru_eviction_by_bytes(self):
+        entry_bytes = make_result(1000, 100).nbytes
+        cache = ResultCache(max_bytes=int(entry_bytes * 2.5), ttl_seconds=0)
+        cache.put('a', make_result(1000, 100))
+        cache.put('b', make_result(1000, 100))
+        self.assertIsNotNone(cache.get('a'))  # 'b' is now least recently used
+        cache.put('c', make_result(1000, 100))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+        self.assertLessEqual(stats['bytes'], cache.max_bytes)
+
+        cache.put('huge', make_result(100000, 100))
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl_expiry_and_clear(self):
+        cache = ResultCache(ttl_seconds=60)
+        with mock.patch('modules.result_cache.time.monotonic', return_value=1000.0):
+            cache.put('a', make_result(10, 10))
+        with mock.patch('modules.result_cache.time.monotonic', return_value=1030.0):
+            self.assertIsNotNone(cache.get('a'))
+        with mock.patch('modules.result_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+        cache.put('b', make_result(10, 10))
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+import json
+import numpy as np
+import pandas as pd
+from modules import serialization
+from modules.serialization import frame_to_records, dumps, ndjson_lines, FastJSONResponse
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'town': pd.Categorical(['BISHAN', 'BEDOK', 'BISHAN']),
+            'block': np.array([123, 45, 7], dtype=np.int32),
+            'street_name': ['BISHAN ST 13', 'BEDOK NTH RD', 'BISHAN ST 22'],
+            'floor_area_sqm': [92.5, 110.0, 67.0],
+            'dist_mrt_km': np.array([0.512, 1.25, 0.3], dtype=np.float32),
+            'insight_summary': [{'tier': 'Good', 'insights': ['a']}, {'tier': 'Bad', 'insights': []}, {}]
+        }, index=[10, 4, 99])
+
+    def test_records_match_to_dict(self):
+        records = frame_to_records(self.df)
+        expected = self.df.to_dict(orient="records")
+        self.assertEqual(records, expected)
+        for record, other in zip(records, expected):
+            self.assertEqual([type(v) for v in record.values()], [type(v) for v in other.values()])
+
+    def test_missing_values_become_none(self):
+        df = self.df.copy()
+        df.loc[4, 'dist_mrt_km'] = np.nan
+        df['nearest_mrt'] = pd.Categorical(['BISHAN MRT STATION', np.nan, 'BISHAN MRT STATION'])
+        df.loc[99, 'street_name'] = None
+        records = frame_to_records(df)
+        self.assertIsNone(records[1]['dist_mrt_km'])
+        self.assertIsNone(records[1]['nearest_mrt'])
+        self.assertIsNone(records[2]['street_name'])
+        self.assertEqual(json.loads(dumps(records))[1]['dist_mrt_km'], None)
+
+    def test_fallback_encoder_matches_orjson(self):
+        content = {'recommendations': frame_to_records(self.df), 'total_found': np.int64(3),
+                   'nan': float('nan')}
+        fast = json.loads(dumps(content))
+        with mock.patch.object(serialization, 'orjson', None):
+            slow = json.loads(dumps(content))
+        self.assertEqual(fast, slow)
+        self.assertIsNone(slow['nan'])
+        self.assertEqual(FastJSONResponse(content).body, dumps(content))
+
+    def test_ndjson_lines(self):
+        records = frame_to_records(self.df)
+        lines = list(ndjson_lines({'total_found': 3}, records))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.endswith(b"\n") for line in lines))
+        self.assertEqual(json.loads(lines[0]), {'total_found': 3})
+        self.assertEqual(json.loads(lines[2])['town'], 'BEDOK')
+
+if __name__ == '__main__':
+    unittest.main()
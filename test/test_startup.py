@@ -0,0 +1,114 @@
+import unittest
+import threading
+import time
+from modules.startup import StartupStages, DONE, FAILED, SKIPPED
+
+class TestStartupStages(unittest.TestCase):
+
+    def test_dependencies_run_in_order(self):
+        order = []
+        lock = threading.Lock()
+        def stage(name, delay=0.0):
+            def run():
+                time.sleep(delay)
+                with lock:
+                    order.append(name)
+            return run
+        stages = StartupStages()
+        stages.add('dataset', stage('dataset', 0.05))
+        stages.add('model', stage('model'))
+        stages.add('index', stage('index'), after=['dataset'])
+        stages.add('insights', stage('insights'), after=['dataset', 'model'])
+        stages.start()
+        self.assertTrue(stages.wait(5))
+        self.assertLess(order.index('dataset'), order.index('index'))
+        self.assertLess(order.index('dataset'), order.index('insights'))
+        self.assertLess(order.index('model'), order.index('dataset'))  # Ran alongside, not after
+
+    def test_stages_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        stages = StartupStages()
+        stages.add('a', barrier.wait).add('b', barrier.wait)
+        stages.start()
+        self.assertTrue(stages.wait(5))
+
+    def test_failure_skips_dependents(self):
+        def broken():
+            raise FileNotFoundError("no dataset")
+        stages = StartupStages()
+        stages.add('dataset', broken)
+        stages.add('index', lambda: None, after=['dataset'])
+        stages.add('categories', lambda: None)
+        stages.start()
+        self.assertFalse(stages.wait(5))
+        self.assertTrue(stages.finished)
+        self.assertTrue(stages.failed)
+        progress = stages.progress()['stages']
+        self.assertEqual(progress['dataset']['status'], FAILED)
+        self.assertEqual(progress['dataset']['error'], "FileNotFoundError: no dataset")
+        self.assertEqual(progress['index']['status'], SKIPPED)
+        self.assertIsNone(progress['index']['seconds'])
+        self.assertEqual(progress['categories']['status'], DONE)
+        self.assertNotIn('error', progress['categories'])
+
+    def test_progress(self):
+        release = threading.Event()
+        stages = StartupStages()
+        stages.add('slow', lambda: release.wait(5))
+        self.assertEqual(stages.progress(), {'ready': False, 'elapsed_seconds': 0.0,
+                                             'stages': {'slow': {'status': 'pending', 'seconds': None}}})
+        stages.start()
+        self.assertFalse(stages.ready)
+        release.set()
+        self.assertTrue(stages.wait(5))
+        progress = stages.progress()
+        self.assertTrue(progress['ready'])
+        self.assertEqual(progress['stages']['slow']['status'], DONE)
+        self.assertGreaterEqual(progress['elapsed_seconds'], progress['stages']['slow']['seconds'])
+
+    def test_on_finish_called_once(self):
+        calls = []
+        stages = StartupStages(on_finish=calls.append)
+        for name in 'abcd':
+            stages.add(name, lambda: None)
+        stages.start()
+        self.assertTrue(stages.wait(5))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0]['ready'])
+
+    def test_no_stages(self):
+        calls = []
+        stages = StartupStages(on_finish=calls.append)
+        stages.start()
+        self.assertTrue(stages.wait(0))
+        self.assertEqual(calls, [{'ready': True, 'elapsed_seconds': 0.0, 'stages': {}}])
+
+    def test_optional_stage(self):
+        release = threading.Event()
+        def broken():
+            release.wait(5)
+            raise IndexError("no rows")
+        stages = StartupStages()
+        stages.add('dataset', lambda: None)
+        stages.add('warmup', broken, after=['dataset'], optional=True)
+        stages.start()
+        while stages.progress()['stages']['warmup']['status'] != 'running':
+            time.sleep(0.01)
+        # Ready while the optional stage still runs, and after it fails
+        self.assertTrue(stages.ready)
+        self.assertFalse(stages.finished)
+        release.set()
+        self.assertTrue(stages.wait(5))
+        self.assertFalse(stages.failed)
+        self.assertEqual(stages.progress()['stages']['warmup'],
+                         {'status': FAILED, 'seconds': stages.progress()['stages']['warmup']['seconds'],
+                          'optional': True, 'error': "IndexError: no rows"})
+        with self.assertRaises(ValueError):
+            stages.add('index', lambda: None, after=['warmup'])
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            StartupStages().add('index', lambda: None, after=['dataset'])
+
+if __name__ == '__main__':
+    unittest.main()
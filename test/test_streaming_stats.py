@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from modules.streaming_stats import RunningStats, QuantileSketch
+
+class TestStreamingStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.values = rng.lognormal(13, 0.4, 20000)
+        self.values[::97] = np.nan
+        self.valid = self.values[~np.isnan(self.values)]
+
+    def test_running_stats_in_chunks(self):
+        stats = RunningStats()
+        for chunk in np.array_split(self.values, 37):
+            stats.update(chunk)
+        self.assertEqual(stats.count, len(self.valid))
+        self.assertAlmostEqual(stats.mean, self.valid.mean(), delta=1e-6 * self.valid.mean())
+        self.assertAlmostEqual(stats.std, self.valid.std(ddof=1), delta=1e-6 * self.valid.std())
+        self.assertEqual((stats.min, stats.max), (self.valid.min(), self.valid.max()))
+
+    def test_merge_matches_single_pass(self):
+        left, right = RunningStats().update(self.values[:5000]), RunningStats().update(self.values[5000:])
+        merged = left.merge(right)
+        single = RunningStats().update(self.values)
+        self.assertEqual(merged.count, single.count)
+        self.assertAlmostEqual(merged.std, single.std, places=4)
+        self.assertTrue(np.isnan(RunningStats().update([1.0]).std))
+
+    def test_quantile_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for chunk in np.array_split(self.values, 10):
+            sketch.update(chunk)
+        self.assertEqual(sketch.count, len(self.valid))
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+            exact = np.quantile(self.valid, q, method='lower')
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, 0.0101)
+        self.assertLess(len(sketch.buckets), 300)
+
+    def test_quantile_zeros_and_merge(self):
+        a = QuantileSketch().update([0.0, 0.0, 0.0, 1.0])
+        b = QuantileSketch().update([2.0, 3.0])
+        a.merge(b)
+        self.assertEqual(a.quantile(0.2), 0.0)
+        self.assertAlmostEqual(a.quantile(1.0), 3.0, delta=0.03)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+        with self.assertRaises(ValueError):
+            QuantileSketch().update([-1.0])
+
+if __name__ == '__main__':
+    unittest.main()